@@ -36,6 +36,14 @@ def create_app(config_name: str = None) -> Flask:
     # ── Register error handlers ───────────────────────────────
     _register_error_handlers(app)
 
+    # ── Warm start from the on-disk snapshot ──────────────────
+    # A restart/deploy inside today's cache window picks up the last load
+    # from CACHE_DIR instead of making the first user wait on MSSQL.
+    if config_name != "testing":
+        from app.services.cache_service import warm_start_from_disk
+        with app.app_context():
+            warm_start_from_disk()
+
     # ── Start background cache scheduler ──────────────────────
     # Runs as a daemon thread — triggers a DB refresh daily at CACHE_HOUR
     # so data is ready before the first user request of the day.
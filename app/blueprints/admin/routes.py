@@ -116,4 +116,24 @@ def force_refresh():
         "last_updated": format_loaded_at(),
         "next_refresh": next_cache_refresh().strftime("%d %b, %I:%M %p"),
         "row_count":    len(cache["data"]),
-    })
\ No newline at end of file
+    })
+
+@admin_bp.route("/api/refresh/cancel", methods=["POST"])
+@login_required
+@superadmin_required
+def cancel_refresh():
+    u = session["user"]
+    log_activity(
+        u["email"],
+        u["role"],
+        "Cancel Refresh",
+        "Superadmin cancelled running warehouse queries",
+    )
+
+    try:
+        from app.services.mssql_service import cancel_running_queries
+    except ImportError:
+        # No ODBC driver on this host (DATA_SOURCE=sqlite) — nothing to cancel.
+        return jsonify({"status": "cancel requested", "cancelled_here": 0})
+    cancelled = cancel_running_queries()
+    return jsonify({"status": "cancel requested", "cancelled_here": cancelled})
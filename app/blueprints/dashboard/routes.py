@@ -1,12 +1,24 @@
-from flask import Blueprint, render_template, request, session, jsonify
+import json
+from datetime import date
+
+from flask import Blueprint, Response, current_app, render_template, request, session, jsonify, stream_with_context
 from app.decorators import login_required
 from app.services.cache_service import (
-    refresh_data,
+    ensure_cache,
     cache_is_fresh,
+    is_refreshing,
     next_cache_refresh,
     format_loaded_at,
     get_cache,
+    snapshot_age_seconds,
 )
+from app.services.scope_index import get_scope_index, scope_positions, scope_key
+from app.services.response_cache import get_cached_response, conditional_response
+from app.services.summary import parse_filters, filtered_positions, compute_summary, empty_summary
+from app.services import churn, delta_sync, export, leaderboard, table, wire_format
+from app.services.insights import get_insights
+from app.services.facets import get_facet_index, empty_facets
+from app.services import search_index
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -42,41 +54,49 @@ REGION_CODE_MAP = {
 WIDE_ACCESS_ROLES = {"Superadmin", "CXO"}
 
 
+# ── Helper: snapshot fields shared by /api/snapshot and /api/data ────────────
+def _snapshot_meta(snapshot, fresh: bool, next_refresh: str) -> dict:
+    return {
+        "version":      snapshot.version,
+        "columns":      [{"title": c} for c in snapshot.columns],
+        "last_updated": format_loaded_at(snapshot.timestamp),
+        "next_refresh": next_refresh,
+        "cache_fresh":  fresh,
+        "stale":        not fresh,
+        "row_count":    snapshot.row_count,
+    }
+
+
 # ── Helper: resolve region from SO codes in the cache ────────────────────────
 def _resolve_region_from_so(user: dict) -> str | None:
-    cache = get_cache()
-    if not cache or not cache.get("data"):
+    snapshot = get_cache().get("snapshot")
+    if snapshot is None or not snapshot.row_count:
         return None
 
-    col_map    = cache.get("column_map", {})
-    so_idx     = col_map.get("SO")
-    region_idx = col_map.get("Region")
-
-    if so_idx is None or region_idx is None:
+    col_map = snapshot.column_map
+    if "SO" not in col_map or "Region" not in col_map:
         return None
 
     scope_value = user.get("scope_value") or []
-    allowed_sos = {str(v).replace(".0", "").strip() for v in scope_value}
-
-    if not allowed_sos:
+    if not scope_value:
         return None
 
-    for row in cache["data"]:
-        so_val = str(row[so_idx]).replace(".0", "").strip()
-        if so_val in allowed_sos:
-            raw_region = str(row[region_idx]).strip()
-            # Try exact match first (e.g. already "Tamil Nadu")
-            if raw_region in POWERBI_REPORTS:
-                return raw_region
-            # Then try the code map (e.g. "TG-1" → "Telangana")
-            mapped = REGION_CODE_MAP.get(raw_region)
-            if mapped:
-                return mapped
-            # Last resort: case-insensitive prefix match
-            raw_upper = raw_region.upper()
-            for full_name in POWERBI_REPORTS:
-                if raw_upper.startswith(full_name[:2].upper()):
-                    return full_name
+    positions = get_scope_index(snapshot).positions("SO", scope_value)
+
+    for region in snapshot.column("Region").values_at(positions):
+        raw_region = str(region).strip()
+        # Try exact match first (e.g. already "Tamil Nadu")
+        if raw_region in POWERBI_REPORTS:
+            return raw_region
+        # Then try the code map (e.g. "TG-1" → "Telangana")
+        mapped = REGION_CODE_MAP.get(raw_region)
+        if mapped:
+            return mapped
+        # Last resort: case-insensitive prefix match
+        raw_upper = raw_region.upper()
+        for full_name in POWERBI_REPORTS:
+            if raw_upper.startswith(full_name[:2].upper()):
+                return full_name
 
     return None
 
@@ -113,12 +133,12 @@ def powerbi():
             embed_url      = None,
         )
 
-    # RH / BM — warm cache then resolve region from SO codes
-    refresh_data()
+    # RH / BM — make sure a snapshot exists, then resolve region from SO codes
+    ensure_cache()
     region    = _resolve_region_from_so(current_user)
     embed_url = POWERBI_REPORTS.get(region) if region else None
 
-    print(f"DEBUG powerbi route — resolved region: {repr(region)}, embed_url: {repr(embed_url)}")
+    current_app.logger.debug(f"powerbi route — resolved region: {region!r}, embed_url: {embed_url!r}")
 
     return render_template(
         "powerbi.html",
@@ -135,45 +155,381 @@ def powerbi():
 # DATA API
 # ══════════════════════════════════════════════════════════════
 
+@dashboard_bp.route("/api/snapshot")
+@login_required
+def api_snapshot():
+    # What the dashboard needs to know about the snapshot — its columns,
+    # version and load time — without any rows. Every view then asks the
+    # server for just the rows or aggregates it shows.
+    ensure_cache()
+
+    cache        = get_cache()
+    snapshot     = cache["snapshot"]
+    fresh        = cache_is_fresh()
+    next_refresh = next_cache_refresh().strftime("%d %b, %I:%M %p")
+
+    if snapshot is None:
+        return jsonify({
+            "version":      None,
+            "columns":      [{"title": c} for c in cache["columns"]],
+            "last_updated": format_loaded_at(),
+            "next_refresh": next_refresh,
+            "cache_fresh":  fresh,
+            "stale":        not fresh,
+            "row_count":    0,
+        })
+
+    key = (snapshot.version, "snapshot", fresh, next_refresh)
+
+    def build() -> bytes:
+        return json.dumps(_snapshot_meta(snapshot, fresh, next_refresh), separators=(",", ":")).encode("utf-8")
+
+    resp = conditional_response(get_cached_response(key, build))
+    resp.headers["X-Snapshot-Age"]        = str(snapshot_age_seconds() or 0)
+    resp.headers["X-Snapshot-Refreshing"] = "1" if is_refreshing() else "0"
+    return resp
+
+
 @dashboard_bp.route("/api/data")
 @login_required
 def api_data():
-    refresh_data()
+    # Every row of the user's scope. The dashboard no longer reads it (see
+    # /api/snapshot); it stays for clients that take the whole dataset.
+    # Serves the current snapshot even if it is past CACHE_HOUR — a stale
+    # snapshot triggers a background refresh instead of blocking this request.
+    ensure_cache()
 
     cache        = get_cache()
+    snapshot     = cache["snapshot"]
+    current_user = session["user"]
+    fresh        = cache_is_fresh()
+    next_refresh = next_cache_refresh().strftime("%d %b, %I:%M %p")
+
+    if snapshot is None:
+        return jsonify({
+            "data":         [],
+            "columns":      [{"title": c} for c in cache["columns"]],
+            "last_updated": format_loaded_at(),
+            "next_refresh": next_refresh,
+            "cache_fresh":  fresh,
+            "stale":        not fresh,
+            "row_count":    0,
+        })
+
+    # Users with the same scope get the same bytes — the body is encoded
+    # once per (snapshot, scope, layout) and shared. Everything in the body
+    # must therefore be a function of the key; per-request state (age,
+    # whether a refresh is running) goes in headers instead.
+    #
+    # ?format=columns opts into the columnar binary layout (wire_format.py);
+    # without it the payload is the row-major JSON it always was.
+    # ?since=<version> asks for a delta against the snapshot the page holds
+    # (delta_sync.py). Only the current and the previous snapshot can be a
+    # base — for anything older the page gets a full load instead.
+    since = request.args.get("since")
+    base  = None
+    if since == snapshot.version:
+        base = snapshot
+    elif since and cache["previous"] is not None and since == cache["previous"].version:
+        base = cache["previous"]
+    if base is not None and not delta_sync.can_diff(base, snapshot):
+        base = None
+
+    layout = "delta" if base is not None else "columns" if request.args.get("format") == "columns" else "json"
+    key    = (
+        snapshot.version, "data", scope_key(snapshot, current_user), fresh, next_refresh,
+        layout, base.version if base is not None else None,
+    )
+
+    def build() -> bytes:
+        # RLS — positions come from the snapshot's inverted scope indexes,
+        # so a scoped user's payload only touches the rows they own.
+        positions = scope_positions(snapshot, current_user)
+        meta      = _snapshot_meta(snapshot, fresh, next_refresh)
+        if layout == "delta":
+            delta = delta_sync.compute_delta(base, snapshot, scope_positions(base, current_user), positions)
+            return json.dumps({"delta": True, "base": since, **meta, **delta}, separators=(",", ":")).encode("utf-8")
+        if layout == "columns":
+            return wire_format.encode_columns(snapshot, positions, meta)
+        data = snapshot.rows_at(slice(None) if positions is None else positions)
+        return json.dumps({"data": data, **meta}, separators=(",", ":")).encode("utf-8")
+
+    mimetype = wire_format.MIMETYPE if layout == "columns" else "application/json"
+    resp = conditional_response(get_cached_response(key, build, mimetype))
+    resp.headers["X-Snapshot-Age"]        = str(snapshot_age_seconds() or 0)
+    resp.headers["X-Snapshot-Refreshing"] = "1" if is_refreshing() else "0"
+    return resp
+
+
+@dashboard_bp.route("/api/summary")
+@login_required
+def api_summary():
+    # KPI cards and overview charts for the user's scope and the slicer
+    # filters in the query string (?Region=…&Product=…) — the aggregates
+    # the page used to add up over every row it downloaded.
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
+    current_user = session["user"]
+    filters      = parse_filters(request.args)
+
+    if snapshot is None:
+        return jsonify({
+            **empty_summary(),
+            "last_updated": format_loaded_at(),
+        })
+
+    key = (snapshot.version, "summary", scope_key(snapshot, current_user), filters)
+
+    def build() -> bytes:
+        positions = filtered_positions(snapshot, current_user, filters)
+        return json.dumps({
+            **compute_summary(snapshot, positions),
+            "last_updated": format_loaded_at(snapshot.timestamp),
+        }, separators=(",", ":")).encode("utf-8")
+
+    resp = conditional_response(get_cached_response(key, build))
+    resp.headers["X-Snapshot-Age"]        = str(snapshot_age_seconds() or 0)
+    resp.headers["X-Snapshot-Refreshing"] = "1" if is_refreshing() else "0"
+    return resp
+
+
+@dashboard_bp.route("/api/leaderboard/<board>")
+@login_required
+def api_leaderboard(board):
+    # One page of the Team tab's SE / SO / Region leaderboard:
+    #   ?sort=mtd&dir=desc&q=<search>&page=1&size=25 plus the slicer filters.
+    if board not in leaderboard.BOARDS:
+        return jsonify({"error": f"Unknown leaderboard {board!r}"}), 404
+
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
+    current_user = session["user"]
+    filters      = parse_filters(request.args)
+    sort         = leaderboard.sort_column(board, request.args.get("sort", "mtd"))
+    descending   = request.args.get("dir", "desc") != "asc"
+    search       = (request.args.get("q") or "").strip()
+    page         = request.args.get("page", 1, type=int)
+    size         = request.args.get("size", leaderboard.DEFAULT_PAGE_SIZE, type=int)
+    size         = min(max(size, 1), leaderboard.MAX_PAGE_SIZE)
+
+    if snapshot is None:
+        return jsonify({
+            **leaderboard.empty_page(size),
+            "board": board,
+            "sort":  sort,
+            "dir":   "desc" if descending else "asc",
+            "team":  leaderboard.EMPTY_TEAM,
+        })
+
+    scope = scope_key(snapshot, current_user)
+    key   = (snapshot.version, "leaderboard", board, scope, filters, sort, descending, search.lower(), page, size)
+
+    def build() -> bytes:
+        table = leaderboard.get_table(snapshot, board, current_user, scope, filters)
+        se    = table if board == "se" else leaderboard.get_table(snapshot, "se", current_user, scope, filters)
+        return json.dumps({
+            **table.page(sort, descending, search, page, size),
+            "board": board,
+            "sort":  sort,
+            "dir":   "desc" if descending else "asc",
+            "team":  leaderboard.team_kpis(se),
+        }, separators=(",", ":")).encode("utf-8")
+
+    return conditional_response(get_cached_response(key, build))
+
+
+@dashboard_bp.route("/api/churn")
+@login_required
+def api_churn():
+    # Churn Risk Radar drill-down:
+    #   ?tier=all|critical|high|watch&sort=pct&dir=asc&q=<search>&page=1
+    # plus the slicer filters. all=1 returns every matching row (CSV export).
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
+    current_user = session["user"]
+    filters      = parse_filters(request.args)
+    tier         = request.args.get("tier", "all")
+    tier         = tier if tier in churn.TIERS else "all"
+    sort         = request.args.get("sort", "pct")
+    sort         = sort if sort in churn.SORTS else "pct"
+    descending   = request.args.get("dir", "asc") == "desc"
+    search       = (request.args.get("q") or "").strip().lower()
+    page         = request.args.get("page", 1, type=int)
+    size         = request.args.get("size", churn.DEFAULT_PAGE_SIZE, type=int)
+    size         = None if request.args.get("all") == "1" else min(max(size, 1), churn.MAX_PAGE_SIZE)
+
+    if snapshot is None:
+        return jsonify({
+            "rows": [], "total": 0, "page": 1, "pages": 1, "size": size or 0,
+            "counts": {**dict.fromkeys(churn.TIERS, 0), "total": 0},
+        })
+
+    scope = scope_key(snapshot, current_user)
+    key   = (snapshot.version, "churn", scope, filters, tier, sort, descending, search, page, size)
+
+    def build() -> bytes:
+        # National scope with no slicers needs no mask at all.
+        view = None
+        if scope != ("ALL",) or filters:
+            view = churn.view_mask(snapshot, filtered_positions(snapshot, current_user, filters))
+        result = churn.get_churn_index(snapshot).page(view, tier, sort, descending, search, page, size)
+        return json.dumps(result, separators=(",", ":")).encode("utf-8")
+
+    return conditional_response(get_cached_response(key, build))
+
+
+@dashboard_bp.route("/api/insights")
+@login_required
+def api_insights():
+    # Smart Insights cards for the user's scope and the slicer filters in
+    # the query string — the page only renders the JSON.
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
+    current_user = session["user"]
+    filters      = parse_filters(request.args)
+
+    if snapshot is None:
+        return jsonify({"critical": [], "action": [], "positive": []})
+
+    # The date is in the key: "no order in 7+ days" changes at midnight.
+    key = (snapshot.version, "insights", scope_key(snapshot, current_user), filters, date.today())
+
+    def build() -> bytes:
+        insights = get_insights(snapshot, current_user, filters)
+        return json.dumps(insights, separators=(",", ":")).encode("utf-8")
+
+    return conditional_response(get_cached_response(key, build))
+
+
+@dashboard_bp.route("/api/facets")
+@login_required
+def api_facets():
+    # The options left in every global slicer, with row counts, for the
+    # user's scope and the slicer filters in the query string.
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
+    current_user = session["user"]
+    filters      = parse_filters(request.args)
+
+    if snapshot is None:
+        return jsonify(empty_facets())
+
+    key = (snapshot.version, "facets", scope_key(snapshot, current_user), filters)
+
+    def build() -> bytes:
+        index  = get_facet_index(snapshot)
+        facets = index.facets(index.scope_bitmap(snapshot, current_user), filters)
+        return json.dumps(facets, separators=(",", ":")).encode("utf-8")
+
+    return conditional_response(get_cached_response(key, build))
+
+
+@dashboard_bp.route("/api/table")
+@login_required
+def api_table():
+    # Master Data table in DataTables server-side mode: draw, start, length,
+    # order[i][column|dir] and search[value], plus the slicer filters. Only
+    # the rows being drawn are sent. Not response-cached — every body
+    # echoes its draw counter.
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
     current_user = session["user"]
-    columns      = list(cache["columns"])
-    data         = list(cache["data"])
-    col_map      = cache["column_map"]
-
-    if current_user.get("scope_type") == "SO":
-        if "SO" in col_map:
-            scope_idx   = col_map["SO"]
-            allowed_sos = {str(v).replace(".0", "").strip()
-                           for v in (current_user.get("scope_value") or [])}
-            data = [
-                row for row in data
-                if str(row[scope_idx]).replace(".0", "").strip() in allowed_sos
-            ]
-
-    elif current_user.get("scope_type") not in ["ALL", None, ""]:
-        scope_col = current_user["scope_type"]
-        scope_val = current_user["scope_value"]
-        if scope_col in col_map:
-            scope_idx = col_map[scope_col]
-            data = [
-                row for row in data
-                if str(row[scope_idx]).strip() == str(scope_val).strip()
-            ]
-
-    return jsonify({
-        "data":         data,
-        "columns":      [{"title": c} for c in columns],
-        "last_updated": format_loaded_at(),
-        "next_refresh": next_cache_refresh().strftime("%d %b, %I:%M %p"),
-        "cache_fresh":  cache_is_fresh(),
-        "row_count":    len(cache["data"]),
-    })
+    filters      = parse_filters(request.args)
+    draw         = request.args.get("draw", 0, type=int)
+    start        = max(request.args.get("start", 0, type=int), 0)
+    length       = request.args.get("length", table.DEFAULT_PAGE_SIZE, type=int)
+    length       = -1 if length < 0 else min(max(length, 1), table.MAX_PAGE_SIZE)
+    search       = (request.args.get("search[value]") or "").strip()
+
+    if snapshot is None:
+        return jsonify({"draw": draw, "recordsTotal": 0, "recordsFiltered": 0, "data": []})
+
+    order     = table.parse_order(request.args, len(snapshot.columns))
+    positions = filtered_positions(snapshot, current_user, filters)
+    return jsonify({"draw": draw, **table.table_page(snapshot, positions, order, search, start, length)})
+
+
+@dashboard_bp.route("/api/search")
+@login_required
+def api_search():
+    # Typeahead over customer, SE and SO names and IDs: ?q=<text>&limit=10
+    # plus the slicer filters. Only values on the user's rows are offered.
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
+    current_user = session["user"]
+    filters      = parse_filters(request.args)
+    query        = (request.args.get("q") or "").strip()
+    limit        = request.args.get("limit", search_index.DEFAULT_SUGGESTIONS, type=int)
+    limit        = min(max(limit, 1), search_index.MAX_SUGGESTIONS)
+
+    if snapshot is None:
+        return jsonify({"q": query, "results": []})
+
+    scope = scope_key(snapshot, current_user)
+    key   = (snapshot.version, "search", scope, filters, query.lower(), limit)
+
+    def build() -> bytes:
+        # National scope with no slicers counts from the index's totals.
+        positions = None
+        if scope != ("ALL",) or filters:
+            positions = filtered_positions(snapshot, current_user, filters)
+        results = search_index.get_search_index(snapshot).suggest(positions, query, limit)
+        return json.dumps({"q": query, "results": results}, separators=(",", ":")).encode("utf-8")
+
+    return conditional_response(get_cached_response(key, build))
+
+
+@dashboard_bp.route("/api/export")
+@login_required
+def api_export():
+    # Streams a download: ?view=table|churn&format=csv|xlsx plus the slicer
+    # filters and the view's own state — the table's order[i][column|dir]
+    # and search[value], or the churn tier, sort and dir. Size and duration
+    # go to the activity log when the download ends.
+    ensure_cache()
+
+    snapshot     = get_cache()["snapshot"]
+    current_user = session["user"]
+    filters      = parse_filters(request.args)
+    view         = request.args.get("view", "table")
+    fmt          = request.args.get("format", "csv")
+
+    if view not in ("table", "churn") or fmt not in export.FORMATS:
+        return jsonify({"error": "Unknown export"}), 400
+    if snapshot is None:
+        return jsonify({"error": "Data is still loading"}), 503
+
+    positions = filtered_positions(snapshot, current_user, filters)
+    if view == "table":
+        order    = table.parse_order(request.args, len(snapshot.columns))
+        search   = (request.args.get("search[value]") or "").strip()
+        download = export.table_export(snapshot, positions, order, search)
+        filename = f"Heritage_Samarth_Export.{fmt}"
+        action   = f"Export {fmt.upper()}"
+    else:
+        tier       = request.args.get("tier", "all")
+        tier       = tier if tier in churn.TIERS else "all"
+        sort       = request.args.get("sort", "pct")
+        sort       = sort if sort in churn.SORTS else "pct"
+        descending = request.args.get("dir", "asc") == "desc"
+        index      = churn.get_churn_index(snapshot)
+        download   = export.churn_export(index, churn.view_mask(snapshot, positions), tier, sort, descending)
+        filename   = f"Heritage_ChurnRisk_{tier}_{date.today().isoformat()}.{fmt}"
+        action     = "Churn Export"
+
+    chunks = export.stream_csv(download) if fmt == "csv" else export.stream_xlsx(download)
+    return Response(
+        stream_with_context(export.logged(chunks, current_user, action, download, fmt)),
+        mimetype=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 # ══════════════════════════════════════════════════════════════
@@ -31,11 +31,85 @@ class BaseConfig:
     MSSQL_USER   = os.environ.get("MSSQL_USER",   "")
     MSSQL_PASS   = os.environ.get("MSSQL_PASS",   "")
 
+    # Seconds to wait for the server to accept a login, and for any single
+    # query before the driver aborts it (0 = no limit).
+    MSSQL_LOGIN_TIMEOUT = int(os.environ.get("MSSQL_LOGIN_TIMEOUT", "15"))
+    MSSQL_QUERY_TIMEOUT = int(os.environ.get("MSSQL_QUERY_TIMEOUT", "900"))
+
+    # Idle connections kept per process, and max age before one is
+    # replaced instead of reused (validated with SELECT 1 either way).
+    MSSQL_POOL_SIZE            = int(os.environ.get("MSSQL_POOL_SIZE", "4"))
+    MSSQL_POOL_RECYCLE_SECONDS = int(os.environ.get("MSSQL_POOL_RECYCLE_SECONDS", "1800"))
+
+    # ── Data source ──────────────────────────────────────────
+    # Where refreshes read the performance data from:
+    #   "mssql"  — the BI warehouse above
+    #   "sqlite" — LOCAL_WAREHOUSE_PATH, generated from the SYNTHETIC_*
+    #              settings on first use (off-site benchmarking / load tests)
+    DATA_SOURCE = os.environ.get("DATA_SOURCE", "mssql")
+    LOCAL_WAREHOUSE_PATH = os.environ.get(
+        "LOCAL_WAREHOUSE_PATH",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "local_warehouse.db"),
+    )
+
+    # Synthetic dataset volume. SYNTHETIC_SCALE multiplies the customer
+    # count — e.g. 10 to size hardware for 10× growth.
+    SYNTHETIC_CUSTOMERS     = int(os.environ.get("SYNTHETIC_CUSTOMERS", "20000"))
+    SYNTHETIC_SALES_OFFICES = int(os.environ.get("SYNTHETIC_SALES_OFFICES", "120"))
+    SYNTHETIC_SES_PER_SO    = int(os.environ.get("SYNTHETIC_SES_PER_SO", "6"))
+    SYNTHETIC_SCALE         = float(os.environ.get("SYNTHETIC_SCALE", "1"))
+
+    # Rows pulled per cursor.fetchmany() while streaming into the snapshot.
+    FETCH_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", "5000"))
+
+    # How a refresh talks to the MSSQL warehouse:
+    #   "full"        — one run of sql/performance_analysis.sql
+    #   "parallel"    — the query's CTEs as independent per-window queries,
+    #                   run concurrently and joined in Python
+    #   "incremental" — per-window queries; stable windows (LM, LY, LQ, LW)
+    #                   are cached per period and only volatile ones re-run
+    #   "engine"      — one daily-aggregate query; every window computed in
+    #                   NumPy (app/services/window_engine.py)
+    REFRESH_MODE = os.environ.get("REFRESH_MODE", "full")
+
+    # Connections used at once by the "parallel" / "incremental" / "engine" modes.
+    PARALLEL_QUERY_WORKERS = int(os.environ.get("PARALLEL_QUERY_WORKERS", "4"))
+
     # ── Cache ────────────────────────────────────────────────
     # Hour of day (24h) when the daily cache window opens.
     # First request at or after this hour triggers a DB fetch.
     CACHE_HOUR = int(os.environ.get("CACHE_HOUR", "9"))
 
+    # Local working directory for cache coordination files (lock file,
+    # snapshots). Must be on a disk shared by every gunicorn worker.
+    CACHE_DIR = os.environ.get(
+        "CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache"),
+    )
+
+    # Max seconds a caller waits on an in-flight refresh (its own worker's
+    # or another worker's) before giving up and keeping the current snapshot.
+    REFRESH_WAIT_TIMEOUT = int(os.environ.get("REFRESH_WAIT_TIMEOUT", "600"))
+
+    # After the day's refresh, the scheduler probes the warehouse watermark
+    # this often and reloads only if it moved (late ETL). 0 disables.
+    WATERMARK_PROBE_MINUTES = int(os.environ.get("WATERMARK_PROBE_MINUTES", "30"))
+
+    # Warehouse circuit breaker: opens after this many consecutive failed
+    # refreshes; half-open probes then back off from BASE doubling up to MAX.
+    BREAKER_FAILURE_THRESHOLD    = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "3"))
+    BREAKER_BACKOFF_BASE_SECONDS = int(os.environ.get("BREAKER_BACKOFF_BASE_SECONDS", "60"))
+    BREAKER_BACKOFF_MAX_SECONDS  = int(os.environ.get("BREAKER_BACKOFF_MAX_SECONDS", "1800"))
+
+    # Per-scope pre-serialised API bodies (plain + gzip), LRU-bounded.
+    # Entries include small summary / leaderboard / churn pages, so the
+    # count limit is generous; the byte limit is what bounds memory.
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    RESPONSE_CACHE_MAX_BYTES   = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    # Smart Insights results kept per (scope, slicer filters), LRU-bounded.
+    INSIGHTS_CACHE_SIZE = int(os.environ.get("INSIGHTS_CACHE_SIZE", "256"))
+
     # ── SMTP ─────────────────────────────────────────────────
     SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
     SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
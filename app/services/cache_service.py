@@ -1,20 +1,85 @@
+import os
+import threading
 import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from flask import current_app
 
+from app.services.circuit_breaker import (
+    allow_refresh,
+    is_open,
+    open_message,
+    record_failure,
+    record_success,
+)
+
 
 # ── In-memory cache store ─────────────────────────────────────────────────────
 # This lives for the lifetime of the Python process.
 # All requests share this same dict.
+#
+# The dict is never mutated in place after a load — refresh_data() builds a
+# complete new snapshot and swaps the module-level reference in one step, so a
+# request that already holds the old snapshot keeps a consistent view of it.
+#
+# Across gunicorn workers the data itself lives in ONE memory-mapped snapshot
+# file (see snapshot_store.py) holding a ColumnarSnapshot (see columnar.py);
+# "data" is a lazy row view over it, so adding workers doesn't multiply the
+# dataset in RAM and existing row-based callers keep working.
 _DATA_CACHE: dict = {
     "timestamp":  0,       # epoch float — when cache was last populated
     "columns":    [],      # list of column name strings
-    "data":       [],      # list of rows (each row is a list)
+    "data":       [],      # sequence of rows (each row is a list)
     "column_map": {},      # column name → index, for fast RLS lookups
+    "generation": None,    # shared snapshot generation this worker is serving
+    "snapshot":   None,    # ColumnarSnapshot — NumPy columns behind "data"
+    "previous":   None,    # the snapshot served before it — base for /api/data?since=
+}
+
+# Last seen (inode, mtime) of the shared snapshot pointer file — lets every
+# request check for a new generation with a single os.stat().
+_SHARED_POINTER: dict = {"stamp": None}
+
+# ── Background refresh state ──────────────────────────────────────────────────
+_REFRESH_STATE: dict = {
+    "running":    False,   # True while a background refresh thread is loading
+    "started_at": 0,       # epoch float — when the current/last background load began
+    "last_error": None,    # error string from the last failed background load
+}
+_refresh_state_lock = threading.Lock()
+
+# ── Single-flight coordination ────────────────────────────────────────────────
+# At most one load runs per worker; everyone else waits on its Event.
+_IN_FLIGHT: dict = {
+    "load": None,          # {"done": Event, "error": str|None} while a load runs
+}
+_flight_lock = threading.Lock()
+
+_REFRESH_METRICS: dict = {
+    "loads":               0,     # loads this worker actually ran against MSSQL
+    "failures":            0,     # of those, how many raised
+    "merged_in_process":   0,     # callers that joined another thread's in-flight load
+    "merged_cross_worker": 0,     # loads that had to wait for another worker's lock
+    "wait_timeouts":       0,     # waiters that gave up and kept the current snapshot
+    "last_load_seconds":   None,  # wall-clock of the last completed MSSQL load
 }
 
+# ── Watermark probe ───────────────────────────────────────────────────────────
+# A cheap query run before the heavy one; if the warehouse hasn't moved since
+# the current snapshot was loaded, the heavy query is skipped.
+_PROBE_STATE: dict = {
+    "probes":             0,
+    "skipped_loads":      0,     # heavy queries avoided because nothing moved
+    "failures":           0,
+    "last_probe_at":      None,  # "dd Mon YYYY, HH:MM:SS AM"
+    "last_probe_seconds": None,
+    "last_watermark":     None,  # dict returned by the last successful probe
+    "last_decision":      None,  # human-readable outcome of the last probe
+}
+
+_REFRESH_LOCK_FILENAME = "refresh.lock"
+
 
 # ── Public accessors ──────────────────────────────────────────────────────────
 
@@ -23,6 +88,14 @@ def get_cache() -> dict:
     return _DATA_CACHE
 
 
+def get_snapshot():
+    """
+    Returns the current ColumnarSnapshot, or None before the first load.
+    Use this for vectorised scans; get_cache()["data"] for row access.
+    """
+    return _DATA_CACHE["snapshot"]
+
+
 def cache_is_fresh() -> bool:
     """
     Returns True if the cache was populated within the current 9 AM window.
@@ -56,6 +129,156 @@ def get_cache_window_start() -> datetime:
     return _get_cache_window_start()
 
 
+def snapshot_age_seconds() -> Optional[int]:
+    """Seconds since the current snapshot was loaded, or None if never loaded."""
+    if not _DATA_CACHE["timestamp"]:
+        return None
+    return int(time.time() - _DATA_CACHE["timestamp"])
+
+
+def is_refreshing() -> bool:
+    """True while a background refresh is building the next snapshot."""
+    return _REFRESH_STATE["running"]
+
+
+def ensure_cache() -> Optional[str]:
+    """
+    Request-path entry point — stale-while-revalidate.
+
+      - Cache fresh          → nothing to do
+      - Cache stale          → start a background refresh (if one isn't
+                               already running) and return immediately;
+                               the caller serves the previous snapshot
+      - Cache empty          → blocking load, there is nothing else to serve
+                               (cold start only)
+
+    Returns:
+      None         when there is data to serve
+      str          error message if a cold-start load failed
+    """
+    sync_shared_snapshot()
+
+    if cache_is_fresh():
+        return None
+
+    if not _DATA_CACHE["data"]:
+        return refresh_data()
+
+    refresh_data_async()
+    return None
+
+
+def sync_shared_snapshot() -> bool:
+    """
+    Switches this worker to the newest shared snapshot if another worker
+    (or this one) has published a new generation since we last looked.
+
+    Returns True if a new generation was picked up.
+    """
+    from app.services.snapshot_store import open_snapshot, pointer_stamp, read_pointer
+
+    cache_dir = current_app.config["CACHE_DIR"]
+    stamp     = pointer_stamp(cache_dir)
+    if stamp is None or stamp == _SHARED_POINTER["stamp"]:
+        return False
+
+    pointer = read_pointer(cache_dir)
+    if pointer is None:
+        return False
+    generation, filename = pointer
+    if generation == _DATA_CACHE["generation"]:
+        _SHARED_POINTER["stamp"] = stamp
+        return False
+
+    try:
+        snap = open_snapshot(cache_dir, filename)
+    except (OSError, ValueError) as e:
+        # Remember the stamp anyway — re-verifying a corrupt file on every
+        # request won't fix it; the next publish replaces CURRENT.
+        _SHARED_POINTER["stamp"] = stamp
+        current_app.logger.error(f"Could not map shared snapshot {filename}: {e}")
+        return False
+
+    _publish_snapshot(snap)
+    _SHARED_POINTER["stamp"] = stamp
+    current_app.logger.info(
+        f"Using shared snapshot generation {snap.generation} ({snap.row_count:,} rows)"
+    )
+    return True
+
+
+def warm_start_from_disk() -> bool:
+    """
+    Called once by create_app(). Maps the newest intact snapshot left on
+    disk by a previous run, if it was loaded inside the current CACHE_HOUR
+    window — a deploy or worker restart then serves data within seconds
+    instead of waiting for a full MSSQL load.
+
+    Snapshots that fail verification (truncated, partial, corrupt, older
+    format) are logged and skipped in favour of the next-newest one.
+
+    Returns True if a snapshot was loaded.
+    """
+    from app.services.snapshot_store import list_snapshots, open_snapshot, pointer_stamp
+
+    cache_dir    = current_app.config["CACHE_DIR"]
+    window_start = _get_cache_window_start().timestamp()
+    stamp        = pointer_stamp(cache_dir)
+
+    for generation, filename in list_snapshots(cache_dir):
+        try:
+            snap = open_snapshot(cache_dir, filename)
+        except (OSError, ValueError) as e:
+            current_app.logger.warning(f"Ignoring snapshot {filename}: {e}")
+            continue
+
+        if snap.timestamp < window_start:
+            current_app.logger.info(
+                f"Newest snapshot on disk (generation {generation}) predates the "
+                f"current window — waiting for a fresh load"
+            )
+            return False
+
+        _publish_snapshot(snap)
+        _SHARED_POINTER["stamp"] = stamp
+        current_app.logger.info(
+            f"Warm start — serving snapshot generation {generation} "
+            f"({snap.row_count:,} rows, loaded {format_loaded_at(snap.timestamp)})"
+        )
+        return True
+
+    return False
+
+
+def refresh_data_async() -> bool:
+    """
+    Starts a background thread that runs refresh_data().
+    The current snapshot keeps being served until the new one is swapped in.
+
+    Returns True if a new thread was started, False if one was already
+    running or the circuit breaker is open.
+    """
+    if is_open():
+        return False
+
+    with _refresh_state_lock:
+        if _REFRESH_STATE["running"]:
+            return False
+        _REFRESH_STATE["running"]    = True
+        _REFRESH_STATE["started_at"] = time.time()
+
+    app    = current_app._get_current_object()
+    thread = threading.Thread(
+        target = _background_refresh,
+        args   = (app,),
+        daemon = True,
+        name   = "SamarthCacheRefresh",
+    )
+    thread.start()
+    app.logger.info("Cache stale — serving previous snapshot, refreshing in background")
+    return True
+
+
 def refresh_data(force: bool = False) -> Optional[str]:
     """
     Loads fresh data from MSSQL into the cache.
@@ -67,37 +290,51 @@ def refresh_data(force: bool = False) -> Optional[str]:
       → Always fetches, ignores cache state.
       → Used by the Superadmin 'Force Refresh' button.
 
+    Single-flight: concurrent callers in this worker (requests, the
+    scheduler thread, the Force Refresh button) are merged into one
+    in-flight load — the first caller runs it, the rest wait for and share
+    its result. Across gunicorn workers a lock file under CACHE_DIR makes
+    sure only one worker runs the query at a time.
+
+    Before the heavy query, a watermark probe (see fetch_watermark) checks
+    whether the warehouse changed since the current snapshot was loaded; if
+    not, the snapshot is re-stamped as fresh and the query is skipped.
+    force=True always runs the query.
+
+    A waiter that times out keeps serving the current snapshot.
+
+    While the circuit breaker is open (see circuit_breaker.py) the
+    warehouse isn't touched at all and the error is returned at once;
+    force=True is always let through.
+
     Returns:
       None         on success
       str          error message on failure
     """
-    if not force and cache_is_fresh():
-        return None
+    if not force:
+        sync_shared_snapshot()
+        if cache_is_fresh():
+            return None
 
-    current_app.logger.info("Fetching fresh data from MSSQL...")
+    if not allow_refresh(force):
+        return open_message()
 
-    try:
-        # Import here to avoid circular imports at module load time
-        from app.services.mssql_service import fetch_performance_data
+    return _single_flight("always" if force else "if_stale")
 
-        columns, rows = fetch_performance_data()
 
-        _DATA_CACHE.update({
-            "timestamp":  time.time(),
-            "columns":    columns,
-            "data":       rows,
-            "column_map": {name: i for i, name in enumerate(columns)},
-        })
-
-        current_app.logger.info(
-            f"Cache ready — {len(rows):,} rows. "
-            f"Next refresh: {next_cache_refresh():%d %b %Y, %I:%M %p}"
-        )
-        return None
+def refresh_if_changed() -> Optional[str]:
+    """
+    Intraday check used by the scheduler: probes the warehouse and reloads
+    only if the watermark moved since the current snapshot was taken — e.g.
+    the nightly ETL landed after CACHE_HOUR. Never runs the heavy query when
+    the probe itself fails.
 
-    except Exception as e:
-        current_app.logger.error(f"Cache refresh failed: {e}")
-        return str(e)
+    Returns None on success (including "nothing changed"), str error on failure.
+    """
+    sync_shared_snapshot()
+    if not allow_refresh():
+        return open_message()
+    return _single_flight("if_changed")
 
 
 def get_cache_status() -> dict:
@@ -105,6 +342,15 @@ def get_cache_status() -> dict:
     Returns a dict describing current cache state.
     Used by the /api/cache-status endpoint.
     """
+    from app.services.circuit_breaker import breaker_status
+    from app.services.response_cache import response_cache_stats
+
+    try:
+        from app.services.mssql_service import pool_status
+        mssql_pool = pool_status()
+    except ImportError:
+        mssql_pool = None      # no ODBC driver on this host (DATA_SOURCE=sqlite)
+
     return {
         "is_fresh":     cache_is_fresh(),
         "loaded_at":    (
@@ -115,18 +361,323 @@ def get_cache_status() -> dict:
         "next_refresh": next_cache_refresh().strftime("%d %b %Y, %I:%M %p"),
         "row_count":    len(_DATA_CACHE["data"]),
         "cache_hour":   current_app.config["CACHE_HOUR"],
+        "snapshot_age_seconds": snapshot_age_seconds(),
+        "refreshing":   is_refreshing(),
+        "last_background_error": _REFRESH_STATE["last_error"],
+        "generation":   _DATA_CACHE["generation"],
+        "snapshot_bytes": _DATA_CACHE["snapshot"].nbytes if _DATA_CACHE["snapshot"] else 0,
+        "refresh_in_flight": _IN_FLIGHT["load"] is not None,
+        "refresh_metrics":   dict(_REFRESH_METRICS),
+        "response_cache":    response_cache_stats(),
+        "watermark_probe":   dict(_PROBE_STATE),
+        "snapshot_watermark": _DATA_CACHE["snapshot"].watermark if _DATA_CACHE["snapshot"] else None,
+        "mssql_pool":        mssql_pool,
+        "circuit_breaker":   breaker_status(),
     }
 
 
-def format_loaded_at() -> str:
-    """Returns a short human-readable string of when data was last loaded."""
-    if not _DATA_CACHE["timestamp"]:
+def format_loaded_at(timestamp: Optional[float] = None) -> str:
+    """
+    Returns a short human-readable string of when data was last loaded
+    (or of the given load timestamp).
+    """
+    if timestamp is None:
+        timestamp = _DATA_CACHE["timestamp"]
+    if not timestamp:
         return "Never"
-    return datetime.fromtimestamp(_DATA_CACHE["timestamp"]).strftime("%d %b, %I:%M %p")
+    return datetime.fromtimestamp(timestamp).strftime("%d %b, %I:%M %p")
 
 
 # ── Private helpers ───────────────────────────────────────────────────────────
 
+def _publish_snapshot(snapshot) -> None:
+    """
+    Atomically replaces the served snapshot.
+    Rebinding the module global is a single reference swap, so readers see
+    either the complete old snapshot or the complete new one — never a mix.
+    """
+    from app.services.churn import get_churn_index
+    from app.services.facets import get_facet_index
+    from app.services.scope_index import get_scope_index
+    from app.services.search_index import get_search_index
+
+    # Build the RLS indexes, name search index, churn tiers and slicer
+    # bitmaps before the snapshot becomes visible, so no request ever pays
+    # for them.
+    get_scope_index(snapshot)
+    get_search_index(snapshot)
+    get_churn_index(snapshot)
+    get_facet_index(snapshot)
+
+    global _DATA_CACHE
+
+    # Keep the snapshot being replaced: pages still showing it can ask for
+    # a delta against it instead of a full reload.
+    previous = _DATA_CACHE["snapshot"]
+    if previous is not None and previous.version == snapshot.version:
+        previous = _DATA_CACHE["previous"]
+
+    _DATA_CACHE = {
+        "timestamp":  snapshot.timestamp,
+        "columns":    snapshot.columns,
+        "data":       snapshot.rows,
+        "column_map": snapshot.column_map,
+        "generation": snapshot.generation,
+        "snapshot":   snapshot,
+        "previous":   previous,
+    }
+
+
+def _single_flight(mode: str) -> Optional[str]:
+    """Runs _run_coordinated_load(mode), merging concurrent callers into one load."""
+    with _flight_lock:
+        flight = _IN_FLIGHT["load"]
+        leader = flight is None
+        if leader:
+            flight = {"done": threading.Event(), "error": None}
+            _IN_FLIGHT["load"] = flight
+        else:
+            _REFRESH_METRICS["merged_in_process"] += 1
+
+    if not leader:
+        return _wait_for_flight(flight)
+
+    try:
+        flight["error"] = _run_coordinated_load(mode)
+    except Exception as e:
+        flight["error"] = str(e)
+    finally:
+        with _flight_lock:
+            _IN_FLIGHT["load"] = None
+        flight["done"].set()
+
+    return flight["error"]
+
+
+def _wait_for_flight(flight: dict) -> Optional[str]:
+    """Blocks until the in-flight load finishes, then shares its result."""
+    timeout = current_app.config["REFRESH_WAIT_TIMEOUT"]
+    if flight["done"].wait(timeout):
+        return flight["error"]
+
+    _REFRESH_METRICS["wait_timeouts"] += 1
+    if _DATA_CACHE["data"]:
+        current_app.logger.warning(
+            f"Refresh still running after {timeout}s — keeping current snapshot"
+        )
+        return None
+    return f"Data refresh still in progress after {timeout}s"
+
+
+def _run_coordinated_load(mode: str) -> Optional[str]:
+    """
+    Leader path of refresh_data(): takes the cross-worker lock file and runs
+    the actual MSSQL load. If another worker already holds the lock, waits
+    for it and adopts the snapshot it published instead of sending a second
+    copy of the query to the BI server.
+
+    mode:
+      "always"     — force refresh: run the heavy query regardless
+      "if_stale"   — skip if fresh; otherwise probe, load only if it moved
+      "if_changed" — probe even if fresh, load only if it moved
+    """
+    from app.services.file_lock import InterProcessLock
+
+    lock = InterProcessLock(
+        os.path.join(current_app.config["CACHE_DIR"], _REFRESH_LOCK_FILENAME)
+    )
+    timeout        = current_app.config["REFRESH_WAIT_TIMEOUT"]
+    gen_before     = _DATA_CACHE["generation"]
+    waited_on_peer = False
+
+    if not lock.acquire(timeout=0):
+        waited_on_peer = True
+        _REFRESH_METRICS["merged_cross_worker"] += 1
+        current_app.logger.info("Another worker is refreshing — waiting for its lock")
+        if not lock.acquire(timeout=timeout):
+            _REFRESH_METRICS["wait_timeouts"] += 1
+            if _DATA_CACHE["data"]:
+                return None
+            return f"Another worker is still refreshing after {timeout}s"
+
+    try:
+        # Another worker may have published while we waited (or just before
+        # we got here) — share its snapshot rather than re-running the query.
+        sync_shared_snapshot()
+        adopted = _DATA_CACHE["generation"] != gen_before
+        if waited_on_peer and adopted:
+            record_success()
+            return None
+        if mode == "if_stale" and cache_is_fresh():
+            # Someone loaded this window already — if this call was the
+            # half-open probe, that still settles it.
+            record_success()
+            return None
+        # The peer we waited for may have been a failed breaker probe.
+        if mode != "always" and is_open():
+            return open_message()
+
+        watermark, error = _probe_watermark(mode)
+        if error is None:
+            if watermark is None or mode == "always" or watermark != _current_watermark():
+                error = _load_from_mssql(watermark)
+            else:
+                error = _revalidate_snapshot(watermark)
+
+        if error:
+            record_failure(error)
+        else:
+            record_success()
+        return error
+    finally:
+        lock.release()
+
+
+def _current_watermark() -> Optional[dict]:
+    snapshot = _DATA_CACHE["snapshot"]
+    return snapshot.watermark if snapshot is not None else None
+
+
+def _probe_watermark(mode: str) -> tuple[Optional[dict], Optional[str]]:
+    """
+    Runs the watermark probe and records the decision it leads to.
+
+    Returns (watermark, None) normally. A failed probe returns (None, None)
+    — fall through to the full load — except in "if_changed" mode, where it
+    returns (None, error) so a flaky DB doesn't trigger heavy queries.
+    """
+    from app.services.data_source import fetch_watermark
+
+    _PROBE_STATE["probes"] += 1
+    _PROBE_STATE["last_probe_at"] = datetime.now().strftime("%d %b %Y, %I:%M:%S %p")
+    started = time.monotonic()
+
+    try:
+        watermark = fetch_watermark()
+    except Exception as e:
+        _PROBE_STATE["failures"] += 1
+        _PROBE_STATE["last_probe_seconds"] = round(time.monotonic() - started, 2)
+        if mode == "if_changed":
+            _PROBE_STATE["last_decision"] = "probe failed — no load"
+            current_app.logger.error(f"Watermark probe failed: {e}")
+            return None, str(e)
+        _PROBE_STATE["last_decision"] = "probe failed — full load"
+        current_app.logger.warning(f"Watermark probe failed, running full load anyway: {e}")
+        return None, None
+
+    _PROBE_STATE["last_probe_seconds"] = round(time.monotonic() - started, 2)
+    _PROBE_STATE["last_watermark"]     = watermark
+
+    previous = _current_watermark()
+    if mode == "always":
+        decision = "forced — full load"
+    elif previous is None:
+        decision = "no previous watermark — full load"
+    elif watermark != previous:
+        moved    = ", ".join(k for k in watermark if watermark.get(k) != previous.get(k))
+        decision = f"moved ({moved}) — full load"
+    else:
+        decision = "unchanged — query skipped"
+        _PROBE_STATE["skipped_loads"] += 1
+
+    _PROBE_STATE["last_decision"] = decision
+    current_app.logger.info(
+        f"Watermark probe ({_PROBE_STATE['last_probe_seconds']}s): {watermark} → {decision}"
+    )
+    return watermark, None
+
+
+def _revalidate_snapshot(watermark: dict) -> Optional[str]:
+    """
+    The warehouse hasn't moved: keep the current data but stamp it as loaded
+    now, so every worker treats it as fresh for this window. Costs one local
+    file write instead of the performance query.
+    """
+    from app.services.columnar import ColumnarSnapshot
+
+    current = _DATA_CACHE["snapshot"]
+    if cache_is_fresh():
+        return None
+
+    snapshot = ColumnarSnapshot(
+        current.columns, current.cols, current.row_count, time.time(), watermark=watermark,
+    )
+    try:
+        _write_shared_snapshot(snapshot)
+    except OSError as e:
+        current_app.logger.error(f"Could not write shared snapshot: {e}")
+        _publish_snapshot(snapshot)
+
+    current_app.logger.info(
+        f"Cache re-validated — {snapshot.row_count:,} rows unchanged. "
+        f"Next refresh: {next_cache_refresh():%d %b %Y, %I:%M %p}"
+    )
+    return None
+
+
+def _load_from_mssql(watermark: Optional[dict] = None) -> Optional[str]:
+    """
+    Runs the performance query and publishes the result as the new snapshot.
+    The watermark was probed BEFORE the query, so anything that lands during
+    it shows up as a moved watermark on the next probe — never as a miss.
+    """
+    current_app.logger.info(f"Fetching fresh data from {current_app.config['DATA_SOURCE']}...")
+    _REFRESH_METRICS["loads"] += 1
+    started = time.monotonic()
+
+    try:
+        # Import here to avoid circular imports at module load time
+        from app.services.data_source import fetch_performance_snapshot
+
+        snapshot = fetch_performance_snapshot()
+        snapshot.watermark = watermark
+
+        try:
+            _write_shared_snapshot(snapshot)
+        except OSError as e:
+            # Disk trouble shouldn't cost us the data we just paid for —
+            # serve it from this worker's memory; peers will load their own.
+            current_app.logger.error(f"Could not write shared snapshot: {e}")
+            _publish_snapshot(snapshot)
+
+        _REFRESH_METRICS["last_load_seconds"] = round(time.monotonic() - started, 2)
+        current_app.logger.info(
+            f"Cache ready — {snapshot.row_count:,} rows in "
+            f"{_REFRESH_METRICS['last_load_seconds']}s. "
+            f"Next refresh: {next_cache_refresh():%d %b %Y, %I:%M %p}"
+        )
+        return None
+
+    except Exception as e:
+        _REFRESH_METRICS["failures"] += 1
+        current_app.logger.error(f"Cache refresh failed: {e}")
+        return str(e)
+
+
+def _write_shared_snapshot(snapshot) -> None:
+    """Writes a snapshot as a new shared generation and switches to it."""
+    from app.services.snapshot_store import write_snapshot
+
+    generation = write_snapshot(current_app.config["CACHE_DIR"], snapshot)
+    sync_shared_snapshot()
+    if _DATA_CACHE["generation"] != generation:
+        raise OSError(f"snapshot generation {generation} was written but could not be mapped")
+
+
+def _background_refresh(app) -> None:
+    """Thread target for refresh_data_async(). Runs inside its own app context."""
+    try:
+        with app.app_context():
+            error = refresh_data()
+        _REFRESH_STATE["last_error"] = error
+    except Exception as exc:
+        _REFRESH_STATE["last_error"] = str(exc)
+        app.logger.error(f"Background cache refresh crashed: {exc}")
+    finally:
+        with _refresh_state_lock:
+            _REFRESH_STATE["running"] = False
+
+
 def _get_cache_window_start() -> datetime:
     """
     Returns the start of the current 9 AM cache window.
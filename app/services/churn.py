@@ -0,0 +1,205 @@
+"""
+app/services/churn.py — Heritage Samarth | Churn-risk tier index
+=================================================================
+The Customer tab's Churn Risk Radar: declining accounts sorted into tiers
+once per snapshot, so a drill-down page is a slice of a precomputed order
+intersected with the user's rows, never a rescan of the dataset.
+
+  critical   gone dark (LYMTD > 1, MTD = 0) or a YoY drop worse than 50%
+  high       drop worse than 30%
+  watch      drop worse than 10%
+
+Only rows with Sales_Trend "Decline" are tiered — the same rules
+renderCustomerInsightsTab() applied in dashboard.html.
+
+  get_churn_index(snapshot)   → ChurnIndex, built when the snapshot is published
+  ChurnIndex.page(view, …)    → one page of tiered rows + counts per tier
+
+A "view" is the boolean row mask of what one user sees after RLS and the
+slicer filters; tiers, sort orders and search all intersect with it.
+"""
+
+import threading
+
+import numpy as np
+
+from app.services.search_index import get_search_index
+from app.services.summary import DECLINE, metric_values, text_codes, trend_buckets
+
+TIERS = ("critical", "high", "watch")
+
+# Sort keys the drill-down table offers → the row field they order by.
+SORTS = {
+    "pct":   "pct",
+    "lpd":   "absDiff",
+    "mtd":   "mtd",
+    "lymtd": "lymtd",
+    "tier":  "tier",
+    "cust":  "cust",
+    "prod":  "prod",
+    "so":    "so",
+    "se":    "se",
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE     = 500
+
+# Text fields per row: field → (column, label for a blank value).
+_TEXT_FIELDS = {
+    "cust":  ("CustomerName", "Unknown"),
+    "se":    ("SE_Name",      ""),
+    "seMob": ("SE_Mobile",    ""),
+    "so":    ("SO_Name",      ""),
+    "prod":  ("Product",      ""),
+}
+
+# Fields searched through the snapshot's search index rather than a scan.
+_INDEXED_FIELDS = {"cust": "CustomerName", "se": "SE_Name", "so": "SO_Name"}
+
+
+class ChurnIndex:
+    """Tier of every declining row plus the values the drill-down shows."""
+
+    def __init__(self, snapshot):
+        everything = np.arange(snapshot.row_count, dtype=np.int32)
+        mtd    = metric_values(snapshot, "MTD", everything)
+        lymtd  = metric_values(snapshot, "LYMTD", everything)
+        pct    = metric_values(snapshot, "MTD_vs_LYMTD_Growth_Percentage", everything) * 100
+        drop   = np.abs(metric_values(snapshot, "MTD_vs_LYMTD_Abs_LPD_Diff", everything))
+
+        declining = trend_buckets(snapshot, everything) == DECLINE
+        gone_dark = (lymtd > 1) & (mtd == 0)
+        tier      = np.full(snapshot.row_count, -1, dtype=np.int8)
+        tier[declining & (pct < -10)] = 2
+        tier[declining & (pct < -30)] = 1
+        tier[declining & (gone_dark | (pct < -50))] = 0
+
+        self.tier      = tier
+        self.gone_dark = gone_dark
+        self.values    = {"mtd": mtd, "lymtd": lymtd, "pct": pct, "absDiff": drop}
+
+        # Per-tier row positions in snapshot order; "all" lists the tiers
+        # one after another, as the page concatenated them before sorting.
+        self.positions = {name: np.flatnonzero(tier == t).astype(np.int32) for t, name in enumerate(TIERS)}
+        self.positions["all"] = np.concatenate([self.positions[name] for name in TIERS])
+
+        self.text = {}
+        for field, (column, blank) in _TEXT_FIELDS.items():
+            if column in snapshot.column_map:
+                self.text[field] = text_codes(snapshot, column, blank)
+            else:
+                self.text[field] = (np.zeros(snapshot.row_count, dtype=np.int32), [blank])
+
+        index         = get_search_index(snapshot).fields
+        self._indexed = {f: index[c] for f, c in _INDEXED_FIELDS.items() if c in index}
+        self._orders  = {}
+        self._lock    = threading.Lock()
+
+    def counts(self, view: np.ndarray | None) -> dict:
+        """Rows per tier among the view (None = every row)."""
+        counts = {
+            name: int(len(p) if view is None else np.count_nonzero(view[p]))
+            for name, p in self.positions.items() if name != "all"
+        }
+        counts["total"] = sum(counts.values())
+        return counts
+
+    def order(self, tier: str, sort: str, descending: bool) -> np.ndarray:
+        """Positions of a tier ("all" for every tier) in sort order — memoised."""
+        key   = (tier, sort, descending)
+        order = self._orders.get(key)
+        if order is None:
+            base = self.positions[tier]
+            source = SORTS[sort]
+            if source == "tier":
+                keys = self.tier[base].astype(np.int64)
+            elif source in self.values:
+                keys = self.values[source][base]
+            else:
+                # Rank of each label, compared case-insensitively.
+                codes, labels = self.text[source]
+                lower = [l.lower() for l in labels]
+                rank  = {v: i for i, v in enumerate(sorted(set(lower)))}
+                keys  = np.array([rank[v] for v in lower], dtype=np.int64)[codes[base]]
+            order = base[np.argsort(-keys if descending else keys, kind="stable")]
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def page(
+        self,
+        view: np.ndarray | None,
+        tier: str = "all",
+        sort: str = "pct",
+        descending: bool = False,
+        search: str = "",
+        page: int = 1,
+        size: int | None = DEFAULT_PAGE_SIZE,
+    ) -> dict:
+        """
+        One page of the drill-down. size=None returns every matching row
+        (the CSV export). Counts always cover the whole view, so the tier
+        pills don't change while the user searches or pages.
+        """
+        order = self.order(tier, sort, descending)
+        if view is not None:
+            order = order[view[order]]
+        if search:
+            order = order[self._matches(order, search)]
+
+        total = len(order)
+        if size is None:
+            size, page, pages, start = max(total, 1), 1, 1, 0
+        else:
+            pages = max(1, -(-total // size))
+            page  = min(max(page, 1), pages)
+            start = (page - 1) * size
+        return {
+            "rows":   [self.row(int(i)) for i in order[start:start + size]],
+            "counts": self.counts(view),
+            "total":  total,
+            "page":   page,
+            "pages":  pages,
+            "size":   size,
+        }
+
+    def row(self, i: int) -> dict:
+        row = {"tier": TIERS[self.tier[i]], "goneDark": bool(self.gone_dark[i])}
+        for field, (codes, labels) in self.text.items():
+            row[field] = labels[codes[i]]
+        for field, values in self.values.items():
+            row[field] = float(values[i])
+        return row
+
+    # ── Private ───────────────────────────────────────────────
+    def _matches(self, order: np.ndarray, search: str) -> np.ndarray:
+        """
+        Rows whose customer, SE, SE mobile, SO or product contains search.
+        Customer, SE and SO names go through the snapshot's search index.
+        """
+        needle = search.lower()
+        hits   = np.zeros(len(order), dtype=bool)
+        for field, (codes, labels) in self.text.items():
+            indexed = self._indexed.get(field)
+            if indexed is not None:
+                hits |= indexed.label_mask(needle)[indexed.codes[order]]
+                continue
+            # Names match in any case; the mobile number as typed.
+            text      = labels if field == "seMob" else [l.lower() for l in labels]
+            label_hit = np.fromiter((needle in l for l in text), dtype=bool, count=len(labels))
+            hits |= label_hit[codes[order]]
+        return hits
+
+
+def get_churn_index(snapshot) -> ChurnIndex:
+    """The snapshot's ChurnIndex, built on first call and memoised on it."""
+    return snapshot.derived("churn_index", ChurnIndex)
+
+
+def view_mask(snapshot, positions: np.ndarray | None) -> np.ndarray | None:
+    """Boolean row mask for a position list; None (every row) stays None."""
+    if positions is None:
+        return None
+    mask = np.zeros(snapshot.row_count, dtype=bool)
+    mask[positions] = True
+    return mask
@@ -0,0 +1,203 @@
+"""
+app/services/circuit_breaker.py — Heritage Samarth | Warehouse circuit breaker
+===============================================================================
+Stops a down warehouse from costing every request a blocked connect.
+
+  closed     refreshes run normally; consecutive failures are counted
+  open       after BREAKER_FAILURE_THRESHOLD consecutive failures — no
+             refresh touches the DB, requests keep serving the last good
+             snapshot instantly
+  half_open  once next_probe_at passes, ONE refresh is let through as a
+             probe: success closes the breaker, failure re-opens it with
+             the wait doubled (BREAKER_BACKOFF_BASE_SECONDS × 2ⁿ, capped at
+             BREAKER_BACKOFF_MAX_SECONDS)
+
+The state lives in CACHE_DIR/breaker.json so every gunicorn worker shares
+one breaker: once any worker opens it, none of them dials the warehouse
+until the next probe. Reads are an os.stat() per check; the file is only
+rewritten on a state change or failure.
+
+A Superadmin Force Refresh is always let through and acts as a probe.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+_BREAKER_FILENAME = "breaker.json"
+
+_INITIAL_STATE = {
+    "state":                "closed",
+    "consecutive_failures": 0,
+    "total_failures":       0,
+    "failed_probes":        0,      # probes failed since the breaker opened → backoff exponent
+    "opened_at":            None,   # epoch
+    "next_probe_at":        None,   # epoch — when the next half-open probe may run
+    "probe_started_at":     None,   # epoch — while half_open
+    "last_error":           None,
+    "last_failure_at":      None,   # epoch
+}
+
+_state = dict(_INITIAL_STATE)
+_stamp = {"mtime": None}
+_lock  = threading.Lock()
+
+
+def allow_refresh(force: bool = False) -> bool:
+    """
+    True if a refresh may touch the warehouse now. When an open breaker's
+    backoff has elapsed this call moves it to half_open and the caller
+    becomes the probe. force=True (Force Refresh) always passes.
+    """
+    with _lock:
+        _sync()
+        now = time.time()
+
+        if _state["state"] == "closed" or force:
+            return True
+
+        if _state["state"] == "half_open":
+            # A probe is already out; let another through only if it got stuck.
+            lease = current_app.config["REFRESH_WAIT_TIMEOUT"]
+            if now - (_state["probe_started_at"] or 0) < lease:
+                return False
+
+        elif now < (_state["next_probe_at"] or 0):
+            return False
+
+        _state["state"]            = "half_open"
+        _state["probe_started_at"] = now
+        _save()
+    current_app.logger.info("Circuit breaker half-open — probing the warehouse")
+    return True
+
+
+def record_success() -> None:
+    """A refresh reached the warehouse and completed — close the breaker."""
+    with _lock:
+        _sync()
+        if _state["state"] == "closed" and not _state["consecutive_failures"]:
+            return
+        was_open = _state["state"] != "closed"
+        _state.update(
+            state="closed", consecutive_failures=0, failed_probes=0,
+            opened_at=None, next_probe_at=None, probe_started_at=None,
+        )
+        _save()
+    if was_open:
+        current_app.logger.info("Circuit breaker closed — warehouse reachable again")
+
+
+def record_failure(error: str) -> None:
+    """A refresh failed against the warehouse — count it, open or re-open."""
+    cfg = current_app.config
+    with _lock:
+        _sync()
+        now = time.time()
+        _state["consecutive_failures"] += 1
+        _state["total_failures"]       += 1
+        _state["last_error"]            = error
+        _state["last_failure_at"]       = now
+
+        if _state["state"] == "half_open":
+            _state["failed_probes"] += 1
+            _open(now, cfg)
+        elif (
+            _state["state"] == "closed"
+            and _state["consecutive_failures"] >= cfg["BREAKER_FAILURE_THRESHOLD"]
+        ):
+            _state["opened_at"] = now
+            _open(now, cfg)
+        _save()
+        state, next_probe = _state["state"], _state["next_probe_at"]
+
+    if state == "open":
+        current_app.logger.warning(
+            f"Circuit breaker open — no warehouse queries until "
+            f"{datetime.fromtimestamp(next_probe):%I:%M:%S %p} ({error})"
+        )
+
+
+def is_open() -> bool:
+    """True while the breaker is open and its next probe is still in the future."""
+    with _lock:
+        _sync()
+        return _state["state"] == "open" and time.time() < (_state["next_probe_at"] or 0)
+
+
+def open_message() -> str:
+    """Error string for a refresh the breaker refused."""
+    with _lock:
+        next_probe = _state["next_probe_at"]
+    when = f"{datetime.fromtimestamp(next_probe):%I:%M:%S %p}" if next_probe else "shortly"
+    return f"Warehouse unavailable — circuit breaker open, next attempt at {when}"
+
+
+def breaker_status() -> dict:
+    """State, failure counts and next-probe time, for get_cache_status()."""
+    with _lock:
+        _sync()
+        status = dict(_state)
+
+    def fmt(ts):
+        return datetime.fromtimestamp(ts).strftime("%d %b %Y, %I:%M:%S %p") if ts else None
+
+    status["threshold"]          = current_app.config["BREAKER_FAILURE_THRESHOLD"]
+    status["next_probe_in"]      = (
+        max(0, int(status["next_probe_at"] - time.time())) if status["next_probe_at"] else None
+    )
+    for key in ("opened_at", "next_probe_at", "probe_started_at", "last_failure_at"):
+        status[key] = fmt(status[key])
+    return status
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _open(now: float, cfg) -> None:
+    backoff = min(
+        cfg["BREAKER_BACKOFF_BASE_SECONDS"] * (2 ** _state["failed_probes"]),
+        cfg["BREAKER_BACKOFF_MAX_SECONDS"],
+    )
+    _state["state"]            = "open"
+    _state["next_probe_at"]    = now + backoff
+    _state["probe_started_at"] = None
+
+
+def _path() -> str:
+    return os.path.join(current_app.config["CACHE_DIR"], _BREAKER_FILENAME)
+
+
+def _sync() -> None:
+    """Reloads the shared state if another worker changed it. Caller holds _lock."""
+    try:
+        mtime = os.stat(_path()).st_mtime_ns
+    except OSError:
+        return
+    if mtime == _stamp["mtime"]:
+        return
+    try:
+        with open(_path(), encoding="utf-8") as f:
+            loaded = json.load(f)
+    except (OSError, ValueError):
+        return
+    _state.update({k: loaded.get(k, v) for k, v in _INITIAL_STATE.items()})
+    _stamp["mtime"] = mtime
+
+
+def _save() -> None:
+    """Publishes the state to the other workers. Caller holds _lock."""
+    path = _path()
+    tmp  = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(_state, f)
+        os.replace(tmp, path)
+        _stamp["mtime"] = os.stat(path).st_mtime_ns
+    except OSError as e:
+        # The breaker still works for this worker from memory.
+        current_app.logger.error(f"Could not write circuit breaker state: {e}")
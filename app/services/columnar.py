@@ -0,0 +1,504 @@
+"""
+app/services/columnar.py — Heritage Samarth | Columnar snapshot
+================================================================
+Compact in-memory representation of the performance query result.
+
+Instead of one boxed Python object per cell, each column is one NumPy array:
+  - LPD metrics, diffs, growth %      → float64   (NaN = SQL NULL / "")
+  - Last_Order_Date                   → int32 day numbers since 1970-01-01
+  - low-cardinality text (State,
+    Region, SO_Name, Product, …)      → small integer codes into a
+                                        per-column dictionary of values
+  - plain integer columns             → int64
+
+Rows are still available on demand (snapshot.rows / snapshot.rows_at()) in
+exactly the shape the warehouse query returns them (cleaned cells), so
+existing callers keep working while new code scans the arrays directly.
+
+Snapshots are built either from a full list of rows (from_rows) or
+incrementally from cursor batches (SnapshotBuilder / snapshot_from_cursor),
+which never holds more than one batch of raw rows in memory.
+"""
+
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+
+# Columns that are always treated as float metrics, whatever the driver
+# hands back (Decimal → float, ISNULL(…, 0) → 0).
+METRIC_COLUMNS = (
+    "LYSM", "LYMTD", "LQ", "LM", "LMTD", "MTD", "LW", "CW",
+    "YoY_Abs_LPD_Diff", "MTD_vs_LMTD_Abs_LPD_Diff", "MTD_vs_LYMTD_Abs_LPD_Diff",
+    "YoY_Growth_Percentage", "MTD_vs_LMTD_Growth_Percentage", "MTD_vs_LYMTD_Growth_Percentage",
+)
+
+# "YYYY-MM-DD" columns stored as int32 day numbers.
+DATE_COLUMNS = ("Last_Order_Date",)
+
+NO_DATE  = np.iinfo(np.int32).min     # day-number sentinel for a blank date
+_EPOCH   = date(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+_ROW_CHUNK = 4096                     # rows materialised per batch when iterating
+
+
+# ══════════════════════════════════════════════════════════════
+# COLUMN TYPES
+# ══════════════════════════════════════════════════════════════
+
+class FloatColumn:
+    kind = "float"
+
+    def __init__(self, data: np.ndarray):
+        self.data     = data
+        self._has_nan = bool(np.isnan(data).any())
+
+    def values_at(self, idx) -> list:
+        out = self.data[idx].tolist()
+        if self._has_nan:
+            out = ["" if v != v else v for v in out]
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+
+class IntColumn:
+    kind = "int"
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def values_at(self, idx) -> list:
+        return self.data[idx].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+
+class DictColumn:
+    """Dictionary-encoded column: codes[i] indexes into values."""
+    kind = "dict"
+
+    def __init__(self, codes: np.ndarray, values: list):
+        self.data    = codes
+        self.values  = values
+        self._lookup = np.empty(len(values), dtype=object)
+        self._lookup[:] = values
+
+    def values_at(self, idx) -> list:
+        return self._lookup[self.data[idx]].tolist()
+
+    def code_of(self, value) -> int | None:
+        """Dictionary code for value, or None if it never occurs."""
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return None
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + sum(
+            len(v) if isinstance(v, str) else 8 for v in self.values
+        )
+
+
+class DateColumn:
+    """Dates as int32 days since 1970-01-01; NO_DATE means blank."""
+    kind = "date"
+
+    def __init__(self, days: np.ndarray):
+        self.data = days
+        uniq      = np.unique(days)
+        self._text = {
+            int(d): ("" if d == NO_DATE else (_EPOCH + timedelta(days=int(d))).isoformat())
+            for d in uniq
+        }
+
+    def values_at(self, idx) -> list:
+        text = self._text
+        return [text[d] for d in self.data[idx].tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+
+# ══════════════════════════════════════════════════════════════
+# SNAPSHOT
+# ══════════════════════════════════════════════════════════════
+
+class ColumnarSnapshot:
+    """
+    One immutable load of the performance dataset.
+
+    Attributes:
+      columns    — column names in query order
+      row_count  — number of rows
+      timestamp  — epoch float when the data was loaded
+      generation — shared snapshot generation, None if not file-backed
+      version    — opaque ID of this load, identical in every worker
+      watermark  — warehouse probe taken just before the load (dict), or None
+    """
+
+    def __init__(self, columns: list[str], cols: list, row_count: int,
+                 timestamp: float, generation: int | None = None,
+                 watermark: dict | None = None):
+        self.columns    = list(columns)
+        self.column_map = {name: i for i, name in enumerate(self.columns)}
+        self.cols       = cols
+        self.row_count  = row_count
+        self.timestamp  = timestamp
+        self.generation = generation
+        self.watermark  = watermark
+        self.rows       = RowView(self)
+
+        self._derived      = {}
+        self._derived_lock = threading.RLock()
+
+    @property
+    def version(self) -> str:
+        # Derived from the load timestamp, which travels in the shared file
+        # header — every worker serving this load reports the same version.
+        return format(int(self.timestamp * 1000), "x")
+
+    # ── Construction ──────────────────────────────────────────
+    @classmethod
+    def from_rows(cls, columns: list[str], rows: list[list], timestamp: float) -> "ColumnarSnapshot":
+        cols = [encode_column(name, [row[i] for row in rows]) for i, name in enumerate(columns)]
+        return cls(columns, cols, len(rows), timestamp)
+
+    # ── Column access ─────────────────────────────────────────
+    def column(self, name: str):
+        return self.cols[self.column_map[name]]
+
+    def array(self, name: str) -> np.ndarray:
+        """Raw backing array — float64 values, int codes or day numbers."""
+        return self.column(name).data
+
+    # ── Row materialisation ───────────────────────────────────
+    def row(self, i: int) -> list:
+        return self.rows_at([i])[0]
+
+    def rows_at(self, positions) -> list[list]:
+        """Materialises the rows at the given positions (array, list or slice)."""
+        per_column = [col.values_at(positions) for col in self.cols]
+        return [list(r) for r in zip(*per_column)]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.nbytes for col in self.cols)
+
+    # ── Derived structures ────────────────────────────────────
+    def derived(self, key: str, build):
+        """
+        Memoised per-snapshot structure (indexes, pre-aggregates, …).
+        build(snapshot) runs once per snapshot; every later call — from any
+        request thread — gets the same object. Snapshots are immutable, so
+        nothing derived from one ever needs invalidating.
+        """
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = build(self)
+                    self._derived[key] = value
+        return value
+
+
+class RowView:
+    """
+    Sequence of rows over a ColumnarSnapshot — a drop-in stand-in for the
+    old list-of-lists (len, index, slice, iterate). Rows are built on demand.
+    """
+
+    def __init__(self, snapshot: ColumnarSnapshot):
+        self._snap = snapshot
+
+    def __len__(self) -> int:
+        return self._snap.row_count
+
+    def __bool__(self) -> bool:
+        return self._snap.row_count > 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._snap.rows_at(slice(*i.indices(len(self))))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("snapshot row index out of range")
+        return self._snap.row(i)
+
+    def __iter__(self):
+        for start in range(0, self._snap.row_count, _ROW_CHUNK):
+            yield from self._snap.rows_at(slice(start, start + _ROW_CHUNK))
+
+
+# ══════════════════════════════════════════════════════════════
+# STREAMING BUILD
+# ══════════════════════════════════════════════════════════════
+
+class SnapshotBuilder:
+    """
+    Accumulates row batches straight into column buffers.
+
+    Each column gets a (kind, converter) plan up front:
+      "float" — converter → float (NaN for NULL), buffered as float64
+      "date"  — converter → day number (NO_DATE for NULL), buffered as int32
+      "text"  — converter → str, dictionary-encoded as rows arrive
+      "auto"  — converter → cleaned value, kept as a list and encoded at
+                build() with encode_column() (unusual types only)
+
+    Usage:
+        builder = SnapshotBuilder(columns, plan)
+        for batch in batches:
+            builder.append(batch)
+        snapshot = builder.build(time.time())
+    """
+
+    def __init__(self, columns: list[str], plan: list[tuple[str, callable]]):
+        self.columns   = list(columns)
+        self.row_count = 0
+        self._buffers  = [_COLUMN_BUFFERS[kind](convert) for kind, convert in plan]
+
+    def append(self, rows: list) -> None:
+        if not rows:
+            return
+        for i, buf in enumerate(self._buffers):
+            buf.extend([row[i] for row in rows])
+        self.row_count += len(rows)
+
+    def build(self, timestamp: float) -> ColumnarSnapshot:
+        cols = [buf.finish(name) for name, buf in zip(self.columns, self._buffers)]
+        self._buffers = []
+        return ColumnarSnapshot(self.columns, cols, self.row_count, timestamp)
+
+
+def column_plan(description) -> list[tuple[str, callable]]:
+    """
+    One (kind, converter) per column from a DB-API cursor.description,
+    decided once from the driver's type codes instead of per value.
+    Produces the same values the old per-cell clean-up did:
+    NULL → "", Decimal → float, date/datetime → "YYYY-MM-DD".
+    """
+    plan = []
+    for name, type_code, *_ in description:
+        if name in METRIC_COLUMNS or type_code in (Decimal, float):
+            plan.append(("float", _to_float))
+        elif type_code in (date, datetime):
+            plan.append(("date", _to_day_number) if name in DATE_COLUMNS else ("text", _to_iso_text))
+        elif type_code is str:
+            plan.append(("text", _to_text))
+        else:
+            plan.append(("auto", _to_clean_value))
+    return plan
+
+
+def snapshot_from_cursor(cursor, timestamp: float, batch_size: int = 5000) -> ColumnarSnapshot:
+    """
+    Streams an executed cursor into a ColumnarSnapshot with fetchmany(),
+    so peak memory is the columns plus one batch — not the whole result
+    twice over as with fetchall() and a cleaned copy.
+    """
+    columns = [col[0] for col in cursor.description]
+    builder = SnapshotBuilder(columns, column_plan(cursor.description))
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        builder.append(batch)
+    return builder.build(timestamp)
+
+
+# ── Column buffers ────────────────────────────────────────────────────────────
+
+class _FloatBuffer:
+    def __init__(self, convert):
+        self._convert = convert
+        self._chunks  = []
+
+    def extend(self, values: list) -> None:
+        convert = self._convert
+        self._chunks.append(np.array([convert(v) for v in values], dtype=np.float64))
+
+    def finish(self, name: str) -> FloatColumn:
+        data = np.concatenate(self._chunks) if self._chunks else np.empty(0, dtype=np.float64)
+        return FloatColumn(data)
+
+
+class _DateBuffer:
+    def __init__(self, convert):
+        self._convert = convert
+        self._days    = array("i")
+
+    def extend(self, values: list) -> None:
+        convert = self._convert
+        self._days.extend([convert(v) for v in values])
+
+    def finish(self, name: str) -> DateColumn:
+        return DateColumn(np.frombuffer(self._days, dtype=np.int32).copy())
+
+
+class _TextBuffer:
+    def __init__(self, convert):
+        self._convert    = convert
+        self._lookup     = {}
+        self._dictionary = []
+        self._codes      = array("i")
+
+    def extend(self, values: list) -> None:
+        convert, lookup, dictionary = self._convert, self._lookup, self._dictionary
+        codes = []
+        for v in values:
+            v    = convert(v)
+            code = lookup.get(v)
+            if code is None:
+                code = lookup[v] = len(dictionary)
+                dictionary.append(v)
+            codes.append(code)
+        self._codes.extend(codes)
+
+    def finish(self, name: str) -> DictColumn:
+        codes = np.frombuffer(self._codes, dtype=np.int32)
+        return DictColumn(codes.astype(code_dtype(len(self._dictionary))), self._dictionary)
+
+
+class _AutoBuffer:
+    def __init__(self, convert):
+        self._convert = convert
+        self._values  = []
+
+    def extend(self, values: list) -> None:
+        convert = self._convert
+        self._values.extend([convert(v) for v in values])
+
+    def finish(self, name: str):
+        return encode_column(name, self._values)
+
+
+_COLUMN_BUFFERS = {
+    "float": _FloatBuffer,
+    "date":  _DateBuffer,
+    "text":  _TextBuffer,
+    "auto":  _AutoBuffer,
+}
+
+
+def _to_float(v) -> float:
+    return np.nan if v is None else float(v)
+
+
+def _to_day_number(v) -> int:
+    return NO_DATE if v is None else v.toordinal() - _EPOCH_ORDINAL
+
+
+def _to_iso_text(v) -> str:
+    return "" if v is None else v.strftime("%Y-%m-%d")
+
+
+def _to_text(v) -> str:
+    return "" if v is None else v
+
+
+def _to_clean_value(v):
+    if v is None:
+        return ""
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, (date, datetime)):
+        return v.strftime("%Y-%m-%d")
+    return v
+
+
+# ══════════════════════════════════════════════════════════════
+# ENCODING
+# ══════════════════════════════════════════════════════════════
+
+def encode_column(name: str, values: list):
+    """
+    Picks the tightest encoding for one column.
+      - METRIC_COLUMNS, or every value a float/""  → FloatColumn
+      - DATE_COLUMNS with parseable dates          → DateColumn
+      - every value an int, no blanks              → IntColumn
+      - anything else                              → DictColumn
+    """
+    if name in METRIC_COLUMNS or _all_floats(values):
+        try:
+            return FloatColumn(np.array(
+                [np.nan if v == "" or v is None else v for v in values], dtype=np.float64
+            ))
+        except (TypeError, ValueError):
+            pass
+
+    if name in DATE_COLUMNS:
+        days = _to_day_numbers(values)
+        if days is not None:
+            return DateColumn(days)
+
+    if values and all(
+        type(v) is int and _INT64_MIN <= v <= _INT64_MAX for v in values
+    ):
+        return IntColumn(np.array(values, dtype=np.int64))
+
+    return _encode_dict(values)
+
+
+def code_dtype(n_values: int):
+    """Smallest unsigned dtype that can hold n_values distinct codes."""
+    if n_values <= 0xFF:
+        return np.uint8
+    if n_values <= 0xFFFF:
+        return np.uint16
+    return np.int32
+
+
+def _encode_dict(values: list) -> DictColumn:
+    lookup, dictionary, codes = {}, [], []
+    for v in values:
+        if not isinstance(v, (str, int, float)) or isinstance(v, bool):
+            v = str(v)
+        key  = (type(v), v)
+        code = lookup.get(key)
+        if code is None:
+            code = lookup[key] = len(dictionary)
+            dictionary.append(v)
+        codes.append(code)
+    return DictColumn(np.array(codes, dtype=code_dtype(len(dictionary))), dictionary)
+
+
+def _all_floats(values: list) -> bool:
+    seen = False
+    for v in values:
+        if v == "":
+            continue
+        if type(v) is not float:
+            return False
+        seen = True
+    return seen
+
+
+def _to_day_numbers(values: list) -> np.ndarray | None:
+    """Parses 'YYYY-MM-DD' strings to day numbers; None if any value isn't a date."""
+    cache, out = {}, np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        day = cache.get(v)
+        if day is None:
+            if v == "" or v is None:
+                day = NO_DATE
+            elif not (isinstance(v, str) and len(v) == 10):
+                return None
+            else:
+                try:
+                    day = (date.fromisoformat(v) - _EPOCH).days
+                except ValueError:
+                    return None
+            cache[v] = day
+        out[i] = day
+    return out
@@ -0,0 +1,134 @@
+"""
+app/services/data_source.py — Heritage Samarth | Pluggable data source
+=======================================================================
+Where the performance data comes from, chosen by config DATA_SOURCE:
+
+  "mssql"   the HeritageBI warehouse (mssql_service.py) — production
+  "sqlite"  a local SQLite file holding the query's output columns,
+            seeded by synthetic_warehouse.py the first time it is needed —
+            lets the refresh and serving paths be benchmarked and
+            load-tested with no BI server
+
+Every source offers the same two calls, and the rest of the app only
+uses these module-level wrappers:
+
+  fetch_performance_snapshot()  → ColumnarSnapshot
+  fetch_watermark()             → dict that changes whenever the data does
+"""
+
+import os
+import sqlite3
+import time
+
+from flask import current_app
+
+
+class MSSQLSource:
+    """The BI warehouse — see mssql_service.py (REFRESH_MODE applies here)."""
+    name = "mssql"
+
+    def fetch_performance_snapshot(self):
+        from app.services.mssql_service import fetch_performance_snapshot
+        return fetch_performance_snapshot()
+
+    def fetch_watermark(self) -> dict:
+        from app.services.mssql_service import fetch_watermark
+        return fetch_watermark()
+
+
+class SQLiteSource:
+    """
+    A local SQLite file (LOCAL_WAREHOUSE_PATH) with the output columns in
+    one table. If the file doesn't exist it is generated with the
+    SYNTHETIC_* volume settings; delete it (or run
+    scripts/seed_local_warehouse.py) to get a new dataset.
+    """
+    name = "sqlite"
+
+    def fetch_performance_snapshot(self):
+        from app.services.columnar import snapshot_from_cursor
+        from app.services.synthetic_warehouse import TABLE
+
+        batch_size = current_app.config["FETCH_BATCH_SIZE"]
+        conn       = self._connect()
+        try:
+            cursor = conn.execute(f"SELECT * FROM {TABLE} ORDER BY rowid")
+            return snapshot_from_cursor(cursor, time.time(), batch_size)
+        finally:
+            conn.close()
+
+    def fetch_watermark(self) -> dict:
+        conn = self._connect()
+        try:
+            cursor = conn.execute("SELECT * FROM meta")
+            row    = cursor.fetchone()
+            return {col[0]: v for col, v in zip(cursor.description, row)}
+        finally:
+            conn.close()
+
+    # ── Private ───────────────────────────────────────────────
+    def _connect(self) -> sqlite3.Connection:
+        path = current_app.config["LOCAL_WAREHOUSE_PATH"]
+        if not os.path.exists(path):
+            seed_local_warehouse()
+        return sqlite3.connect(path)
+
+
+_SOURCES = {
+    "mssql":  MSSQLSource(),
+    "sqlite": SQLiteSource(),
+}
+
+
+def get_data_source():
+    """The source named by config DATA_SOURCE."""
+    name = current_app.config["DATA_SOURCE"]
+    try:
+        return _SOURCES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown DATA_SOURCE {name!r} — expected one of: {', '.join(_SOURCES)}"
+        ) from None
+
+
+# ── Public helpers ────────────────────────────────────────────────────────────
+
+def fetch_performance_snapshot():
+    """
+    The performance result as a ColumnarSnapshot, from the configured source.
+    Raises an exception on any DB or file error — caller handles it.
+    """
+    return get_data_source().fetch_performance_snapshot()
+
+
+def fetch_watermark() -> dict:
+    """
+    The configured source's watermark. Raises on any DB error — the caller
+    decides whether a failed probe means "load anyway" or "skip".
+    """
+    return get_data_source().fetch_watermark()
+
+
+def seed_local_warehouse(seed: int = 7) -> int:
+    """
+    (Re)generates LOCAL_WAREHOUSE_PATH from the SYNTHETIC_* settings.
+    Returns the number of rows written.
+    """
+    from app.services.synthetic_warehouse import build_local_warehouse
+
+    cfg       = current_app.config
+    customers = max(1, round(cfg["SYNTHETIC_CUSTOMERS"] * cfg["SYNTHETIC_SCALE"]))
+    started   = time.monotonic()
+
+    rows = build_local_warehouse(
+        cfg["LOCAL_WAREHOUSE_PATH"],
+        customers=customers,
+        offices=cfg["SYNTHETIC_SALES_OFFICES"],
+        ses_per_so=cfg["SYNTHETIC_SES_PER_SO"],
+        seed=seed,
+    )
+    current_app.logger.info(
+        f"Local warehouse seeded — {customers:,} customers, {rows:,} rows in "
+        f"{time.monotonic() - started:.1f}s → {cfg['LOCAL_WAREHOUSE_PATH']}"
+    )
+    return rows
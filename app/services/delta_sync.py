@@ -0,0 +1,166 @@
+"""
+app/services/delta_sync.py — Heritage Samarth | /api/data delta sync
+=====================================================================
+What changed in a user's rows between the snapshot their client holds and
+the current one, so a refresh after an intraday load downloads the rows
+that moved instead of the whole scoped dataset again.
+
+  compute_delta(base, current, base_positions, current_positions)  → delta dict
+  can_diff(base, current)                                          → bool
+
+Rows are matched by their stable key — CustomerID, SO, Product — as the
+dashboard shows those cells. A key can repeat in the warehouse result, so
+the n-th row with a key in the base is matched with the n-th row with
+that key in the current snapshot. A matched row is "updated" if any cell
+differs, "inserted" if it has no match, and a base row left without one is
+"deleted".
+
+The delta is a patch for the client's row array:
+
+  {"ops": [[start, count], n, …], "rows": [...], …}
+
+[start, count] copies that run of the base rows, n takes the next n rows
+of "rows" (inserted and updated rows, in full). Applying the ops in order
+yields exactly the rows a full load of the current snapshot would send,
+in the same order, so the next delta can be taken against it in turn.
+"""
+
+import numpy as np
+
+from app.services.columnar import FloatColumn
+from app.services.search_index import display_text
+
+KEY_COLUMNS = ("CustomerID", "SO", "Product")
+
+
+def can_diff(base, current) -> bool:
+    """Whether rows of base and current can be matched — same columns, key columns present."""
+    return base.columns == current.columns and all(c in current.column_map for c in KEY_COLUMNS)
+
+
+def compute_delta(base, current, base_positions: np.ndarray | None, current_positions: np.ndarray | None) -> dict:
+    """
+    The patch from the base rows at base_positions to the current rows at
+    current_positions (None = every row), plus counts of inserted, updated
+    and deleted rows.
+    """
+    if base_positions is None:
+        base_positions = np.arange(base.row_count)
+    if current_positions is None:
+        current_positions = np.arange(current.row_count)
+    match = _match_rows(base, current, base_positions, current_positions)
+    same  = match >= 0
+    if same.any():
+        b, c = base_positions[match[same]], current_positions[same]
+        changed = np.zeros(len(b), dtype=bool)
+        for name in current.columns:
+            old, new = _comparable(base.column(name), current.column(name), b, c)
+            changed |= old != new
+        same[np.flatnonzero(same)[changed]] = False
+
+    ops, literal = _patch_ops(match, same)
+    matched = int(np.count_nonzero(match >= 0))
+    return {
+        "ops":      ops,
+        "rows":     current.rows_at(current_positions[literal]),
+        "key":      list(KEY_COLUMNS),
+        "inserted": len(match) - matched,
+        "updated":  matched - int(np.count_nonzero(same)),
+        "deleted":  len(base_positions) - matched,
+    }
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _match_rows(base, current, base_positions: np.ndarray, current_positions: np.ndarray) -> np.ndarray:
+    """For each current row, the index of its base row in base_positions, or -1."""
+    base_keys    = np.zeros(len(base_positions), dtype=np.int64)
+    current_keys = np.zeros(len(current_positions), dtype=np.int64)
+    for name in KEY_COLUMNS:
+        old, new = _comparable(base.column(name), current.column(name), base_positions, current_positions, labels=True)
+        n = int(max(old.max(initial=-1), new.max(initial=-1))) + 1
+        # Renumber the combined key densely so it never outgrows int64.
+        base_keys, current_keys = _dense(base_keys * n + old, current_keys * n + new)
+
+    # The n-th row with a key on one side pairs with the n-th on the other.
+    base_nth, current_nth = _occurrence(base_keys), _occurrence(current_keys)
+    shift = int(max(base_nth.max(initial=0), current_nth.max(initial=0))).bit_length()
+    base_keys, current_keys = (base_keys << shift) | base_nth, (current_keys << shift) | current_nth
+
+    match = np.full(len(current_keys), -1, dtype=np.int64)
+    if not len(base_keys):
+        return match
+    order = np.argsort(base_keys, kind="stable")
+    found = np.minimum(np.searchsorted(base_keys[order], current_keys), len(order) - 1)
+    hit   = base_keys[order[found]] == current_keys
+    match[hit] = order[found[hit]]
+    return match
+
+
+def _dense(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """a and b renumbered 0, 1, … by their distinct values together."""
+    _, inverse = np.unique(np.concatenate([a, b]), return_inverse=True)
+    inverse = inverse.ravel().astype(np.int64)
+    return inverse[:len(a)], inverse[len(a):]
+
+
+def _occurrence(keys: np.ndarray) -> np.ndarray:
+    """For each key, how many earlier rows carry the same key (0 for the first)."""
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    order      = np.argsort(keys, kind="stable")
+    ranked     = keys[order]
+    starts     = np.flatnonzero(np.r_[True, ranked[1:] != ranked[:-1]])
+    counts     = np.diff(np.r_[starts, len(keys)])
+    occurrence = np.empty(len(keys), dtype=np.int64)
+    occurrence[order] = np.arange(len(keys)) - np.repeat(starts, counts)
+    return occurrence
+
+
+def _comparable(base_col, current_col, base_positions, current_positions, labels: bool = False):
+    """
+    The column's cells at the two sets of positions as int64 ids that are
+    equal exactly when the cells are. Floats compare by bit pattern, so a
+    NaN equals a NaN and 0.0 differs from -0.0, as their JSON does. With
+    labels, cells compare as the page prints them (String(v)), for keys.
+    """
+    if not labels and isinstance(base_col, FloatColumn) and isinstance(current_col, FloatColumn):
+        return base_col.data[base_positions].view(np.int64), current_col.data[current_positions].view(np.int64)
+
+    ids = {}
+    out = []
+    for col, positions in ((base_col, base_positions), (current_col, current_positions)):
+        _, first, inverse = np.unique(col.data[positions], return_index=True, return_inverse=True)
+        values = col.values_at(positions[first])
+        if labels:
+            lut = [ids.setdefault(display_text(v), len(ids)) for v in values]
+        else:
+            lut = [ids.setdefault((type(v).__name__, v), len(ids)) for v in values]
+        out.append(np.array(lut, dtype=np.int64)[inverse.ravel()] if len(lut) else np.zeros(0, dtype=np.int64))
+    return out[0], out[1]
+
+
+def _patch_ops(match: np.ndarray, same: np.ndarray) -> tuple[list, np.ndarray]:
+    """
+    Ops that rebuild the current rows from the base rows: runs of
+    unchanged rows whose base indexes are consecutive become one copy, the
+    rest come from the literal rows. Returns (ops, literal row mask).
+    """
+    n = len(match)
+    if not n:
+        return [], np.zeros(0, dtype=bool)
+
+    literal = ~same
+    # A new op starts wherever the kind changes, or a copy run skips.
+    follows = np.r_[False, same[1:] & same[:-1] & (match[1:] == match[:-1] + 1)]
+    stays_literal = np.r_[False, literal[1:] & literal[:-1]]
+    starts = np.flatnonzero(~(follows | stays_literal))
+    ends   = np.r_[starts[1:], n]
+
+    ops = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        if same[start]:
+            ops.append([int(match[start]), end - start])
+        else:
+            ops.append(end - start)
+    return ops, literal
@@ -0,0 +1,207 @@
+"""
+app/services/export.py — Heritage Samarth | Streaming exports
+==============================================================
+The Master Data table and the Churn Risk Radar as CSV or XLSX downloads,
+written straight from the snapshot instead of the browser fetching every
+row as JSON and joining one big CSV string in memory.
+
+  table_export(snapshot, positions, order, search)        → Export of the master table
+  churn_export(index, view, tier, sort, descending)       → Export of the churn drill-down
+  stream_csv(export) / stream_xlsx(export)                → the file, as byte chunks
+  logged(chunks, user, action, export, fmt)               → chunks, logged to activity_log
+
+Rows are materialised BATCH_ROWS at a time and encoded into chunks of
+about CHUNK_BYTES, so a national export holds one batch in memory however
+many rows it has. CSV leaves as it is written. XLSX is a zip whose
+directory comes last, so the write-only workbook is saved to a temporary
+file and that file is streamed; openpyxl's write-only sheets keep rows on
+disk, not in memory, while they are written.
+
+CSV cells read as the page showed them: String(v) for table cells,
+toFixed() for the churn figures.
+"""
+
+import csv
+import io
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import numpy as np
+
+from app.services.insights import to_fixed
+from app.services.search_index import display_text
+from app.services.table import matching_rows
+
+FORMATS = {
+    "csv":  "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+BATCH_ROWS  = 5000            # rows materialised from the snapshot at a time
+CHUNK_BYTES = 64 * 1024       # bytes per chunk handed to the server
+
+# The master table's column titles, as initTable() aliases them.
+HEADER_ALIASES = {
+    "LYSM":                           "LYSM (LPD)",
+    "LYMTD":                          "LYMTD (LPD)",
+    "LQ":                             "Last Qtr (LPD)",
+    "LM":                             "Last Month (LPD)",
+    "LMTD":                           "LMTD (LPD)",
+    "MTD":                            "MTD (LPD)",
+    "LW":                             "Last Week (LPD)",
+    "CW":                             "This Week (LPD)",
+    "YoY_Abs_LPD_Diff":               "YoY Δ LPD",
+    "MTD_vs_LMTD_Abs_LPD_Diff":       "MTD vs LMTD Δ LPD",
+    "MTD_vs_LYMTD_Abs_LPD_Diff":      "MTD vs LYMTD Δ LPD",
+    "YoY_Growth_Percentage":          "YoY Growth %",
+    "MTD_vs_LMTD_Growth_Percentage":  "MTD vs LMTD %",
+    "MTD_vs_LYMTD_Growth_Percentage": "MTD vs LYMTD %",
+    "Sales_Trend":                    "Trend",
+    "Last_Order_Date":                "Last Order",
+    "SE_EmpID":                       "SE ID",
+    "SE_Name":                        "Sales Exec",
+    "SE_Mobile":                      "SE Mobile",
+    "SO_Name":                        "Sales Office",
+    "CustomerGroup":                  "Cust. Group",
+    "PLANT_NAME":                     "Plant",
+}
+
+CHURN_HEADERS = [
+    "Tier", "Customer", "Product", "Sales Office", "SE Name", "SE Mobile",
+    "MTD (LPD)", "LYMTD (LPD)", "LPD Lost", "% Change",
+]
+CHURN_TIER_LABELS = {"critical": "Critical", "high": "High Risk", "watch": "Watch List"}
+
+# Characters an XLSX cell cannot hold (XML 1.0 control characters).
+_XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+@dataclass
+class Export:
+    """
+    One download: its sheet name, headers, row count and the row batches.
+    batches(as_text) yields lists of rows — cells as the page printed them
+    when as_text is set (CSV), as numbers where they are numbers (XLSX).
+    """
+    sheet:   str
+    headers: list[str]
+    rows:    int
+    batches: Callable[[bool], Iterator[list[list]]]
+
+
+def table_export(snapshot, positions: np.ndarray, order: tuple, search: str) -> Export:
+    """Every row the master table matches, in its order — what its pages slice."""
+    rows = matching_rows(snapshot, positions, order, search)
+
+    def batches(as_text: bool) -> Iterator[list[list]]:
+        for start in range(0, len(rows), BATCH_ROWS):
+            batch = snapshot.rows_at(rows[start:start + BATCH_ROWS])
+            if as_text:
+                batch = [[display_text(v) for v in row] for row in batch]
+            yield batch
+
+    headers = [HEADER_ALIASES.get(name, name) for name in snapshot.columns]
+    return Export("Master Data", headers, len(rows), batches)
+
+
+def churn_export(index, view: np.ndarray | None, tier: str, sort: str, descending: bool) -> Export:
+    """
+    Every row of a tier ("all" for every tier) in the view, grouped by tier
+    — critical, high, watch — and in sort order within each, as the page's
+    CSV listed them.
+    """
+    order = index.order(tier, sort, descending)
+    if view is not None:
+        order = order[view[order]]
+    if tier == "all":
+        order = order[np.argsort(index.tier[order], kind="stable")]
+
+    def batches(as_text: bool) -> Iterator[list[list]]:
+        for start in range(0, len(order), BATCH_ROWS):
+            batch = []
+            for i in order[start:start + BATCH_ROWS].tolist():
+                r = index.row(i)
+                figures = [
+                    to_fixed(r["mtd"], 1), to_fixed(r["lymtd"], 1),
+                    to_fixed(r["absDiff"], 2), to_fixed(r["pct"], 1),
+                ]
+                if as_text:
+                    figures[3] += "%"
+                else:
+                    figures = [float(f) for f in figures]
+                batch.append([
+                    CHURN_TIER_LABELS[r["tier"]], r["cust"], r["prod"], r["so"], r["se"], r["seMob"],
+                    *figures,
+                ])
+            yield batch
+
+    return Export("Churn Risk", CHURN_HEADERS, len(order), batches)
+
+
+def stream_csv(export: Export) -> Iterator[bytes]:
+    """The export as UTF-8 CSV, every cell quoted, CRLF line ends."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\r\n")
+    writer.writerow(export.headers)
+    for batch in export.batches(True):
+        for row in batch:
+            writer.writerow(row)
+            if buffer.tell() >= CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(export: Export) -> Iterator[bytes]:
+    """The export as a one-sheet XLSX workbook, built write-only on disk."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet    = workbook.create_sheet(export.sheet)
+    sheet.append(export.headers)
+    for batch in export.batches(False):
+        for row in batch:
+            sheet.append([_xlsx_cell(v) for v in row])
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(CHUNK_BYTES):
+            yield chunk
+
+
+def logged(chunks: Iterator[bytes], user: dict, action: str, export: Export, fmt: str) -> Iterator[bytes]:
+    """
+    Passes chunks through and, once the download ends, logs its row count,
+    size and duration to activity_log — also when the client goes away
+    before the end.
+    """
+    from app.models.database import log_activity
+
+    started, sent, finished = time.perf_counter(), 0, False
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+        finished = True
+    finally:
+        details = (
+            f"{export.sheet} · {fmt.upper()} · {export.rows:,} rows · "
+            f"{sent:,} bytes · {time.perf_counter() - started:.2f}s"
+        )
+        log_activity(user["email"], user["role"], action, details if finished else f"{details} · cancelled")
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _xlsx_cell(value):
+    """A snapshot value as an XLSX cell: blanks empty, text without control characters."""
+    if value == "":
+        return None
+    if isinstance(value, str) and not value.isprintable():
+        return _XML_ILLEGAL.sub("", value)
+    return value
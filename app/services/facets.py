@@ -0,0 +1,119 @@
+"""
+app/services/facets.py — Heritage Samarth | Slicer facet bitmaps
+=================================================================
+The options of the dashboard's global slicers, answered from bitmaps
+instead of a `new Set(...)` over every row in the browser each time a
+slicer changes.
+
+  FacetIndex             one bitmap per distinct value of every slicer
+                         column, built when the snapshot is published
+  FacetIndex.facets()    the values left in each slicer, with row counts,
+                         for one scope bitmap and a set of slicer filters
+
+A filter is an AND of the scope bitmap with the selected values' bitmaps.
+Each column is answered under the filters on the *other* columns, so a
+slicer that is set still lists its alternatives; for an unset slicer that
+is exactly what updateCascadingSlicers() showed. Counting is one bincount
+of the column's codes over the surviving rows, so a request costs a few
+row-count passes however many values the slicers hold.
+
+Values are the page's labels — String(v || '').trim(), blanks dropped —
+in the page's sort order (Array.prototype.sort compares UTF-16 code units).
+"""
+
+import numpy as np
+
+from app.services.scope_index import scope_positions
+from app.services.summary import SLICER_COLUMNS, text_codes
+
+
+class FacetIndex:
+    """Value bitmaps for every slicer column of one snapshot."""
+
+    def __init__(self, snapshot):
+        self.row_count  = snapshot.row_count
+        self.everything = np.packbits(np.ones(snapshot.row_count, dtype=bool))
+        self.columns    = {}
+
+        for column in SLICER_COLUMNS:
+            if column not in snapshot.column_map:
+                continue                    # the page shows no slicer for it
+            codes, labels = text_codes(snapshot, column)
+            bitmaps = np.empty((len(labels), len(self.everything)), dtype=np.uint8)
+            for code in range(len(labels)):
+                bitmaps[code] = np.packbits(codes == code)
+            order = sorted(
+                (c for c, label in enumerate(labels) if label != ""),
+                key=lambda c: labels[c].encode("utf-16-be"),
+            )
+            self.columns[column] = {
+                "codes":   codes,
+                "labels":  labels,
+                "lookup":  {label: c for c, label in enumerate(labels)},
+                "bitmaps": bitmaps,
+                "order":   np.array(order, dtype=np.int64),
+            }
+
+    def scope_bitmap(self, snapshot, user: dict) -> np.ndarray:
+        """Bitmap of the rows the user may see."""
+        positions = scope_positions(snapshot, user)
+        if positions is None:
+            return self.everything
+        mask = np.zeros(self.row_count, dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+    def bitmap(self, column: str, value: str) -> np.ndarray:
+        """Bitmap of the rows whose column reads value (all clear if none do)."""
+        facet = self.columns[column]
+        code  = facet["lookup"].get(value)
+        if code is None:
+            return np.zeros_like(self.everything)
+        return facet["bitmaps"][code]
+
+    def facets(self, scope: np.ndarray, filters: tuple) -> dict:
+        """
+        {"facets": {column: [[value, rows], …]}, "row_count": rows matching
+        every filter}. Filters on columns without a slicer are ignored, as
+        filtered_positions() ignores them.
+        """
+        selected = {
+            column: self.bitmap(column, value)
+            for column, value in filters if column in self.columns
+        }
+        matched = _intersect(scope, selected.values())
+
+        facets = {}
+        for column, facet in self.columns.items():
+            if column in selected:
+                others = [b for c, b in selected.items() if c != column]
+                mask   = _intersect(scope, others)
+            else:
+                mask = matched
+            rows   = np.unpackbits(mask, count=self.row_count).view(bool)
+            counts = np.bincount(facet["codes"][rows], minlength=len(facet["labels"]))
+            order  = facet["order"][counts[facet["order"]] > 0]
+            facets[column] = [[facet["labels"][c], int(counts[c])] for c in order.tolist()]
+
+        row_count = int(np.count_nonzero(np.unpackbits(matched, count=self.row_count)))
+        return {"facets": facets, "row_count": row_count}
+
+
+def get_facet_index(snapshot) -> FacetIndex:
+    """The snapshot's FacetIndex, built on first call and memoised on it."""
+    return snapshot.derived("facet_index", FacetIndex)
+
+
+def empty_facets() -> dict:
+    """FacetIndex.facets() of no rows — served before the first snapshot loads."""
+    return {"facets": {}, "row_count": 0}
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _intersect(scope: np.ndarray, bitmaps) -> np.ndarray:
+    """AND of the scope bitmap with each of bitmaps."""
+    result = scope
+    for bitmap in bitmaps:
+        result = np.bitwise_and(result, bitmap)
+    return result
@@ -0,0 +1,96 @@
+"""
+app/services/file_lock.py — Heritage Samarth | Inter-process file lock
+=======================================================================
+A tiny advisory lock on a local file, so gunicorn workers on the same box
+can agree on which one talks to MSSQL.
+
+  - POSIX:   fcntl.flock
+  - Windows: msvcrt.locking (waitress deployments)
+
+The lock is released automatically by the OS if the holding process dies,
+so a crashed worker can never wedge the others.
+"""
+
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:         # Windows
+    fcntl = None
+    import msvcrt
+
+
+class InterProcessLock:
+    """
+    Exclusive advisory lock on `path`.
+
+    Usage:
+        lock = InterProcessLock("/path/to/refresh.lock")
+        if lock.acquire(timeout=0):      # non-blocking attempt
+            try:
+                ...
+            finally:
+                lock.release()
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh  = None
+
+    def acquire(self, timeout: float = None, poll: float = 0.5) -> bool:
+        """
+        Tries to take the lock.
+          timeout=0     → single non-blocking attempt
+          timeout=None  → wait forever
+          timeout=N     → wait up to N seconds
+
+        Returns True if the lock is now held by this process.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fh       = open(self.path, "a+")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            if _try_lock(fh):
+                self._fh = fh
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                fh.close()
+                return False
+            time.sleep(poll)
+
+    def release(self) -> None:
+        if self._fh is None:
+            return
+        try:
+            _unlock(self._fh)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+    @property
+    def held(self) -> bool:
+        return self._fh is not None
+
+
+# ── Platform helpers ──────────────────────────────────────────────────────────
+
+def _try_lock(fh) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fh) -> None:
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
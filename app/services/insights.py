@@ -0,0 +1,310 @@
+"""
+app/services/insights.py — Heritage Samarth | Smart Insights
+=============================================================
+The notification panel's insight cards — accounts gone dark, heavy
+decliners, lapsed orderers, stagnant high-value accounts, new customers,
+growth leaders and the SEs behind them — computed with vectorised masks
+over the snapshot instead of passes over every row in the browser.
+
+  compute_insights(snapshot, positions, today)  → {"critical": [...], "action": [...], "positive": [...]}
+  get_insights(snapshot, user, filters)         → the same, memoised
+  to_fixed(value, digits)                       → a number as the page's toFixed() prints it
+
+Results are memoised per (snapshot version, scope, slicer filters, day) in
+an LRU of INSIGHTS_CACHE_SIZE entries; a new snapshot version drops the
+rest. The day is part of the key because "no order in 7+ days" moves with
+the calendar, not with the data.
+
+Each card is {"kind", "icon", "title", "desc", "rows"}. Rows carry their
+numbers already formatted the way the page printed them (toFixed), and
+the page picks a row template by kind. The rules are the ones
+computeAndRenderInsights() used in dashboard.html; lists are ordered by
+the rounded figure they show, ties in snapshot order.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+from flask import current_app
+
+from app.services.columnar import NO_DATE, DateColumn
+from app.services.scope_index import scope_key
+from app.services.summary import filtered_positions, metric_values, text_codes
+
+MAX_ROWS = 8           # detail rows per card
+TOP_SES  = 5           # SEs in the decline / growth rankings
+
+_EPOCH = date(1970, 1, 1)
+
+_memo      = OrderedDict()
+_memo_lock = threading.Lock()
+_memo_ver  = {"version": None}
+
+
+def get_insights(snapshot, user: dict, filters: tuple) -> dict:
+    """Insight cards for the user's rows after the slicer filters, memoised."""
+    today = date.today()
+    key   = (scope_key(snapshot, user), filters, today)
+
+    with _memo_lock:
+        if _memo_ver["version"] != snapshot.version:
+            _memo.clear()
+            _memo_ver["version"] = snapshot.version
+        cached = _memo.get(key)
+        if cached is not None:
+            _memo.move_to_end(key)
+            return cached
+
+    insights = compute_insights(snapshot, filtered_positions(snapshot, user, filters), today)
+
+    with _memo_lock:
+        if _memo_ver["version"] == snapshot.version:
+            _memo[key] = insights
+            while len(_memo) > current_app.config["INSIGHTS_CACHE_SIZE"]:
+                _memo.popitem(last=False)
+    return insights
+
+
+def compute_insights(snapshot, positions: np.ndarray, today: date) -> dict:
+    """All insight cards for the rows at positions, as of today."""
+    mtd     = metric_values(snapshot, "MTD", positions)
+    lymtd   = metric_values(snapshot, "LYMTD", positions)
+    lm      = metric_values(snapshot, "LM", positions)
+    abs_dif = metric_values(snapshot, "MTD_vs_LYMTD_Abs_LPD_Diff", positions)
+    pct     = metric_values(snapshot, "MTD_vs_LYMTD_Growth_Percentage", positions)
+    trend   = _labels(snapshot, "Sales_Trend", "", positions)
+    se      = _labels(snapshot, "SE_Name", "Unassigned", positions)
+
+    is_trend = {t: trend.equals(t) for t in ("Decline", "Growth", "Stagnant", "New Customer", "New")}
+    decline, growth = is_trend["Decline"], is_trend["Growth"]
+
+    last_order = _day_numbers(snapshot, positions)
+    has_order  = last_order != NO_DATE
+    days_since = np.where(has_order, (today - _EPOCH).days - last_order.astype(np.int64), 0)
+
+    text = {
+        "cust":  _labels(snapshot, "CustomerName", "Unknown", positions),
+        "se":    se,
+        "seMob": _labels(snapshot, "SE_Mobile", "", positions),
+        "so":    _labels(snapshot, "SO_Name", "", positions),
+        "prod":  _labels(snapshot, "Product", "", positions),
+    }
+
+    def rows(mask, key=None, descending=True, **fields) -> tuple[int, list]:
+        """Count of mask and its first MAX_ROWS rows, ordered by key (stable)."""
+        idx = np.flatnonzero(mask)
+        if key is not None:
+            k   = key[idx]
+            idx = idx[np.argsort(-k if descending else k, kind="stable")]
+        top = idx[:MAX_ROWS]
+        out = []
+        for i in top.tolist():
+            row = {name: labels.at(i) for name, labels in text.items()}
+            row.update({name: fmt(i) for name, fmt in fields.items()})
+            out.append(row)
+        return len(idx), out
+
+    insights = {"critical": [], "action": [], "positive": []}
+
+    # ── Critical ─────────────────────────────────────────────
+    total_mtd, total_lymtd = float(mtd.sum()), float(lymtd.sum())
+    overall_pct  = (total_mtd - total_lymtd) / total_lymtd * 100 if total_lymtd > 0 else 0
+    overall_diff = total_mtd - total_lymtd
+    if overall_pct < -10:
+        insights["critical"].append(_card(
+            "overall", "📉", f"Overall Volume Down {to_fixed(abs(overall_pct), 1)}% vs Last Year",
+            f"Current view is tracking {to_fixed(abs(overall_diff), 0)} LPD below LYMTD. "
+            f"Immediate strategic review recommended.",
+            None,
+        ))
+
+    n, top = rows(
+        (lymtd > 1) & (mtd == 0) & decline, key=np.round(lymtd, 1),
+        lymtd=lambda i: to_fixed(lymtd[i], 1),
+    )
+    if n:
+        insights["critical"].append(_card(
+            "gone_dark", "🔴", f"{n} Account{_s(n)} Gone Dark",
+            "Customers who ordered last year but have ZERO sales this month. Risk of permanent churn.",
+            top,
+        ))
+
+    n, top = rows(
+        (pct < -0.30) & (lymtd > 3) & decline, key=np.round(pct * 100, 1), descending=False,
+        pct=lambda i: to_fixed(pct[i] * 100, 1),
+        absDiff=lambda i: to_fixed(abs_dif[i], 2),
+        lymtd=lambda i: to_fixed(lymtd[i], 1),
+    )
+    if n:
+        insights["critical"].append(_card(
+            "heavy_decline", "⚠️", f"{n} Account{_s(n)} with >30% YoY Decline",
+            "High-impact accounts losing significant volume. SE intervention required.",
+            top,
+        ))
+
+    se_decline, se_growth = _se_rankings(se, text["seMob"], decline, growth, abs_dif)
+    if se_decline:
+        insights["critical"].append(_card(
+            "se_decline", "👤", "SEs with Highest Decline Account Count",
+            "These executives have the most accounts trending downward.",
+            se_decline,
+        ))
+
+    # ── Action ───────────────────────────────────────────────
+    n, top = rows(
+        has_order & (mtd > 0) & (days_since >= 7), key=days_since,
+        daysSince=lambda i: int(days_since[i]),
+        mtd=lambda i: to_fixed(mtd[i], 1),
+    )
+    if n:
+        insights["action"].append(_card(
+            "inactive", "📅", f"{n} Customers — No Order in 7+ Days",
+            "Active MTD customers who haven't ordered in over a week. Follow-up needed.",
+            top,
+        ))
+
+    n, top = rows(
+        is_trend["Stagnant"] & (lm > 10) & (mtd < lm * 0.5), key=np.round(lm, 1),
+        lm=lambda i: to_fixed(lm[i], 1),
+        mtd=lambda i: to_fixed(mtd[i], 1),
+    )
+    if n:
+        insights["action"].append(_card(
+            "stagnant", "😐", f"{n} High-Value Stagnant Accounts",
+            "Strong Last Month performance but underperforming MTD. Demand activation opportunity.",
+            top,
+        ))
+
+    # ── Positive ─────────────────────────────────────────────
+    new = is_trend["New Customer"] | is_trend["New"]
+    n, top = rows(new, mtd=lambda i: to_fixed(mtd[i], 1))
+    if n:
+        new_vol = float(np.round(mtd[new], 1).sum())
+        insights["positive"].append(_card(
+            "new_customers", "🌱", f"{n} New Customers Acquired This Month",
+            f"Contributing {to_fixed(new_vol, 0)} LPD of fresh volume. Pipeline expansion in progress.",
+            top,
+        ))
+
+    n, top = rows(
+        growth & (abs_dif > 5), key=np.round(abs_dif, 2),
+        absDiff=lambda i: to_fixed(abs_dif[i], 2),
+        pct=lambda i: to_fixed(pct[i] * 100, 1),
+    )
+    if n:
+        insights["positive"].append(_card(
+            "top_growth", "🚀", "Top Growth Accounts — Momentum Leaders",
+            "Accounts driving the most absolute volume growth vs last year.",
+            top,
+        ))
+
+    if se_growth:
+        insights["positive"].append(_card(
+            "se_growth", "🏆", "Top Performing SEs — Growth Champions",
+            "Executives leading the most growth accounts. Recognition and best-practice sharing recommended.",
+            se_growth,
+        ))
+
+    return insights
+
+
+def to_fixed(value: float, digits: int) -> str:
+    """Number.prototype.toFixed — halves round away from zero on the exact binary value."""
+    quantum = Decimal(1).scaleb(-digits)
+    return str(Decimal(float(value) + 0.0).quantize(quantum, rounding=ROUND_HALF_UP))
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+class _Labels:
+    """A text column's labels for the rows at positions, as codes into a label list."""
+
+    def __init__(self, codes: np.ndarray, labels: list[str]):
+        self.codes  = codes
+        self.labels = labels
+
+    def at(self, i: int) -> str:
+        return self.labels[self.codes[i]]
+
+    def equals(self, value: str) -> np.ndarray:
+        try:
+            return self.codes == self.labels.index(value)
+        except ValueError:
+            return np.zeros(len(self.codes), dtype=bool)
+
+
+def _labels(snapshot, column: str, blank: str, positions: np.ndarray) -> _Labels:
+    if column not in snapshot.column_map:
+        return _Labels(np.zeros(len(positions), dtype=np.int32), [blank])
+    codes, labels = text_codes(snapshot, column, blank)
+    return _Labels(codes[positions], labels)
+
+
+def _day_numbers(snapshot, positions: np.ndarray) -> np.ndarray:
+    """Last_Order_Date as days since 1970-01-01, NO_DATE where blank or unparseable."""
+    if "Last_Order_Date" not in snapshot.column_map:
+        return np.full(len(positions), NO_DATE, dtype=np.int32)
+    col = snapshot.column("Last_Order_Date")
+    if isinstance(col, DateColumn):
+        return col.data[positions]
+
+    def build(snap):
+        codes, labels = text_codes(snap, "Last_Order_Date")
+        days = np.full(len(labels), NO_DATE, dtype=np.int32)
+        for i, label in enumerate(labels):
+            try:
+                days[i] = (date.fromisoformat(label[:10]) - _EPOCH).days
+            except ValueError:
+                pass
+        return days[codes]
+
+    return snapshot.derived("last_order_days", build)[positions]
+
+
+def _se_rankings(se: _Labels, mobile: _Labels, decline, growth, abs_dif) -> tuple[list, list]:
+    """
+    Top SEs by declining and by growing account count. Every SE in view is
+    ranked (a count of 0 included), ties in order of first appearance, and
+    the mobile shown is the one on the SE's first row.
+    """
+    named = np.ones(len(se.codes), dtype=bool)
+    if "Unassigned" in se.labels:
+        named &= se.codes != se.labels.index("Unassigned")
+    if "" in se.labels:
+        named &= se.codes != se.labels.index("")
+    if not named.any():
+        return [], []
+
+    codes  = se.codes[named]
+    n      = len(se.labels)
+    present, first = np.unique(codes, return_index=True)
+    order  = np.argsort(first)
+    groups = present[order]
+    first_row = np.flatnonzero(named)[first[order]]
+
+    def ranked(mask, vol):
+        count  = np.bincount(codes, weights=mask[named], minlength=n)[groups]
+        volume = np.bincount(codes, weights=np.where(mask, vol, 0.0)[named], minlength=n)[groups]
+        top    = np.argsort(-count, kind="stable")[:TOP_SES]
+        return [
+            {
+                "name":   se.labels[groups[g]],
+                "count":  int(count[g]),
+                "vol":    float(volume[g]),
+                "mobile": mobile.at(int(first_row[g])),
+            }
+            for g in top.tolist()
+        ]
+
+    return ranked(decline, np.abs(abs_dif)), ranked(growth, abs_dif)
+
+
+def _card(kind: str, icon: str, title: str, desc: str, rows) -> dict:
+    return {"kind": kind, "icon": icon, "title": title, "desc": desc, "rows": rows}
+
+
+def _s(n: int) -> str:
+    return "s" if n > 1 else ""
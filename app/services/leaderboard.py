@@ -0,0 +1,269 @@
+"""
+app/services/leaderboard.py — Heritage Samarth | Team leaderboard
+==================================================================
+The Team tab's SE / SO / Region leaderboards as pre-aggregated group
+tables, so the page asks for one sorted, searched page at a time instead
+of grouping and re-sorting every row in the browser.
+
+  boards     "se" → SE_Name, "so" → SO_Name (+ region), "rh" → Region (+ SO count)
+  tables     one LeaderboardTable per (board, scope, slicer filters), built
+             with bincount over the snapshot and kept on the snapshot in a
+             small LRU — a CXO's all-rows tables are built once per refresh
+  pages      sort orders are permutations memoised on the table, so a page
+             is a slice of one precomputed argsort, plus a mask for search
+
+Groups, counts and YoY% follow buildLeaderboardData() in dashboard.html:
+blank names are skipped, YoY is rounded to one decimal, ties keep the
+MTD-descending order the page started from.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.services.summary import (
+    DECLINE, GROWTH, NEW, filtered_positions, metric_values, text_codes, trend_buckets,
+)
+
+BOARDS = {"se": "SE_Name", "so": "SO_Name", "rh": "Region"}
+
+NUMERIC_SORTS = ("mtd", "lymtd", "yoy", "growth", "decline", "newAccts", "total", "winRate", "soCount")
+TEXT_SORTS    = ("name", "region")
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE     = 200
+
+EMPTY_TEAM = {"se_count": 0, "top": None, "avg_yoy": 0.0, "worst": None}
+
+# Group tables kept per snapshot — one per distinct (board, scope, filters).
+_TABLES_PER_SNAPSHOT = 256
+
+
+class LeaderboardTable:
+    """One board's groups for one set of rows, in MTD-descending order."""
+
+    def __init__(self, names: list[str], columns: dict[str, np.ndarray], text: dict[str, list]):
+        self.names   = names
+        self.columns = columns              # numeric column → array per group
+        self.text    = text                 # "name" / "region" → str per group
+        self._lower  = {k: [v.lower() for v in vals] for k, vals in text.items()}
+        self._orders = {}
+        self._lock   = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def order(self, sort: str, descending: bool) -> np.ndarray:
+        """Group indices sorted by one column — memoised per (sort, direction)."""
+        key   = (sort, descending)
+        order = self._orders.get(key)
+        if order is None:
+            if sort in self.text:
+                # Rank of each group's text; a stable sort on the rank keeps
+                # ties in the table's MTD order, as the page's sort did.
+                lower   = self._lower[sort]
+                ranking = {v: i for i, v in enumerate(sorted(set(lower)))}
+                values  = np.array([ranking[v] for v in lower], dtype=np.int64)
+            else:
+                values = self.columns[sort]
+            order = np.argsort(-values if descending else values, kind="stable")
+            with self._lock:
+                self._orders[key] = order
+        return order
+
+    def page(self, sort: str, descending: bool, search: str, page: int, size: int) -> dict:
+        """One page of rows plus the counts the pager and mini-bars need."""
+        order = self.order(sort, descending)
+        if search:
+            needle = search.lower()
+            hits   = np.zeros(len(self), dtype=bool)
+            for values in self._lower.values():
+                hits |= np.fromiter((needle in v for v in values), dtype=bool, count=len(self))
+            order = order[hits[order]]
+
+        total = len(order)
+        pages = max(1, -(-total // size))
+        page  = min(max(page, 1), pages)
+        start = (page - 1) * size
+        rows  = [self.row(int(i)) for i in order[start:start + size]]
+        return {
+            "rows":    rows,
+            "total":   total,
+            "page":    page,
+            "pages":   pages,
+            "size":    size,
+            "start":   start,
+            "max_mtd": float(self.columns["mtd"][order].max()) if total else 0.0,
+        }
+
+    def row(self, i: int) -> dict:
+        row = {"name": self.names[i]}
+        for key in ("mtd", "lymtd", "yoy"):
+            row[key] = float(self.columns[key][i])
+        for key in ("growth", "decline", "newAccts", "total"):
+            row[key] = int(self.columns[key][i])
+        if "region" in self.text:
+            row["region"] = self.text["region"][i]
+        if "soCount" in self.columns:
+            row["soCount"] = int(self.columns["soCount"][i])
+        return row
+
+
+def sort_column(board: str, sort: str) -> str:
+    """sort if the board has that column, else the default "mtd"."""
+    if sort in TEXT_SORTS:
+        return sort if sort == "name" or board == "so" else "mtd"
+    if sort in NUMERIC_SORTS:
+        return sort if sort != "soCount" or board == "rh" else "mtd"
+    return "mtd"
+
+
+def get_table(snapshot, board: str, user: dict, scope: tuple, filters: tuple) -> LeaderboardTable:
+    """
+    The group table for a board over the user's rows after the slicer
+    filters. scope is scope_key() for the user — tables are shared between
+    users that see the same rows.
+    """
+    tables = snapshot.derived("leaderboard_tables", lambda _: _TableCache())
+    key    = (board, scope, filters)
+    table  = tables.get(key)
+    if table is None:
+        positions = filtered_positions(snapshot, user, filters)
+        table     = build_table(snapshot, board, positions)
+        tables.put(key, table)
+    return table
+
+
+def build_table(snapshot, board: str, positions: np.ndarray) -> LeaderboardTable:
+    """Groups the rows at positions by the board's column with grouped reductions."""
+    column = BOARDS[board]
+    if column not in snapshot.column_map:
+        return LeaderboardTable([], _empty_columns(board), _empty_text(board))
+
+    codes, labels = text_codes(snapshot, column)
+    row_codes = codes[positions]
+    n         = len(labels)
+    sales     = metric_values(snapshot, "MTD", positions)
+    lymtd     = metric_values(snapshot, "LYMTD", positions)
+    bucket    = trend_buckets(snapshot, positions)
+
+    def count(mask):
+        return np.bincount(row_codes[mask], minlength=n)
+
+    mtd_sum   = np.bincount(row_codes, weights=sales, minlength=n)
+    lymtd_sum = np.bincount(row_codes, weights=lymtd, minlength=n)
+    total     = np.bincount(row_codes, minlength=n)
+    growth    = count(bucket == GROWTH)
+    decline   = count(bucket == DECLINE)
+    new_accts = count(bucket == NEW)
+
+    # Groups in order of first appearance, blank names dropped, then the
+    # page's starting order: MTD descending, ties in appearance order.
+    present, first = np.unique(row_codes, return_index=True)
+    groups = present[np.argsort(first)]
+    if "" in labels:
+        groups = groups[groups != labels.index("")]
+    groups = groups[np.argsort(-mtd_sum[groups], kind="stable")]
+
+    mtd, ly = mtd_sum[groups], lymtd_sum[groups]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        yoy = np.where(ly > 0, (mtd - ly) / ly * 100, np.where(mtd > 0, 100.0, 0.0))
+    columns = {
+        "mtd":      mtd,
+        "lymtd":    ly,
+        "yoy":      np.round(yoy, 1),
+        "growth":   growth[groups],
+        "decline":  decline[groups],
+        "newAccts": new_accts[groups],
+        "total":    total[groups],
+    }
+    columns["winRate"] = columns["growth"] / columns["total"]     # every group has ≥ 1 row
+
+    names = [labels[g] for g in groups.tolist()]
+    text  = {"name": names}
+    if board in ("so", "rh"):
+        so_region = _so_regions(snapshot, positions)
+        if board == "so":
+            text["region"] = [so_region.get(name, "") for name in names]
+        else:
+            per_region = {}
+            for region in so_region.values():
+                per_region[region] = per_region.get(region, 0) + 1
+            columns["soCount"] = np.array([per_region.get(name, 0) for name in names], dtype=np.int64)
+    return LeaderboardTable(names, columns, text)
+
+
+def team_kpis(table: LeaderboardTable) -> dict:
+    """The Team tab cards, from the SE table: count, top SE, average YoY, most declines."""
+    if not len(table):
+        return dict(EMPTY_TEAM)
+
+    cols  = table.columns
+    valid = cols["lymtd"] > 0
+    worst = int(np.argmax(cols["decline"]))     # first maximum — ties keep MTD order
+    return {
+        "se_count": len(table),
+        "top":      {"name": table.names[0], "mtd": float(cols["mtd"][0])},
+        "avg_yoy":  float(cols["yoy"][valid].mean()) if valid.any() else 0.0,
+        "worst":    (
+            {"name": table.names[worst], "decline": int(cols["decline"][worst])}
+            if cols["decline"][worst] > 0 else None
+        ),
+    }
+
+
+def empty_page(size: int) -> dict:
+    """LeaderboardTable.page() of no groups — served before the first snapshot loads."""
+    return {"rows": [], "total": 0, "page": 1, "pages": 1, "size": size, "start": 0, "max_mtd": 0.0}
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+class _TableCache:
+    """Bounded LRU of LeaderboardTables for one snapshot."""
+
+    def __init__(self):
+        self._tables = OrderedDict()
+        self._lock   = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            table = self._tables.get(key)
+            if table is not None:
+                self._tables.move_to_end(key)
+            return table
+
+    def put(self, key, table) -> None:
+        with self._lock:
+            self._tables[key] = table
+            while len(self._tables) > _TABLES_PER_SNAPSHOT:
+                self._tables.popitem(last=False)
+
+
+def _so_regions(snapshot, positions: np.ndarray) -> dict[str, str]:
+    """SO name → region, the last non-blank pairing among the rows (as the page kept it)."""
+    if "SO_Name" not in snapshot.column_map or "Region" not in snapshot.column_map:
+        return {}
+    so_codes, so_labels   = text_codes(snapshot, "SO_Name")
+    reg_codes, reg_labels = text_codes(snapshot, "Region")
+    so, reg = so_codes[positions], reg_codes[positions]
+
+    keep = np.ones(len(positions), dtype=bool)
+    if "" in so_labels:
+        keep &= so != so_labels.index("")
+    if "" in reg_labels:
+        keep &= reg != reg_labels.index("")
+    so, reg = so[keep][::-1], reg[keep][::-1]
+
+    present, last = np.unique(so, return_index=True)
+    return {so_labels[s]: reg_labels[r] for s, r in zip(present.tolist(), reg[last].tolist())}
+
+
+def _empty_columns(board: str) -> dict[str, np.ndarray]:
+    keys = list(NUMERIC_SORTS) if board == "rh" else [k for k in NUMERIC_SORTS if k != "soCount"]
+    return {k: np.zeros(0) for k in keys}
+
+
+def _empty_text(board: str) -> dict[str, list]:
+    return {"name": [], "region": []} if board == "so" else {"name": []}
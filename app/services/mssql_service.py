@@ -1,5 +1,11 @@
+import gzip
+import json
 import os
+import threading
+import time
 import pyodbc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import date, datetime
 from flask import current_app
@@ -7,8 +13,10 @@ from flask import current_app
 
 def get_mssql_connection():
     """
-    Opens and returns a raw pyodbc connection using config values.
-    Caller is responsible for closing it.
+    Opens and returns a raw pyodbc connection using config values, with
+    the login timeout (MSSQL_LOGIN_TIMEOUT) and per-query timeout
+    (MSSQL_QUERY_TIMEOUT) applied. Caller is responsible for closing it —
+    fetches go through pooled_cursor() instead.
     """
     driver = "{ODBC Driver 17 for SQL Server}"
     conn_str = (
@@ -18,18 +26,303 @@ def get_mssql_connection():
         f"UID={current_app.config['MSSQL_USER']};"
         f"PWD={current_app.config['MSSQL_PASS']}"
     )
-    return pyodbc.connect(conn_str)
+    conn = pyodbc.connect(conn_str, timeout=current_app.config["MSSQL_LOGIN_TIMEOUT"])
+    conn.timeout = current_app.config["MSSQL_QUERY_TIMEOUT"]
+    return conn
 
 
-def _get_sql_path() -> str:
+# ── Connection pool ───────────────────────────────────────────────────────────
+# Connecting (TCP + TLS + login) costs more than the small queries do, so
+# up to MSSQL_POOL_SIZE idle connections are kept per process. Every
+# checkout of an idle connection is validated with SELECT 1; connections
+# older than MSSQL_POOL_RECYCLE_SECONDS, or that errored, are closed.
+#
+# Every query runs through pooled_cursor(), which registers it as active
+# so cancel_running_queries() can abort it — see below.
+
+class QueryCancelled(Exception):
+    """Raised inside a fetch that was cancelled from the admin panel."""
+
+
+class _ConnectionPool:
+    def __init__(self):
+        self._idle = []                # [(conn, created_at)], most recent last
+        self._lock = threading.Lock()
+        self._pid  = os.getpid()
+
+    def acquire(self):
+        """A validated connection — an idle one if any is healthy, else a new one."""
+        while True:
+            with self._lock:
+                if self._pid != os.getpid():
+                    # Forked worker: the parent's sockets aren't ours to use.
+                    self._idle, self._pid = [], os.getpid()
+                if not self._idle:
+                    break
+                conn, created = self._idle.pop()
+
+            if time.monotonic() - created > current_app.config["MSSQL_POOL_RECYCLE_SECONDS"]:
+                _close_quietly(conn)
+                continue
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+                _bump("reused")
+                return conn, created
+            except Exception:
+                _bump("validation_failures")
+                _close_quietly(conn)
+
+        started = time.monotonic()
+        try:
+            conn = get_mssql_connection()
+        except Exception:
+            _bump("connect_failures")
+            raise
+        elapsed = time.monotonic() - started
+        with _STATS_LOCK:
+            _POOL_STATS["connects"]             += 1
+            _POOL_STATS["connect_seconds_total"] += elapsed
+            _POOL_STATS["last_connect_seconds"]  = round(elapsed, 3)
+        return conn, time.monotonic()
+
+    def release(self, conn, created: float, healthy: bool) -> None:
+        with self._lock:
+            if healthy and self._pid == os.getpid() and (
+                len(self._idle) < current_app.config["MSSQL_POOL_SIZE"]
+            ):
+                self._idle.append((conn, created))
+                return
+        _close_quietly(conn)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+
+class _ActiveQuery:
+    """One running query — what the admin panel sees and can cancel."""
+
+    def __init__(self, label: str, cursor):
+        self.label      = label
+        self.cursor     = cursor
+        self.started    = time.time()
+        self.first_row  = None          # seconds from execute to first row
+        self.cancelled  = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        try:
+            self.cursor.cancel()        # SQLCancel — aborts a running execute/fetch
+        except Exception:
+            pass
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise QueryCancelled(f"{self.label} cancelled")
+
+
+class _TrackedCursor:
+    """
+    A cursor that checks for cancellation around every call and records
+    time-to-first-row. Just the DB-API surface the fetch paths use.
+    """
+
+    def __init__(self, cursor, query: _ActiveQuery):
+        self._cursor = cursor
+        self._query  = query
+        self._t0     = time.monotonic()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql: str):
+        self._query.check()
+        self._t0 = time.monotonic()
+        self._cursor.execute(sql)
+        self._query.check()
+        return self
+
+    def fetchone(self):
+        self._query.check()
+        return self._mark(self._cursor.fetchone())
+
+    def fetchmany(self, size: int):
+        self._query.check()
+        return self._mark(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        self._query.check()
+        return self._mark(self._cursor.fetchall())
+
+    def _mark(self, result):
+        self._query.check()
+        if self._query.first_row is None:
+            self._query.first_row = time.monotonic() - self._t0
+        return result
+
+
+_POOL      = _ConnectionPool()
+_ACTIVE    = {}                # id(_ActiveQuery) → _ActiveQuery
+_STATS_LOCK = threading.Lock()
+_POOL_STATS = {
+    "connects":              0,     # new connections opened
+    "connect_failures":      0,
+    "connect_seconds_total": 0.0,
+    "last_connect_seconds":  None,
+    "checkouts":             0,     # pooled_cursor() calls
+    "reused":                0,     # served by a validated idle connection
+    "validation_failures":   0,     # idle connections that failed SELECT 1
+    "queries_failed":        0,
+    "queries_cancelled":     0,
+    "last_query":            None,
+    "last_ttfb_seconds":     None,  # execute → first row of the last query
+    "last_fetch_seconds":    None,  # execute → last row of the last query
+    "fetch_seconds_total":   0.0,
+}
+_WATCHDOG = {"thread": None}
+
+
+@contextmanager
+def pooled_cursor(label: str):
+    """
+    Yields a cursor on a pooled, validated connection, registered as an
+    active query under label. The connection goes back to the pool if the
+    block finishes cleanly and is closed otherwise (timeouts and cancels
+    leave it in an unknown state).
+    """
+    _bump("checkouts")
+    conn, created = _POOL.acquire()
+    query   = _ActiveQuery(label, conn.cursor())
+    healthy = False
+    with _STATS_LOCK:
+        _ACTIVE[id(query)] = query
+    _ensure_watchdog()
+
+    started = time.monotonic()
+    try:
+        yield _TrackedCursor(query.cursor, query)
+        healthy = True
+    except QueryCancelled:
+        _bump("queries_cancelled")
+        raise
+    except Exception:
+        # pyodbc reports a cancelled execute as an OperationalError
+        _bump("queries_cancelled" if query.cancelled else "queries_failed")
+        if query.cancelled:
+            raise QueryCancelled(f"{label} cancelled") from None
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        with _STATS_LOCK:
+            _ACTIVE.pop(id(query), None)
+            _POOL_STATS["last_query"]          = label
+            _POOL_STATS["last_fetch_seconds"]  = round(elapsed, 3)
+            _POOL_STATS["fetch_seconds_total"] += elapsed
+            if query.first_row is not None:
+                _POOL_STATS["last_ttfb_seconds"] = round(query.first_row, 3)
+        _POOL.release(conn, created, healthy)
+
+
+def cancel_running_queries() -> int:
     """
-    Returns the absolute path to the SQL file.
+    Cancels every query running against the warehouse — in this process
+    straight away, and in the other workers within about a second, via a
+    marker file in CACHE_DIR that their watchdogs poll. Returns how many
+    queries this process cancelled.
+    """
+    path = _cancel_marker_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(str(time.time()))
+    except OSError as e:
+        current_app.logger.error(f"Could not write cancel marker: {e}")
+
+    with _STATS_LOCK:
+        queries = list(_ACTIVE.values())
+    for query in queries:
+        query.cancel()
+    current_app.logger.warning(f"Cancel requested — {len(queries)} query(ies) in this worker")
+    return len(queries)
+
+
+def pool_status() -> dict:
+    """Pool counters and running queries, for get_cache_status()."""
+    now = time.time()
+    with _STATS_LOCK:
+        stats   = dict(_POOL_STATS)
+        running = [
+            {"label": q.label, "seconds": round(now - q.started, 1), "cancelled": q.cancelled}
+            for q in _ACTIVE.values()
+        ]
+    connects = stats.pop("connect_seconds_total")
+    stats["avg_connect_seconds"] = round(connects / stats["connects"], 3) if stats["connects"] else None
+    stats["fetch_seconds_total"] = round(stats["fetch_seconds_total"], 2)
+    stats["idle_connections"]    = _POOL.idle_count()
+    stats["running"]             = running
+    return stats
+
+
+def _bump(counter: str) -> None:
+    with _STATS_LOCK:
+        _POOL_STATS[counter] += 1
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _cancel_marker_path() -> str:
+    return os.path.join(current_app.config["CACHE_DIR"], "cancel.request")
+
+
+def _ensure_watchdog() -> None:
+    """
+    Starts this process's watchdog if it isn't running: while queries are
+    active it checks the cancel marker once a second and cancels every
+    query that started before the marker was written.
+    """
+    with _STATS_LOCK:
+        thread = _WATCHDOG["thread"]
+        if thread is not None and thread.is_alive():
+            return
+        path = _cancel_marker_path()
+
+        def watch():
+            while True:
+                time.sleep(1)
+                with _STATS_LOCK:
+                    queries = list(_ACTIVE.values())
+                    if not queries:
+                        _WATCHDOG["thread"] = None
+                        return
+                try:
+                    requested_at = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                for query in queries:
+                    if not query.cancelled and query.started <= requested_at:
+                        query.cancel()
+
+        _WATCHDOG["thread"] = threading.Thread(target=watch, daemon=True, name="SamarthQueryWatchdog")
+        _WATCHDOG["thread"].start()
+
+
+def _get_sql_path(filename: str = "performance_analysis.sql") -> str:
+    """
+    Returns the absolute path to a file in sql/.
     Works regardless of where the app is launched from.
     """
     project_root = os.path.dirname(
         os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     )
-    return os.path.join(project_root, "sql", "performance_analysis.sql")
+    return os.path.join(project_root, "sql", filename)
 
 
 def _clean_value(val):
@@ -49,15 +342,8 @@ def _clean_value(val):
     return val
 
 
-def fetch_performance_data() -> tuple[list[str], list[list]]:
-    """
-    Reads the SQL file, runs it against MSSQL, and returns:
-        columns  — list of column name strings
-        rows     — list of cleaned rows (each row is a list)
-
-    Raises an exception on any DB or file error — caller handles it.
-    """
-    sql_path = _get_sql_path()
+def _read_sql(filename: str = "performance_analysis.sql") -> str:
+    sql_path = _get_sql_path(filename)
 
     if not os.path.exists(sql_path):
         raise FileNotFoundError(
@@ -67,19 +353,280 @@ def fetch_performance_data() -> tuple[list[str], list[list]]:
         )
 
     with open(sql_path, encoding="utf-8") as f:
-        sql = f.read()
+        return f.read()
 
-    conn   = get_mssql_connection()
-    cursor = conn.cursor()
 
-    try:
+def fetch_watermark() -> dict:
+    """
+    Runs sql/watermark_probe.sql — a few index-friendly aggregates that move
+    whenever the performance query's result could change — and returns them
+    as a JSON-safe dict, e.g.
+        {"AsOfDate": "2026-03-14", "MaxBillingDate": "2026-03-13",
+         "CurrentMonthRows": 412093, ...}
+
+    Raises an exception on any DB or file error — caller handles it.
+    """
+    sql = _read_sql("watermark_probe.sql")
+
+    with pooled_cursor("watermark probe") as cursor:
         cursor.execute(sql)
         columns = [col[0] for col in cursor.description]
-        rows    = [
-            [_clean_value(val) for val in row]
-            for row in cursor.fetchall()
-        ]
-    finally:
-        conn.close()   # always close, even if fetchall() raises
+        row     = cursor.fetchone()
+
+    return {col: _clean_value(val) for col, val in zip(columns, row)}
+
+
+def fetch_performance_snapshot():
+    """
+    Runs the performance query and streams the result straight into a
+    ColumnarSnapshot — rows are pulled FETCH_BATCH_SIZE at a time and
+    converted with one converter per column (chosen from the cursor's type
+    codes), so the full result is never held as Python rows.
+
+    REFRESH_MODE = "parallel" / "incremental" build the same result from
+    per-window queries instead (see fetch_parallel_snapshot and
+    fetch_incremental_snapshot); "engine" computes the windows in Python
+    from daily aggregates (fetch_engine_snapshot).
+
+    Raises an exception on any DB or file error — caller handles it.
+    """
+    from app.services.columnar import snapshot_from_cursor
+
+    if current_app.config["REFRESH_MODE"] == "incremental":
+        return fetch_incremental_snapshot()
+    if current_app.config["REFRESH_MODE"] == "parallel":
+        return fetch_parallel_snapshot()
+    if current_app.config["REFRESH_MODE"] == "engine":
+        return fetch_engine_snapshot()
+
+    sql        = _read_sql()
+    batch_size = current_app.config["FETCH_BATCH_SIZE"]
+
+    with pooled_cursor("performance query") as cursor:
+        cursor.execute(sql)
+        return snapshot_from_cursor(cursor, time.time(), batch_size)
+
+
+def fetch_parallel_snapshot(as_of: date = None):
+    """
+    Builds the performance snapshot from the decomposed query parts in
+    window_queries.py, every part covering its full range — the same work
+    as performance_analysis.sql, but as independent queries run
+    concurrently on PARALLEL_QUERY_WORKERS connections and hash-joined in
+    Python on (CustomerID, SalesOfficeID, ProductHeirachy1). Wall-clock time
+    tends towards the slowest single part instead of the sum of all CTEs.
+
+    Raises an exception on any DB or file error — caller handles it.
+    """
+    from app.services import window_queries as wq
+
+    as_of   = as_of or date.today()
+    started = time.monotonic()
+
+    # Whole-history scans first so they start on the pool right away.
+    queries = {
+        "KEYS": wq.keys_sql(),
+        "LOD":  wq.last_order_sql(),
+        "LCG":  wq.customer_group_sql(),
+    }
+    queries.update({name: wq.window_sql(name, as_of) for name in wq.WINDOW_COLUMNS})
+    queries.update(SE=wq.SE_MAPPING_SQL, CUSTOMERS=wq.CUSTOMERS_SQL, OFFICES=wq.OFFICES_SQL)
+
+    rows     = _run_part_queries(queries)
+    parts    = {name: wq.part_from_rows(name, part_rows) for name, part_rows in rows.items()}
+    snapshot = wq.assemble_snapshot(parts, time.time())
+
+    current_app.logger.info(
+        f"Parallel refresh — {len(queries)} parts, {snapshot.row_count:,} rows in "
+        f"{time.monotonic() - started:.2f}s"
+    )
+    return snapshot
+
+
+def fetch_incremental_snapshot(as_of: date = None):
+    """
+    Builds the performance snapshot from the decomposed query parts in
+    window_queries.py, fetching only what can have changed since the
+    period began:
+
+      stable   LM, LY (month), LQ (quarter), LW (week), plus keys, last
+               order dates and customer groups up to the start of the
+               month — cached under CACHE_DIR/windows/ keyed by period,
+               queried once per period
+      volatile LMTD, MTD, LYMTD, TW and the current month's keys, last
+               order dates and customer groups — queried every refresh
+      masters  SE mapping, customer and sales-office masters (small)
+
+    Late corrections to already-closed periods are not seen until the
+    period rolls over or a full refresh runs (REFRESH_MODE = "full").
+
+    Raises an exception on any DB or file error — caller handles it.
+    """
+    from app.services import window_queries as wq
+
+    as_of   = as_of or date.today()
+    m0      = wq.month_start(as_of)
+    month   = f"{as_of:%Y-%m}"
+    started = time.monotonic()
+
+    stable = {name: (wq.period_key(name, as_of), wq.window_sql(name, as_of))
+              for name in wq.STABLE_WINDOWS}
+    stable["KEYS_BEFORE"] = (month, wq.keys_sql(before=m0))
+    stable["LOD_BEFORE"]  = (month, wq.last_order_sql(before=m0))
+    stable["LCG_BEFORE"]  = (month, wq.customer_group_sql(before=m0))
+
+    volatile = {name: wq.window_sql(name, as_of)
+                for name in wq.WINDOW_COLUMNS if name not in wq.STABLE_WINDOWS}
+    volatile["KEYS_RECENT"] = wq.keys_sql(since=m0)
+    volatile["LOD_RECENT"]  = wq.last_order_sql(since=m0)
+    volatile["LCG_RECENT"]  = wq.customer_group_sql(since=m0)
+    volatile["SE"]          = wq.SE_MAPPING_SQL
+    volatile["CUSTOMERS"]   = wq.CUSTOMERS_SQL
+    volatile["OFFICES"]     = wq.OFFICES_SQL
+
+    rows, missing = {}, {}
+    for name, (period, sql) in stable.items():
+        cached = _load_stable_part(name, period)
+        if cached is None:
+            missing[name] = sql
+        else:
+            rows[name] = cached
+
+    fetched = _run_part_queries({**missing, **volatile})
+    for name in missing:
+        _save_stable_part(name, stable[name][0], fetched[name])
+    rows.update(fetched)
+
+    # Everything up to the month start, overlaid with this month's data.
+    lod = wq.part_from_rows("LOD", rows["LOD_BEFORE"])
+    for key, day in wq.part_from_rows("LOD", rows["LOD_RECENT"]).items():
+        if day > lod.get(key, ""):
+            lod[key] = day
+    keys = dict.fromkeys(wq.part_from_rows("KEYS", rows["KEYS_BEFORE"]))
+    keys.update(dict.fromkeys(wq.part_from_rows("KEYS", rows["KEYS_RECENT"])))
+
+    parts = {name: wq.part_from_rows(name, rows[name]) for name in wq.WINDOW_COLUMNS}
+    parts.update({
+        "KEYS":      list(keys),
+        "LOD":       lod,
+        "LCG":       {**wq.part_from_rows("LCG", rows["LCG_BEFORE"]),
+                      **wq.part_from_rows("LCG", rows["LCG_RECENT"])},
+        "SE":        wq.part_from_rows("SE", rows["SE"]),
+        "CUSTOMERS": wq.part_from_rows("CUSTOMERS", rows["CUSTOMERS"]),
+        "OFFICES":   wq.part_from_rows("OFFICES", rows["OFFICES"]),
+    })
+    snapshot = wq.assemble_snapshot(parts, time.time())
+
+    current_app.logger.info(
+        f"Incremental refresh — {len(stable) - len(missing)} stable part(s) from cache, "
+        f"{len(fetched)} queried, {snapshot.row_count:,} rows in "
+        f"{time.monotonic() - started:.2f}s"
+    )
+    return snapshot
+
+
+def fetch_engine_snapshot(as_of: date = None):
+    """
+    Builds the performance snapshot with the NumPy window engine: the BI
+    server only returns quantity per key per day since the earliest window
+    start (one GROUP BY over ~13 months) plus the customer-level parts, and
+    every window, diff, growth percentage and trend is computed here.
+
+    Raises an exception on any DB or file error — caller handles it.
+    """
+    from app.services import window_queries as wq
+    from app.services.window_engine import DailyAggregates, engine_parts, feed_start
+
+    as_of   = as_of or date.today()
+    started = time.monotonic()
+
+    rows = _run_part_queries({
+        "DAILY":     wq.daily_sales_sql(feed_start(as_of)),
+        "LCG":       wq.customer_group_sql(),
+        "SE":        wq.SE_MAPPING_SQL,
+        "CUSTOMERS": wq.CUSTOMERS_SQL,
+        "OFFICES":   wq.OFFICES_SQL,
+    })
+    fetched = time.monotonic()
+
+    feed  = DailyAggregates.from_rows(rows.pop("DAILY"))
+    parts = engine_parts(feed, as_of)
+    parts.update({name: wq.part_from_rows(name, part_rows) for name, part_rows in rows.items()})
+    snapshot = wq.assemble_snapshot(parts, time.time())
+
+    current_app.logger.info(
+        f"Engine refresh — {len(feed.days):,} daily rows for {feed.key_count:,} keys, "
+        f"{snapshot.row_count:,} rows; fetch {fetched - started:.2f}s, "
+        f"compute {time.monotonic() - fetched:.2f}s"
+    )
+    return snapshot
+
+
+# ── Decomposed query parts ────────────────────────────────────────────────────
+
+def _run_part_queries(queries: dict) -> dict[str, list[list]]:
+    """
+    Runs the named part queries concurrently on up to
+    PARALLEL_QUERY_WORKERS threads, each part on its own pooled connection
+    (pyodbc connections can't be shared between threads), and returns every
+    part's cleaned rows. A None query (a window whose divisor is NULL)
+    yields no rows. If any part fails or is cancelled, parts not yet started
+    are dropped. Logs each part's time and the overall wall-clock.
+    """
+    app     = current_app._get_current_object()
+    workers = max(1, min(app.config["PARALLEL_QUERY_WORKERS"], len(queries)))
+
+    def run(name: str, sql: str) -> tuple[list[list], float]:
+        t0 = time.monotonic()
+        if sql is None:
+            return [], 0.0
+        with app.app_context(), pooled_cursor(f"part {name}") as cursor:
+            cursor.execute(sql)
+            rows = [[_clean_value(v) for v in row] for row in cursor.fetchall()]
+        return rows, time.monotonic() - t0
+
+    started, results = time.monotonic(), {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="SamarthPart") as pool:
+        futures = {name: pool.submit(run, name, sql) for name, sql in queries.items()}
+        try:
+            for name, future in futures.items():
+                results[name], seconds = future.result()
+                app.logger.info(
+                    f"  part {name:<12} {len(results[name]):>8,} rows  {seconds:6.2f}s"
+                )
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+
+    app.logger.info(
+        f"  {len(queries)} parts on {workers} connection(s) in {time.monotonic() - started:.2f}s"
+    )
+    return results
+
+
+def _stable_part_path(name: str) -> str:
+    return os.path.join(current_app.config["CACHE_DIR"], "windows", f"{name}.json.gz")
+
+
+def _load_stable_part(name: str, period: str) -> list[list] | None:
+    """Cached rows of a stable part, or None if missing, unreadable or another period."""
+    try:
+        with gzip.open(_stable_part_path(name), "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return payload["rows"] if payload.get("period") == period else None
+
+
+def _save_stable_part(name: str, period: str, rows: list[list]) -> None:
+    """Replaces the cached rows of a stable part. Failures only cost a re-query."""
+    path = _stable_part_path(name)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"name": name, "period": period, "rows": rows}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        current_app.logger.warning(f"Could not cache stable part {name}: {e}")
 
-    return columns, rows
\ No newline at end of file
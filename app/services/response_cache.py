@@ -0,0 +1,179 @@
+"""
+app/services/response_cache.py — Heritage Samarth | Pre-serialised responses
+=============================================================================
+Many BMs and RHs share exactly the same scope, so their /api/data payloads
+are byte-for-byte identical for a given snapshot. This module keeps the
+encoded body — plain and gzip — per (snapshot version, scope, …) key, so
+each distinct payload is filtered, serialised and compressed once.
+
+  - Bounded LRU: max entries and max total bytes (config
+    RESPONSE_CACHE_MAX_ENTRIES / RESPONSE_CACHE_MAX_BYTES).
+  - Single-flight per key: concurrent requests for a payload that is being
+    encoded wait for that encoding instead of starting their own.
+  - Strong ETags from the body hash, so a browser revalidating an unchanged
+    payload gets 304 Not Modified — from any worker.
+
+Entries for older snapshot versions are dropped as soon as a newer version
+is requested. A request still on an older version — during
+stale-while-revalidate, or in a worker that has not picked up the new
+shared snapshot yet — is encoded for itself and not cached, so it never
+evicts the current version's entries.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, request
+
+
+class CachedResponse:
+    """One encoded payload — immutable once built."""
+    __slots__ = ("body", "gzip_body", "etag", "mimetype")
+
+    def __init__(self, body: bytes, mimetype: str = "application/json"):
+        self.body      = body
+        self.gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        self.etag      = hashlib.sha1(body).hexdigest()[:24]
+        self.mimetype  = mimetype
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + len(self.gzip_body)
+
+
+class ResponseCache:
+    """
+    LRU of CachedResponse keyed by tuples whose first element is the
+    snapshot version.
+    """
+
+    def __init__(self):
+        self._entries  = OrderedDict()
+        self._building = {}            # key → Event while its encoding runs
+        self._lock     = threading.Lock()
+        self._version  = None
+        self._bytes    = 0
+        self._stats    = {
+            "hits":          0,   # served from an existing entry
+            "misses":        0,   # had to encode
+            "shared":        0,   # waited on another request's encoding of the same key
+            "evictions":     0,   # dropped for size / entry limits
+            "not_modified":  0,   # 304s sent
+        }
+
+    def get_or_build(self, key: tuple, build, mimetype: str = "application/json") -> CachedResponse:
+        """
+        Returns the entry for key, calling build() → bytes to encode it if
+        nobody has yet. Only one thread per key ever runs build().
+        """
+        while True:
+            with self._lock:
+                if _is_newer(key[0], self._version):
+                    self._drop_other_versions(key[0])
+
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry
+
+                pending = self._building.get(key)
+                if pending is None:
+                    pending = self._building[key] = threading.Event()
+                    self._stats["misses"] += 1
+                    break
+                self._stats["shared"] += 1
+
+            # Another request is encoding this payload — wait and re-check.
+            # If it failed, the loop makes this thread the next builder.
+            pending.wait()
+
+        try:
+            entry = CachedResponse(build(), mimetype)
+            with self._lock:
+                if key[0] == self._version:
+                    self._entries[key] = entry
+                    self._bytes += entry.nbytes
+                    self._evict()
+            return entry
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+            pending.set()
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes":   self._bytes,
+                "version": self._version,
+            }
+
+    # ── Private ───────────────────────────────────────────────
+    def _drop_other_versions(self, version) -> None:
+        self._entries.clear()
+        self._bytes   = 0
+        self._version = version
+
+    def _evict(self) -> None:
+        max_entries = current_app.config["RESPONSE_CACHE_MAX_ENTRIES"]
+        max_bytes   = current_app.config["RESPONSE_CACHE_MAX_BYTES"]
+        # Never evict the entry just added, even if it alone exceeds max_bytes.
+        while len(self._entries) > 1 and (
+            len(self._entries) > max_entries or self._bytes > max_bytes
+        ):
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old.nbytes
+            self._stats["evictions"] += 1
+
+
+def _is_newer(version, than) -> bool:
+    """Whether snapshot version is a later load than than (None = no version yet)."""
+    # Versions are the load time in hex milliseconds — see ColumnarSnapshot.version.
+    return than is None or int(version, 16) > int(than, 16)
+
+
+_RESPONSE_CACHE = ResponseCache()
+
+
+# ── Public helpers ────────────────────────────────────────────────────────────
+
+def get_cached_response(key: tuple, build, mimetype: str = "application/json") -> CachedResponse:
+    """Module-level entry point — see ResponseCache.get_or_build()."""
+    return _RESPONSE_CACHE.get_or_build(key, build, mimetype)
+
+
+def response_cache_stats() -> dict:
+    """Counters for get_cache_status()."""
+    return _RESPONSE_CACHE.stats()
+
+
+def conditional_response(entry: CachedResponse) -> Response:
+    """
+    Builds the HTTP response for an entry for the current request:
+    304 if the client already has this exact body, gzip if it accepts it.
+    """
+    use_gzip = bool(request.accept_encodings["gzip"])
+    etag     = entry.etag + ("-gz" if use_gzip else "")
+
+    if request.if_none_match.contains(etag):
+        _RESPONSE_CACHE.record_not_modified()
+        resp = Response(status=304)
+    elif use_gzip:
+        resp = Response(entry.gzip_body, mimetype=entry.mimetype)
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = Response(entry.body, mimetype=entry.mimetype)
+
+    resp.set_etag(etag)
+    # Browser may keep it but must revalidate — the scope is per-session.
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.headers["Vary"]          = "Accept-Encoding, Cookie"
+    return resp
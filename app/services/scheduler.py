@@ -7,9 +7,16 @@ refresh as soon as the clock crosses CACHE_HOUR (default 9 AM).
 Design notes:
   - No external dependencies — uses stdlib threading only
   - Daemon thread dies automatically when the main process exits
-  - Works correctly with gunicorn multi-worker: each worker manages its
-    own in-memory cache independently (existing behaviour)
-  - If the DB is down at 9 AM, retries every minute until it succeeds
+  - Works correctly with gunicorn multi-worker: every worker runs this
+    thread, but the refresh lock file lets only one of them query MSSQL;
+    the others pick up the shared snapshot file it publishes
+  - If the DB is down at 9 AM, retries every tick until it succeeds —
+    while the circuit breaker is open, ticks skip it and the breaker's own
+    backoff decides when the warehouse is tried again
+  - Every refresh starts with a cheap watermark probe; the heavy query only
+    runs if the warehouse moved. After the day's refresh the probe repeats
+    every WATERMARK_PROBE_MINUTES, so a late ETL load is picked up the same
+    morning instead of the next day
 """
 
 import threading
@@ -19,6 +26,7 @@ from datetime import datetime
 _state = {
     "started":           False,
     "last_refresh_date": None,   # date of last successful scheduler-triggered refresh
+    "last_probe_at":     0.0,    # monotonic time of the last intraday watermark probe
 }
 _lock = threading.Lock()
 
@@ -68,7 +76,13 @@ def _maybe_refresh(app) -> None:
       2. We haven't already refreshed today (via scheduler or user request)
     """
     with app.app_context():
-        from app.services.cache_service import cache_is_fresh, refresh_data
+        from app.services.cache_service import (
+            cache_is_fresh,
+            refresh_data,
+            refresh_if_changed,
+            sync_shared_snapshot,
+        )
+        from app.services.circuit_breaker import is_open
 
         cache_hour = app.config["CACHE_HOUR"]
         now        = datetime.now()
@@ -78,22 +92,33 @@ def _maybe_refresh(app) -> None:
         if now.hour < cache_hour:
             return
 
-        # ── Guard 2: already done today ──────────────────────────
+        # ── Guard 2: already done today — just watch for late data ─
         if _state["last_refresh_date"] == today:
+            interval = app.config["WATERMARK_PROBE_MINUTES"] * 60
+            if interval and time.monotonic() - _state["last_probe_at"] >= interval:
+                _state["last_probe_at"] = time.monotonic()
+                error = refresh_if_changed()
+                if error:
+                    app.logger.warning(f"CacheScheduler: watermark probe failed — {error}")
             return
 
-        # ── Guard 3: cache is already fresh (user triggered it) ──
+        # ── Guard 3: cache is already fresh (user or peer worker) ─
+        sync_shared_snapshot()
         if cache_is_fresh():
             _state["last_refresh_date"] = today   # mark as done
             return
 
+        # ── Guard 4: warehouse circuit breaker open ──────────────
+        if is_open():
+            return
+
         # ── Trigger scheduled refresh ─────────────────────────────
         app.logger.info(
             f"CacheScheduler: scheduled refresh at "
             f"{now:%Y-%m-%d %H:%M} (CACHE_HOUR={cache_hour})"
         )
 
-        error = refresh_data(force=True)
+        error = refresh_data()
 
         if error:
             app.logger.error(
@@ -102,4 +127,5 @@ def _maybe_refresh(app) -> None:
             )
         else:
             _state["last_refresh_date"] = today
+            _state["last_probe_at"]     = time.monotonic()
             app.logger.info("CacheScheduler: scheduled refresh succeeded")
\ No newline at end of file
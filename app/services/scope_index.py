@@ -0,0 +1,132 @@
+"""
+app/services/scope_index.py — Heritage Samarth | Row-level security indexes
+============================================================================
+Inverted indexes from each scope column value to the row positions that
+carry it, built once per snapshot when it is published.
+
+An SO-scoped BM no longer costs a pass over every cached row: their rows
+are the union of a few precomputed position lists, so the work is
+proportional to the rows they own, not to the whole dataset.
+
+Keys are normalised exactly the way the old per-row filters did it:
+  SO column      → str(v).replace(".0", "").strip()   (1940.0 → "1940")
+  other columns  → str(v).strip()
+"""
+
+import numpy as np
+
+from app.services.columnar import DictColumn
+
+# Built eagerly when a snapshot is published; any other column a user is
+# scoped on gets indexed on first use.
+SCOPE_COLUMNS = ("SO", "SO_Name", "Region", "State", "SE_EmpID")
+
+
+def normalise_scope_value(column: str, value) -> str:
+    """Canonical string key for a scope value in the given column."""
+    if column == "SO":
+        return str(value).replace(".0", "").strip()
+    return str(value).strip()
+
+
+class ScopeIndex:
+    """Per-snapshot map of column → {normalised value → sorted row positions}."""
+
+    def __init__(self, snapshot):
+        self._snap    = snapshot
+        self._columns = {}
+        for name in SCOPE_COLUMNS:
+            if name in snapshot.column_map:
+                self._columns[name] = _build_column_index(snapshot, name)
+
+    def lookup(self, column: str) -> dict[str, np.ndarray]:
+        index = self._columns.get(column)
+        if index is None:
+            # Benign race: two threads may both build it, both results are equal.
+            index = self._columns[column] = _build_column_index(self._snap, column)
+        return index
+
+    def positions(self, column: str, values) -> np.ndarray:
+        """Sorted row positions whose column value matches any of values."""
+        index = self.lookup(column)
+        parts = [index[k] for k in {normalise_scope_value(column, v) for v in values} if k in index]
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+
+def get_scope_index(snapshot) -> ScopeIndex:
+    """The snapshot's ScopeIndex, built on first call and memoised on it."""
+    return snapshot.derived("scope_index", ScopeIndex)
+
+
+def scope_positions(snapshot, user: dict) -> np.ndarray | None:
+    """
+    Row positions the user may see, in snapshot (query ORDER BY) order.
+    Returns None when the user is unrestricted — callers use every row.
+
+    Mirrors the original /api/data rules:
+      scope_type "SO"             → rows whose SO is in scope_value (a list)
+      scope_type "ALL"/None/""    → everything
+      scope_type <column name>    → rows where that column == scope_value
+      unknown column              → everything (as before)
+    """
+    scope_type = user.get("scope_type")
+
+    if scope_type == "SO":
+        if "SO" not in snapshot.column_map:
+            return None
+        return get_scope_index(snapshot).positions("SO", user.get("scope_value") or [])
+
+    if scope_type not in ("ALL", None, ""):
+        if scope_type not in snapshot.column_map:
+            return None
+        return get_scope_index(snapshot).positions(scope_type, [user.get("scope_value")])
+
+    return None
+
+
+def scope_key(snapshot, user: dict) -> tuple:
+    """
+    Hashable, normalised description of the rows scope_positions() returns
+    for this user. Users with equal keys see exactly the same rows, so
+    anything derived from their rows can be shared between them.
+    """
+    scope_type = user.get("scope_type")
+
+    if scope_type == "SO" and "SO" in snapshot.column_map:
+        values = {normalise_scope_value("SO", v) for v in user.get("scope_value") or []}
+        return ("SO", tuple(sorted(values)))
+
+    if scope_type not in ("ALL", None, "") and scope_type in snapshot.column_map:
+        return (scope_type, normalise_scope_value(scope_type, user.get("scope_value")))
+
+    return ("ALL",)
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _build_column_index(snapshot, column: str) -> dict[str, np.ndarray]:
+    col = snapshot.column(column)
+
+    if isinstance(col, DictColumn):
+        codes, uniques = col.data, col.values
+    else:
+        _, first, codes = np.unique(col.data, return_index=True, return_inverse=True)
+        uniques = col.values_at(first)
+
+    # One stable argsort groups positions by value while keeping each
+    # group in original row order.
+    order  = np.argsort(codes, kind="stable").astype(np.int32)
+    bounds = np.cumsum(np.bincount(codes.ravel(), minlength=len(uniques)))
+
+    index, start = {}, 0
+    for value, end in zip(uniques, bounds.tolist()):
+        if end > start:
+            key = normalise_scope_value(column, value)
+            group = order[start:end]
+            index[key] = group if key not in index else np.sort(np.concatenate([index[key], group]))
+        start = end
+    return index
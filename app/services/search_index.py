@@ -0,0 +1,223 @@
+"""
+app/services/search_index.py — Heritage Samarth | Name search index
+====================================================================
+A trigram index over the columns people search by — customer, SE and SO
+names and IDs — built when a snapshot is published, so a substring search
+looks up a few posting lists instead of scanning every distinct name.
+
+  get_search_index(snapshot)          → SearchIndex, memoised on the snapshot
+  SearchIndex.fields[column]          → SearchField (codes, values, trigrams)
+  SearchField.matches(needle)         → ids of the values containing needle
+  SearchIndex.suggest(positions, q)   → typeahead entries for /api/search
+  column_labels(snapshot, column)     → per-row codes + the text the page shows
+
+Each field's trigrams are one sorted array of (trigram, value id) pairs
+in CSR form. A needle of three or more characters intersects the posting
+lists of its trigrams, smallest first, and confirms the survivors with a
+plain substring test. Shorter needles scan the values, which are few.
+
+Matching is case-insensitive on String(v) as the master table shows the
+cell. The same index answers the master table's and the churn table's
+search for these columns.
+"""
+
+from bisect import bisect_left
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services.columnar import NO_DATE, DateColumn, DictColumn
+
+SEARCH_COLUMNS = ("CustomerName", "CustomerID", "SE_Name", "SE_EmpID", "SO_Name")
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS     = 50
+
+_EPOCH    = date(1970, 1, 1)
+_CP_BITS  = 21                      # bits per code point in a packed trigram key
+
+
+class SearchField:
+    """Trigram index over one column's distinct values."""
+
+    def __init__(self, codes: np.ndarray, values: list[str]):
+        self.codes  = codes                         # row → value id
+        self.values = values                        # value id → text as shown
+        self.labels = [v.lower() for v in values]   # what matching compares
+        self.counts = np.bincount(codes, minlength=len(values))
+        self._keys, self._starts, self._postings = _trigram_postings(self.labels)
+
+        # A–Z order of the values: rank per id for ranking, and the sorted
+        # labels for finding every value that starts with a prefix.
+        order         = sorted(range(len(values)), key=self.labels.__getitem__)
+        self.alpha    = np.empty(len(values), dtype=np.int64)
+        self.alpha[order] = np.arange(len(values))
+        self._by_name = np.array(order, dtype=np.int64)
+        self._sorted  = [self.labels[i] for i in order]
+
+    def matches(self, needle: str) -> np.ndarray:
+        """Sorted ids of the values whose text contains needle (lower-case)."""
+        if not needle:
+            return np.arange(len(self.labels))
+        if len(needle) < 3:
+            hit = np.fromiter((needle in l for l in self.labels), dtype=bool, count=len(self.labels))
+            return np.flatnonzero(hit)
+
+        lists = []
+        for key in _keys_of(needle):
+            i = int(np.searchsorted(self._keys, key))
+            if i == len(self._keys) or self._keys[i] != key:
+                return np.empty(0, dtype=np.int64)
+            lists.append(self._postings[self._starts[i]:self._starts[i + 1]])
+        lists.sort(key=len)
+
+        candidates = lists[0]
+        for postings in lists[1:]:
+            candidates = np.intersect1d(candidates, postings, assume_unique=True)
+            if not len(candidates):
+                break
+        if len(lists) == 1:
+            return candidates                   # the needle is its only trigram
+        # Trigrams can all be present without being adjacent — confirm.
+        labels = self.labels
+        return np.array([i for i in candidates.tolist() if needle in labels[i]], dtype=np.int64)
+
+    def prefixed(self, needle: str) -> np.ndarray:
+        """Boolean per value id — does the value start with needle."""
+        lo   = bisect_left(self._sorted, needle)
+        hi   = bisect_left(self._sorted, needle + "\U0010ffff", lo)
+        mask = np.zeros(len(self.labels), dtype=bool)
+        mask[self._by_name[lo:hi]] = True
+        return mask
+
+    def label_mask(self, needle: str) -> np.ndarray:
+        """Boolean per value id — matches() as a mask."""
+        mask = np.zeros(len(self.labels), dtype=bool)
+        mask[self.matches(needle)] = True
+        return mask
+
+
+class SearchIndex:
+    """SearchFields for every SEARCH_COLUMNS column the snapshot has."""
+
+    def __init__(self, snapshot):
+        self.row_count = snapshot.row_count
+        self.fields    = {
+            column: SearchField(*column_labels(snapshot, column))
+            for column in SEARCH_COLUMNS if column in snapshot.column_map
+        }
+
+    def suggest(self, positions: np.ndarray | None, query: str, limit: int = DEFAULT_SUGGESTIONS) -> list[dict]:
+        """
+        Values containing query among the rows at positions (None = every
+        row), with how many of those rows carry each. Values that start
+        with the query come first, then the most rows, then A–Z.
+        """
+        needle  = query.strip().lower()
+        entries = {}
+        if not needle:
+            return []
+        for column, field in self.fields.items():
+            ids = field.matches(needle)
+            if not len(ids):
+                continue
+            if positions is None:
+                counts = field.counts[ids]
+            else:
+                counts = np.bincount(field.codes[positions], minlength=len(field.values))[ids]
+            ids, counts = ids[counts > 0], counts[counts > 0]
+
+            # Only each field's best `limit` can make the merged list.
+            top = np.lexsort((field.alpha[ids], -counts, ~field.prefixed(needle)[ids]))[:limit]
+            for i, n in zip(ids[top].tolist(), counts[top].tolist()):
+                value = field.values[i].strip()
+                if value:
+                    key = (column, value)       # values differing only by padding merge
+                    entries[key] = entries.get(key, 0) + n
+
+        ranked = sorted(
+            entries.items(),
+            key=lambda kv: (not kv[0][1].lower().startswith(needle), -kv[1], kv[0][1].lower()),
+        )
+        return [{"field": column, "value": value, "rows": n} for (column, value), n in ranked[:limit]]
+
+
+def get_search_index(snapshot) -> SearchIndex:
+    """The snapshot's SearchIndex, built on first call and memoised on it."""
+    return snapshot.derived("search_index", SearchIndex)
+
+
+def column_labels(snapshot, column: str) -> tuple[np.ndarray, list[str]]:
+    """
+    Per-row codes into the column's distinct values, each as the master
+    table shows the cell — String(v) of the JSON value, "" for a blank.
+    Memoised on the snapshot.
+    """
+    def build(snap):
+        col = snap.column(column)
+        if isinstance(col, DictColumn):
+            return col.data, [display_text(v) for v in col.values]
+        uniques, codes = np.unique(col.data, return_inverse=True)
+        if isinstance(col, DateColumn):
+            values = ["" if d == NO_DATE else (_EPOCH + timedelta(days=d)).isoformat() for d in uniques.tolist()]
+        else:
+            values = [display_text(v) for v in uniques.tolist()]
+        return codes.ravel(), values
+
+    return snapshot.derived(f"column_labels:{column}", build)
+
+
+def display_text(value) -> str:
+    """String(value) as the browser shows a JSON cell: 1940.0 → "1940", NaN → ""."""
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _trigram_postings(labels: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every (trigram, label id) pair of labels, de-duplicated and sorted, as
+    CSR: distinct trigram keys, the start of each key's run, and the label
+    ids of all runs back to back (ascending within a run).
+    """
+    empty = (np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+    if not labels:
+        return empty
+
+    # One pass over all labels at once: code points of "l0\0l1\0…", a label
+    # id per position, and a trigram key wherever three positions in a row
+    # belong to the same label.
+    text   = "\0".join(labels) + "\0"
+    points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    owner  = np.repeat(np.arange(len(labels)), [len(l) + 1 for l in labels])
+    sep    = points == 0
+    valid  = ~(sep[:-2] | sep[1:-1] | sep[2:])
+    if not valid.any():
+        return empty
+
+    keys  = ((points[:-2] << (2 * _CP_BITS)) | (points[1:-1] << _CP_BITS) | points[2:])[valid]
+    ids   = owner[:-2][valid]
+    order = np.argsort(keys, kind="stable")     # ids are already ascending
+    keys, ids = keys[order], ids[order]
+
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+    keys, ids = keys[first], ids[first]
+
+    distinct, starts = np.unique(keys, return_index=True)
+    return distinct, np.append(starts, len(keys)), ids
+
+
+def _keys_of(needle: str) -> list[int]:
+    """Packed trigram keys of needle, each once."""
+    points = [ord(c) for c in needle]
+    return sorted({
+        (points[i] << (2 * _CP_BITS)) | (points[i + 1] << _CP_BITS) | points[i + 2]
+        for i in range(len(points) - 2)
+    })
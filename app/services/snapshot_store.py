@@ -0,0 +1,277 @@
+"""
+app/services/snapshot_store.py — Heritage Samarth | Shared snapshot file
+=========================================================================
+One worker fetches from MSSQL and writes the result here as a binary,
+column-oriented file. Every gunicorn worker memory-maps that file
+read-only, so the OS page cache holds ONE copy of the dataset no matter
+how many workers are running.
+
+Layout of CACHE_DIR:
+  CURRENT                     — pointer file: "<generation> <filename>"
+  snapshot-000000000042.bin   — snapshot files, one per generation
+
+A worker notices a new snapshot when the generation in CURRENT changes
+(checked with a cheap os.stat on every request).
+
+The files outlive the process: after a deploy or worker recycle,
+create_app() maps the newest valid snapshot straight back in (see
+cache_service.warm_start_from_disk) instead of waiting for MSSQL.
+
+File format (little-endian):
+  8 bytes   magic  b"SMRTSNP4"  (the last byte is the format version)
+  4 bytes   header length (uint32)
+  4 bytes   header CRC-32 (uint32)
+  N bytes   header JSON  — format, generation, timestamp, row_count,
+                           checksum, watermark, data_end, columns[]
+  padding   to an 8-byte boundary
+  blocks    one raw NumPy array per column, 8-byte aligned — the column
+            arrays of a ColumnarSnapshot (see columnar.py), mapped back
+            with np.frombuffer so no worker copies them.
+
+The header CRC covers the header JSON — column metadata, dictionary values
+and the block checksum with it. "checksum" is the CRC-32 of every column
+block in order; "data_end" is the expected file size. A truncated,
+partially written or bit-flipped file fails open_snapshot() with a
+ValueError and is never served.
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from app.services.columnar import (
+    ColumnarSnapshot,
+    DateColumn,
+    DictColumn,
+    FloatColumn,
+    IntColumn,
+)
+
+FORMAT_VERSION = 4
+MAGIC          = b"SMRTSNP" + str(FORMAT_VERSION).encode()
+POINTER_FILE   = "CURRENT"
+KEEP_SNAPSHOTS = 2          # current + previous (a reader may still map it)
+
+_PREFIX_LEN  = len(MAGIC) + 8        # magic, header length, header CRC
+_HEADER_KEYS = ("generation", "timestamp", "row_count", "checksum", "data_end", "columns")
+_COLUMN_KEYS = ("name", "kind", "dtype", "nbytes", "offset")
+
+_COLUMN_TYPES = {
+    "float": FloatColumn,
+    "int":   IntColumn,
+    "date":  DateColumn,
+}
+
+
+# ══════════════════════════════════════════════════════════════
+# WRITE
+# ══════════════════════════════════════════════════════════════
+
+def write_snapshot(cache_dir: str, snapshot: ColumnarSnapshot) -> int:
+    """
+    Writes a snapshot to a new generation file and points CURRENT at it.
+    Caller must hold the refresh lock so generations don't race.
+
+    Returns the new generation number.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    generation = (read_pointer(cache_dir) or (0, None))[0] + 1
+    filename   = f"snapshot-{generation:012d}.bin"
+
+    col_meta, blocks, checksum = [], [], 0
+    for name, col in zip(snapshot.columns, snapshot.cols):
+        data = np.ascontiguousarray(col.data)
+        meta = {"name": name, "kind": col.kind, "dtype": data.dtype.str, "nbytes": data.nbytes}
+        if col.kind == "dict":
+            meta["values"] = col.values
+        col_meta.append(meta)
+        blocks.append(data)
+        checksum = zlib.crc32(memoryview(data).cast("B"), checksum)
+
+    header = {
+        "format":     FORMAT_VERSION,
+        "generation": generation,
+        "timestamp":  snapshot.timestamp,
+        "row_count":  snapshot.row_count,
+        "checksum":   checksum,
+        "watermark":  snapshot.watermark,
+        "columns":    col_meta,
+    }
+    header_bytes = _layout(header, blocks)
+
+    tmp_path = os.path.join(cache_dir, filename + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", len(header_bytes), zlib.crc32(header_bytes)))
+        f.write(header_bytes)
+        for meta, data in zip(col_meta, blocks):
+            f.write(b"\0" * (meta["offset"] - f.tell()))
+            f.write(data.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(cache_dir, filename))
+
+    _write_pointer(cache_dir, generation, filename)
+    _prune_old_snapshots(cache_dir, keep_from=generation - KEEP_SNAPSHOTS + 1)
+    return generation
+
+
+# ══════════════════════════════════════════════════════════════
+# READ
+# ══════════════════════════════════════════════════════════════
+
+def read_pointer(cache_dir: str) -> tuple[int, str] | None:
+    """Returns (generation, filename) from CURRENT, or None if no snapshot yet."""
+    try:
+        with open(os.path.join(cache_dir, POINTER_FILE), encoding="utf-8") as f:
+            generation, filename = f.read().split()
+        return int(generation), filename
+    except (OSError, ValueError):
+        return None
+
+
+def pointer_stamp(cache_dir: str) -> tuple[int, int] | None:
+    """
+    Cheap change probe — (inode, mtime_ns) of CURRENT, or None if missing.
+    CURRENT is always replaced, never rewritten, so the inode changes on
+    every publish even on filesystems with coarse mtimes.
+    """
+    try:
+        st = os.stat(os.path.join(cache_dir, POINTER_FILE))
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def list_snapshots(cache_dir: str) -> list[tuple[int, str]]:
+    """All (generation, filename) snapshot files in cache_dir, newest first."""
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return []
+
+    found = []
+    for name in names:
+        if not (name.startswith("snapshot-") and name.endswith(".bin")):
+            continue
+        try:
+            found.append((int(name[len("snapshot-"):-len(".bin")]), name))
+        except ValueError:
+            continue
+    return sorted(found, reverse=True)
+
+
+def open_snapshot(cache_dir: str, filename: str) -> ColumnarSnapshot:
+    """
+    Memory-maps a snapshot file read-only, verifies it, and returns it as a
+    ColumnarSnapshot whose column arrays point straight into the mapping.
+
+    Raises ValueError if the file is not a complete, intact snapshot of the
+    current format; OSError if it cannot be read at all.
+    """
+    with open(os.path.join(cache_dir, filename), "rb") as f:
+        if os.fstat(f.fileno()).st_size < _PREFIX_LEN:
+            raise ValueError("Snapshot file is truncated")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a Samarth snapshot file (or an older format)")
+    header_len, header_crc = struct.unpack_from("<II", mm, len(MAGIC))
+    raw = bytes(mm[_PREFIX_LEN:_PREFIX_LEN + header_len])
+    if len(raw) < header_len:
+        raise ValueError("Snapshot header is truncated")
+    if zlib.crc32(raw) != header_crc:
+        raise ValueError("Snapshot header checksum mismatch — file is corrupt")
+    try:
+        header = json.loads(raw)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Snapshot header is unreadable")
+
+    if not isinstance(header, dict):
+        raise ValueError("Snapshot header is unreadable")
+    if header.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Snapshot format {header.get('format')} is not {FORMAT_VERSION}")
+    missing = [k for k in _HEADER_KEYS if k not in header]
+    if missing:
+        raise ValueError(f"Snapshot header is missing {', '.join(missing)}")
+    if len(mm) < header["data_end"]:
+        raise ValueError(f"Snapshot file is truncated ({len(mm)} of {header['data_end']} bytes)")
+
+    cols, checksum = [], 0
+    for meta in header["columns"]:
+        if any(k not in meta for k in _COLUMN_KEYS) or meta["kind"] not in (*_COLUMN_TYPES, "dict"):
+            raise ValueError(f"Snapshot column entry is malformed: {meta.get('name')!r}")
+        dtype = np.dtype(meta["dtype"])
+        data  = np.frombuffer(
+            mm, dtype=dtype, count=meta["nbytes"] // dtype.itemsize, offset=meta["offset"]
+        )
+        checksum = zlib.crc32(memoryview(data).cast("B"), checksum)
+        if meta["kind"] == "dict":
+            cols.append(DictColumn(data, meta.get("values", [])))
+        else:
+            cols.append(_COLUMN_TYPES[meta["kind"]](data))
+
+    if checksum != header["checksum"]:
+        raise ValueError("Snapshot checksum mismatch — file is corrupt")
+
+    # The arrays hold a reference to mm through their buffer, so the mapping
+    # lives exactly as long as something still uses this snapshot.
+    return ColumnarSnapshot(
+        columns    = [c["name"] for c in header["columns"]],
+        cols       = cols,
+        row_count  = header["row_count"],
+        timestamp  = header["timestamp"],
+        generation = header["generation"],
+        watermark  = header.get("watermark"),
+    )
+
+
+# ══════════════════════════════════════════════════════════════
+# PRIVATE HELPERS
+# ══════════════════════════════════════════════════════════════
+
+def _layout(header: dict, blocks: list) -> bytes:
+    """
+    Assigns each column block its 8-byte-aligned offset and returns the
+    encoded header. Offsets depend on the header length and vice versa, so
+    iterate until the header fits; trailing spaces are valid JSON padding.
+    """
+    header_len = 0
+    while True:
+        offset = _align(_PREFIX_LEN + header_len)
+        end = offset
+        for meta, data in zip(header["columns"], blocks):
+            meta["offset"] = offset
+            end    = offset + data.nbytes
+            offset = _align(end)
+        header["data_end"] = end
+        raw = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        if len(raw) <= header_len:
+            return raw.ljust(header_len)
+        header_len = len(raw)
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _write_pointer(cache_dir: str, generation: int, filename: str) -> None:
+    tmp_path = os.path.join(cache_dir, POINTER_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f"{generation} {filename}")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(cache_dir, POINTER_FILE))
+
+
+def _prune_old_snapshots(cache_dir: str, keep_from: int) -> None:
+    for generation, name in list_snapshots(cache_dir):
+        if generation < keep_from:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass   # Windows: still mapped by a worker — next prune gets it
@@ -0,0 +1,176 @@
+"""
+app/services/summary.py — Heritage Samarth | KPI and overview aggregates
+=========================================================================
+The numbers behind the dashboard's KPI cards and overview charts, computed
+on the server with grouped reductions over the snapshot instead of a loop
+over every row in the browser.
+
+  parse_filters(args)                → ((column, value), …) from slicer params
+  filtered_positions(snap, user, f)  → row positions in scope and filter
+  compute_summary(snap, positions)   → {"stats": …, "groups": …, "row_count": …}
+  empty_summary()                    → the same shape with nothing in it
+
+Text is compared exactly as updateDashboardComponents() and the global
+slicers compare it in dashboard.html:
+  slicer values   String(v || '').trim()
+  group labels    String(v || 'Unknown').trim()
+so the cards and charts read the same as when the page aggregated itself.
+"""
+
+import numpy as np
+
+from app.services.columnar import DictColumn
+from app.services.scope_index import scope_positions
+
+# The global slicers on the dashboard — the only columns a filter may name.
+SLICER_COLUMNS = ("State", "Region", "SO_Name", "CustomerGroup", "Product", "Sales_Trend")
+
+# Overview chart groupings: column → label used when the column is missing.
+GROUP_COLUMNS = {"Region": "All", "SO_Name": "All SOs", "Product": "All"}
+
+# Sales_Trend buckets, as the page counts them; any other trend is stable.
+GROWTH, DECLINE, NEW, STABLE = 0, 1, 2, 3
+_TREND_BUCKETS = {"Growth": GROWTH, "Decline": DECLINE, "New Customer": NEW, "New": NEW}
+
+
+def parse_filters(args) -> tuple:
+    """
+    Slicer filters from request args as a tuple of (column, value) in
+    SLICER_COLUMNS order — hashable, so it can be part of a response cache
+    key. Unknown parameters
+    and empty values are ignored, as an "All …" slicer is.
+    """
+    filters = []
+    for column in SLICER_COLUMNS:
+        value = (args.get(column) or "").strip()
+        if value:
+            filters.append((column, value))
+    return tuple(filters)
+
+
+def text_codes(snapshot, column: str, blank: str = "") -> tuple[np.ndarray, list[str]]:
+    """
+    Per-row codes into a list of distinct labels, where each label is the
+    value as the page shows it: str(v).strip(), or blank for an empty value.
+    Memoised on the snapshot per (column, blank).
+    """
+    def build(snap):
+        col = snap.column(column)
+        if isinstance(col, DictColumn):
+            codes, uniques = col.data, col.values
+        else:
+            _, first, codes = np.unique(col.data, return_index=True, return_inverse=True)
+            uniques = col.values_at(first)
+
+        # Values that only differ by whitespace share one label.
+        labels, lut, seen = [], np.empty(len(uniques), dtype=np.int32), {}
+        for i, value in enumerate(uniques):
+            label = blank if _is_blank(value) else str(value).strip()
+            if label not in seen:
+                seen[label] = len(labels)
+                labels.append(label)
+            lut[i] = seen[label]
+        return lut[codes.ravel()], labels
+
+    return snapshot.derived(f"text_codes:{column}:{blank}", build)
+
+
+def filtered_positions(snapshot, user: dict, filters: tuple) -> np.ndarray:
+    """Row positions the user may see that match every (column, value) filter."""
+    positions = scope_positions(snapshot, user)
+    if positions is None:
+        positions = np.arange(snapshot.row_count, dtype=np.int32)
+
+    for column, value in filters:
+        if column not in snapshot.column_map:
+            continue                        # the page shows no slicer for it
+        codes, labels = text_codes(snapshot, column)
+        try:
+            code = labels.index(value)
+        except ValueError:
+            return np.empty(0, dtype=np.int32)
+        positions = positions[codes[positions] == code]
+    return positions
+
+
+def compute_summary(snapshot, positions: np.ndarray) -> dict:
+    """
+    KPI totals and per-group MTD / LYMTD for the rows at positions — the
+    same figures updateDashboardComponents() used to add up row by row.
+    Groups are listed in order of first appearance, as the charts draw them.
+    """
+    sales  = metric_values(snapshot, "MTD", positions)
+    lymtd  = metric_values(snapshot, "LYMTD", positions)
+    drop   = metric_values(snapshot, "MTD_vs_LYMTD_Abs_LPD_Diff", positions)
+    bucket = trend_buckets(snapshot, positions)
+    counts = np.bincount(bucket, minlength=4)
+
+    stats = {
+        "growth":     int(counts[0]),
+        "decline":    int(counts[1]),
+        "new":        int(counts[2]),
+        "stable":     int(counts[STABLE]),
+        "sales":      float(sales.sum()),
+        "lymtd":      float(lymtd.sum()),
+        "growthVol":  float(drop[bucket == GROWTH].sum()),
+        "declineVol": float(np.abs(drop[bucket == DECLINE]).sum()),
+        "newVol":     float(sales[bucket == NEW].sum()),
+        "totalLM":    float(metric_values(snapshot, "LM", positions).sum()),
+        "totalLYSM":  float(metric_values(snapshot, "LYSM", positions).sum()),
+    }
+
+    groups = {}
+    for column, missing in GROUP_COLUMNS.items():
+        if column not in snapshot.column_map:
+            groups[column] = {"mtd":   {missing: stats["sales"]} if len(positions) else {},
+                              "lymtd": {missing: stats["lymtd"]} if len(positions) else {}}
+            continue
+        codes, labels = text_codes(snapshot, column, blank="Unknown")
+        row_codes = codes[positions]
+        mtd_sum   = np.bincount(row_codes, weights=sales, minlength=len(labels))
+        lymtd_sum = np.bincount(row_codes, weights=lymtd, minlength=len(labels))
+        present, first = np.unique(row_codes, return_index=True)
+        order = present[np.argsort(first)].tolist()
+        groups[column] = {
+            "mtd":   {labels[c]: float(mtd_sum[c]) for c in order},
+            "lymtd": {labels[c]: float(lymtd_sum[c]) for c in order},
+        }
+
+    return {"stats": stats, "groups": groups, "row_count": int(len(positions))}
+
+
+def trend_buckets(snapshot, positions: np.ndarray) -> np.ndarray:
+    """GROWTH / DECLINE / NEW / STABLE for each row at positions."""
+    if "Sales_Trend" not in snapshot.column_map:
+        return np.full(len(positions), STABLE, dtype=np.int8)
+    codes, labels = text_codes(snapshot, "Sales_Trend")
+    lut = np.array([_TREND_BUCKETS.get(l, STABLE) for l in labels], dtype=np.int8)
+    return lut[codes[positions]]
+
+
+def metric_values(snapshot, column: str, positions: np.ndarray) -> np.ndarray:
+    """Float values at positions with blanks as 0 (parseFloat(v) || 0)."""
+    if column not in snapshot.column_map:
+        return np.zeros(len(positions))
+    values = snapshot.array(column)[positions].astype(np.float64, copy=False)
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def empty_summary() -> dict:
+    """compute_summary() of no rows — served before the first snapshot loads."""
+    stats = dict.fromkeys(("growth", "decline", "new", "stable"), 0)
+    stats.update(dict.fromkeys(
+        ("sales", "lymtd", "growthVol", "declineVol", "newVol", "totalLM", "totalLYSM"), 0.0
+    ))
+    groups = {column: {"mtd": {}, "lymtd": {}} for column in GROUP_COLUMNS}
+    return {"stats": stats, "groups": groups, "row_count": 0}
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _is_blank(value) -> bool:
+    """JS falsiness for a cell: None, "", 0 and NaN all read as empty."""
+    if value is None or value == "" or value == 0:
+        return True
+    return isinstance(value, float) and value != value
+
@@ -0,0 +1,173 @@
+"""
+app/services/synthetic_warehouse.py — Heritage Samarth | Synthetic BI data
+===========================================================================
+Generates a stand-in for the performance query's output — same 28 columns,
+same types, same derived-column arithmetic, WHERE and ORDER BY — at
+realistic cardinalities, and writes it to a SQLite file the "sqlite" data
+source (data_source.py) serves from.
+
+  Sales offices   SYNTHETIC_SALES_OFFICES, spread over five states
+  SEs             SYNTHETIC_SES_PER_SO per office
+  Customers       SYNTHETIC_CUSTOMERS × SYNTHETIC_SCALE, each on one office
+                  and SE (a few mapped to two SEs → duplicated rows, as
+                  the SE_Mapping LEFT JOIN does), buying 1–3 products
+  Windows         a per-key daily rate with per-window noise; some keys
+                  new (no last-year sales), churned (nothing this month) or
+                  dormant (last year only), so every Sales_Trend occurs
+
+SYNTHETIC_SCALE is the knob for sizing hardware: 10 gives ten times
+today's customer base on the same offices and SEs.
+
+  build_local_warehouse(path, …)   → rows written
+"""
+
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services.window_queries import OUTPUT_COLUMNS, derive_metrics
+
+TABLE = "performance_analysis"
+
+_STATES   = ["Telangana", "Andhra Pradesh", "Karnataka", "Tamil Nadu", "Maharashtra"]
+_GROUPS   = ["Retail", "Dealers", "Parlours", "Institutions", "Modern Trade"]
+_PRODUCTS = ["Milk", "Curd", "ButterMilk"]
+_BUYS     = [0.95, 0.7, 0.45]          # share of customers buying each product
+_WINDOWS  = ["LYSM", "LYMTD", "LQ", "LM", "LMTD", "MTD", "LW", "CW"]
+
+
+def generate_columns(
+    customers: int,
+    offices: int,
+    ses_per_so: int,
+    seed: int = 7,
+    as_of: date = None,
+) -> dict[str, list]:
+    """
+    The synthetic result as {column: values}, rows already filtered and
+    ordered the way performance_analysis.sql returns them.
+    """
+    rng   = np.random.default_rng(seed)
+    as_of = as_of or date.today()
+
+    # ── Customers → office, SE, group ────────────────────────
+    cust_office = rng.integers(0, offices, customers)
+    cust_se     = rng.integers(0, ses_per_so, customers)
+    cust_group  = rng.integers(0, len(_GROUPS), customers)
+    cust_nogrp  = rng.random(customers) < 0.02      # no CustomerGroup on record
+
+    # ── Keys: customer × product ─────────────────────────────
+    buys     = rng.random((customers, len(_PRODUCTS))) < np.array(_BUYS)
+    key_cust, key_prod = np.nonzero(buys)
+    n_keys   = len(key_cust)
+
+    rate    = rng.lognormal(mean=2.2, sigma=0.9, size=n_keys)
+    windows = {w: rate * rng.gamma(8.0, 1 / 8.0, n_keys) for w in _WINDOWS}
+
+    status  = rng.random(n_keys)
+    new     = status < 0.06                         # nothing last year
+    churned = (status >= 0.06) & (status < 0.14)    # nothing this month
+    dormant = (status >= 0.14) & (status < 0.18)    # last year only
+    for w in ("LYSM", "LYMTD"):
+        windows[w][new] = 0.0
+    for w in ("MTD", "CW"):
+        windows[w][churned] = 0.0
+    for w in ("LQ", "LM", "LMTD", "MTD", "LW", "CW"):
+        windows[w][dormant] = 0.0
+    for w in _WINDOWS:
+        # Sparse buyers: some windows simply have no sales (NULL → 0).
+        windows[w][rng.random(n_keys) < 0.05] = 0.0
+
+    metrics = derive_metrics(windows)
+    keep    = np.flatnonzero(
+        (metrics["LM"] > 0.0001) | (metrics["MTD"] > 0.0001)
+        | (metrics["LYMTD"] > 0.0001) | (metrics["LYSM"] > 0.0001)
+    )
+    keys = keep[np.argsort(metrics["MTD_vs_LYMTD_Abs_LPD_Diff"][keep], kind="stable")]
+
+    # Days since last order: recent for active keys, weeks back for churned.
+    since = np.where(
+        metrics["MTD"] > 0,
+        rng.integers(1, 4, n_keys),
+        rng.integers(as_of.day, as_of.day + 120, n_keys),
+    )
+
+    # ── Rows (a customer on two SEs yields two rows per key) ─
+    second_se = rng.random(customers) < 0.03
+    cols      = {name: [] for name in OUTPUT_COLUMNS}
+    for k in keys.tolist():
+        c      = int(key_cust[k])
+        office = int(cust_office[c])
+        ses    = [int(cust_se[c])] + ([(int(cust_se[c]) + 1) % ses_per_so] if second_se[c] else [])
+        for se in ses:
+            emp = 50000 + office * ses_per_so + se
+            dims = (
+                _STATES[office % len(_STATES)],
+                f"Region {office // 10 + 1}",
+                f"Plant {office + 1}",
+                f"SO {office + 1}",
+                float(1900 + office),
+                str(1000000 + c),
+                f"Customer {c + 1}",
+                None if cust_nogrp[c] else _GROUPS[cust_group[c]],
+                str(emp),
+                f"SE {emp}",
+                f"9{emp:09d}",
+                _PRODUCTS[key_prod[k]],
+            )
+            for name, value in zip(OUTPUT_COLUMNS[:12], dims):
+                cols[name].append(value)
+            for name in OUTPUT_COLUMNS[12:-1]:
+                value = metrics[name][k]
+                cols[name].append(value if isinstance(value, str) or not np.isnan(value) else None)
+            cols["Last_Order_Date"].append((as_of - timedelta(days=int(since[k]))).isoformat())
+    return cols
+
+
+def build_local_warehouse(
+    path: str,
+    customers: int,
+    offices: int,
+    ses_per_so: int,
+    seed: int = 7,
+) -> int:
+    """
+    (Re)writes the SQLite file at path with a fresh synthetic result and a
+    one-row meta table, atomically. Returns the number of rows written.
+    """
+    cols  = generate_columns(customers, offices, ses_per_so, seed)
+    rows  = list(zip(*(cols[name] for name in OUTPUT_COLUMNS)))
+    types = {"SO": "REAL", "Sales_Trend": "TEXT", "Last_Order_Date": "TEXT"}
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    conn = sqlite3.connect(tmp)
+    try:
+        col_defs = ", ".join(
+            f'"{name}" {types.get(name, "REAL" if i >= 12 else "TEXT")}'
+            for i, name in enumerate(OUTPUT_COLUMNS)
+        )
+        conn.execute(f"CREATE TABLE {TABLE} ({col_defs})")
+        conn.executemany(
+            f"INSERT INTO {TABLE} VALUES ({', '.join('?' * len(OUTPUT_COLUMNS))})", rows
+        )
+        conn.execute(
+            "CREATE TABLE meta (GeneratedAt TEXT, Seed INTEGER, Customers INTEGER, "
+            "Offices INTEGER, SEsPerSO INTEGER, Rows INTEGER)"
+        )
+        conn.execute(
+            "INSERT INTO meta VALUES (?, ?, ?, ?, ?, ?)",
+            (time.strftime("%Y-%m-%d %H:%M:%S"), seed, customers, offices, ses_per_so, len(rows)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp, path)
+    return len(rows)
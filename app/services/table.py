@@ -0,0 +1,177 @@
+"""
+app/services/table.py — Heritage Samarth | Master table, server-side
+=====================================================================
+The Master Data table in DataTables' server-side processing mode: the page
+sends draw / start / length / order / search and receives only the rows it
+is about to draw, instead of handing every row to DataTables to sort,
+search and page in the browser.
+
+  parse_order(args, n)                      → ((column index, descending), …)
+  table_page(snap, positions, order, q, …)  → {"recordsTotal", "recordsFiltered", "data"}
+  matching_rows(snap, positions, order, q)  → every matching position, in table order
+
+Sorting is a slice of a precomputed permutation: every column's row order
+(ascending and descending, ties in snapshot order) is an argsort built
+once per snapshot on first use, and a page filters it by the user's rows.
+Values sort as DataTables sorted them — numbers numerically with blanks
+first, dates by day, text case-insensitively.
+
+Search follows DataTables' smart search: the words of the query (or
+"quoted phrases") must all appear, in any case, somewhere in the row. It
+looks at the text, code and date columns — names, SOs, products, trend —
+not at the LPD figures, whose text only exists as the page renders it.
+Customer, SE and SO names and IDs are looked up in the snapshot's
+search index (search_index.py).
+"""
+
+import re
+
+import numpy as np
+
+from app.services.columnar import METRIC_COLUMNS, DictColumn, FloatColumn
+from app.services.search_index import column_labels, display_text, get_search_index
+
+DEFAULT_PAGE_SIZE = 15
+MAX_PAGE_SIZE     = 1000          # length=-1 ("All") is still honoured
+
+_WORDS = re.compile(r'"[^"]+"|[^ ]+')
+
+
+def parse_order(args, n_columns: int) -> tuple:
+    """
+    DataTables' order[i][column] / order[i][dir] parameters as a tuple of
+    (column index, descending). Out-of-range columns are skipped.
+    """
+    order, i = [], 0
+    while f"order[{i}][column]" in args:
+        column = args.get(f"order[{i}][column]", type=int)
+        if column is not None and 0 <= column < n_columns:
+            order.append((column, args.get(f"order[{i}][dir]") == "desc"))
+        i += 1
+    return tuple(order)
+
+
+def table_page(snapshot, positions: np.ndarray, order: tuple, search: str, start: int, length: int) -> dict:
+    """
+    One draw of the table over the rows at positions (the user's rows after
+    the slicer filters). length -1 returns every matching row.
+    """
+    rows = matching_rows(snapshot, positions, order, search)
+    page = rows[start:] if length < 0 else rows[start:start + length]
+    return {
+        "recordsTotal":    len(positions),
+        "recordsFiltered": len(rows),
+        "data":            snapshot.rows_at(page),
+    }
+
+
+def matching_rows(snapshot, positions: np.ndarray, order: tuple, search: str) -> np.ndarray:
+    """The positions the search matches, in the table's order — what every page slices."""
+    rows = _ordered(snapshot, positions, order)
+    for word in _search_words(search):
+        rows = rows[_row_matches(snapshot, rows, word)]
+    return rows
+
+
+def sort_order(snapshot, column: int, descending: bool) -> np.ndarray:
+    """Every row position ordered by one column, ties in snapshot order — memoised."""
+    def build(snap):
+        rank = column_rank(snap, column)
+        return np.argsort(-rank if descending else rank, kind="stable").astype(np.int32)
+
+    return snapshot.derived(f"table_order:{column}:{int(descending)}", build)
+
+
+def column_rank(snapshot, column: int) -> np.ndarray:
+    """Dense rank of every row's value in the column's sort order — memoised."""
+    def build(snap):
+        col = snap.cols[column]
+        if isinstance(col, DictColumn):
+            _, lut = np.unique(np.array(_dict_sort_keys(col.values)), return_inverse=True)
+            return lut.astype(np.int64)[col.data]
+        data = col.data
+        if isinstance(col, FloatColumn):
+            data = np.where(np.isnan(data), -np.inf, data)
+        _, rank = np.unique(data, return_inverse=True)
+        return rank.astype(np.int64).ravel()
+
+    return snapshot.derived(f"table_rank:{column}", build)
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _ordered(snapshot, positions: np.ndarray, order: tuple) -> np.ndarray:
+    """positions sorted by the order columns, ties in snapshot order."""
+    if not order:
+        return positions
+    if len(order) == 1:
+        column, descending = order[0]
+        permutation = sort_order(snapshot, column, descending)
+        if len(positions) == snapshot.row_count:
+            return permutation
+        mask = np.zeros(snapshot.row_count, dtype=bool)
+        mask[positions] = True
+        return permutation[mask[permutation]]
+
+    # Shift-click sorts on several columns: one lexsort of the ranks,
+    # primary key last.
+    keys = [positions]
+    for column, descending in reversed(order):
+        rank = column_rank(snapshot, column)[positions]
+        keys.append(-rank if descending else rank)
+    return positions[np.lexsort(keys)]
+
+
+def _dict_sort_keys(values: list) -> list:
+    """
+    Sort key per dictionary value: all-numeric columns compare as numbers
+    (blank lowest), anything else as lower-cased text.
+    """
+    numeric = all(
+        v == "" or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values
+    )
+    if numeric:
+        return [float("-inf") if v == "" else float(v) for v in values]
+    return [display_text(v).lower() for v in values]
+
+
+def _search_words(search: str) -> list[str]:
+    """DataTables smart-search terms, lower-cased: words and "quoted phrases"."""
+    words = []
+    for word in _WORDS.findall(search or ""):
+        if word.startswith('"') and word.endswith('"') and len(word) > 1:
+            word = word[1:-1]
+        word = word.replace('"', "", 1)
+        if word:
+            words.append(word.lower())
+    return words
+
+
+def _row_matches(snapshot, rows: np.ndarray, word: str) -> np.ndarray:
+    """Which of rows contain word in any searchable column."""
+    indexed = get_search_index(snapshot).fields
+    hits    = np.zeros(len(rows), dtype=bool)
+    for column in _search_columns(snapshot):
+        if column in indexed:
+            field = indexed[column]
+            codes, label_hit = field.codes, field.label_mask(word)
+        else:
+            codes, labels = _lower_labels(snapshot, column)
+            label_hit = np.fromiter((word in l for l in labels), dtype=bool, count=len(labels))
+        if label_hit.any():
+            hits |= label_hit[codes[rows]]
+    return hits
+
+
+def _search_columns(snapshot) -> list[str]:
+    """Columns the table search looks at: all but the LPD figures."""
+    return [name for name in snapshot.columns if name not in METRIC_COLUMNS]
+
+
+def _lower_labels(snapshot, column: str) -> tuple[np.ndarray, list[str]]:
+    """column_labels() with the text lower-cased — memoised."""
+    def build(snap):
+        codes, values = column_labels(snap, column)
+        return codes, [v.lower() for v in values]
+
+    return snapshot.derived(f"table_search_labels:{column}", build)
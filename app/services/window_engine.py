@@ -0,0 +1,135 @@
+"""
+app/services/window_engine.py — Heritage Samarth | Vectorised window engine
+============================================================================
+Every metric in sql/performance_analysis.sql is a windowed average of daily
+SalesQuantity per (CustomerID, SalesOfficeID, ProductHeirachy1). This module
+computes all of them in NumPy from one compact feed — quantity summed per
+key per BillingDate — instead of one GROUP BY per window on the BI server.
+
+  DailyAggregates   the feed as three parallel arrays sorted by day:
+                    key code, day number, quantity
+  compute_windows() LYSM, LYMTD, LQ, LM, LMTD, MTD, LW, CW for an as-of date
+                    — one slice (binary search on the sorted days) and one
+                    weighted bincount per window
+  compute_metrics() the windows plus the diffs, growth percentages and
+                    Sales_Trend (window_queries.derive_metrics)
+  engine_parts()    the window / key / last-order parts in the shape
+                    window_queries.assemble_snapshot() takes
+
+Window bounds and divisors come from window_queries.window_bounds(), so the
+engine and the SQL parts share one definition of every window; adding a
+window there makes it available here with no new SQL.
+
+The feed has to start at or before feed_start(as_of). Keys that only sold
+before that can never pass the query's WHERE (LM, MTD, LYMTD or LYSM > 0)
+and are left out; for every key that can, the feed holds its latest
+BillingDate, so Last_Order_Date comes from the feed as well.
+"""
+
+from datetime import date
+
+import numpy as np
+
+from app.services.columnar import NO_DATE
+from app.services.window_queries import WINDOW_COLUMNS, derive_metrics, window_bounds
+
+
+class DailyAggregates:
+    """
+    Daily quantity per key, sorted by day.
+
+      keys   [(CustomerID, SalesOfficeID, Product), …] — code → key
+      codes  int32   key code of each row
+      days   int32   BillingDate as days since 1970-01-01, ascending
+      qty    float64 SUM(SalesQuantity) for that key and day
+    """
+
+    def __init__(self, keys: list, codes: np.ndarray, days: np.ndarray, qty: np.ndarray):
+        order      = np.argsort(days, kind="stable")
+        self.keys  = keys
+        self.codes = codes[order]
+        self.days  = days[order]
+        self.qty   = qty[order]
+
+    @classmethod
+    def from_rows(cls, rows: list) -> "DailyAggregates":
+        """
+        From cleaned feed rows [CustomerID, SalesOfficeID, Product,
+        BillingDate (ISO text or date), Quantity ("" for NULL)].
+        """
+        key_codes, codes = {}, []
+        for r in rows:
+            codes.append(key_codes.setdefault((r[0], r[1], r[2]), len(key_codes)))
+        days = np.array([str(r[3])[:10] for r in rows], dtype="datetime64[D]")
+        qty  = np.array([r[4] if r[4] != "" else 0.0 for r in rows], dtype=np.float64)
+        return cls(
+            list(key_codes),
+            np.array(codes, dtype=np.int32),
+            days.astype(np.int32),
+            qty,
+        )
+
+    @property
+    def key_count(self) -> int:
+        return len(self.keys)
+
+    def window_sum(self, start: date, end: date) -> np.ndarray:
+        """SUM(qty) per key over start <= day < end (0 where nothing sold)."""
+        lo, hi = np.searchsorted(self.days, [_day(start), _day(end)])
+        return np.bincount(
+            self.codes[lo:hi], weights=self.qty[lo:hi], minlength=self.key_count
+        )
+
+    def last_order_days(self) -> np.ndarray:
+        """MAX(BillingDate) per key as day numbers."""
+        out = np.full(self.key_count, NO_DATE, dtype=np.int32)
+        np.maximum.at(out, self.codes, self.days)
+        return out
+
+
+def feed_start(as_of: date) -> date:
+    """Earliest BillingDate any window needs for this as-of date."""
+    return min(window_bounds(name, as_of)[0] for name in WINDOW_COLUMNS)
+
+
+def compute_windows(feed: DailyAggregates, as_of: date) -> dict[str, np.ndarray]:
+    """
+    Output column (LYSM, …, CW) → average daily quantity per key code, as
+    ISNULL(…, 0) sees it. A window whose divisor is NULL, or whose range
+    is empty (TW on a Sunday, where the divisor is -1), is all zeros.
+    """
+    out = {}
+    for name, column in WINDOW_COLUMNS.items():
+        start, end, divisor = window_bounds(name, as_of)
+        if divisor is None or start >= end:
+            out[column] = np.zeros(feed.key_count)
+        else:
+            out[column] = feed.window_sum(start, end) * 1.0 / divisor
+    return out
+
+
+def compute_metrics(feed: DailyAggregates, as_of: date) -> dict[str, np.ndarray]:
+    """Every metric column of the performance query, per key code."""
+    return derive_metrics(compute_windows(feed, as_of))
+
+
+def engine_parts(feed: DailyAggregates, as_of: date) -> dict:
+    """
+    The KEYS, LOD and window parts for assemble_snapshot(), as arrays
+    aligned with feed.keys. The customer-level parts (LCG, SE, CUSTOMERS,
+    OFFICES) still come from their own queries.
+    """
+    windows = compute_windows(feed, as_of)
+    parts   = {name: windows[column] for name, column in WINDOW_COLUMNS.items()}
+    parts["KEYS"] = feed.keys
+    parts["LOD"]  = feed.last_order_days()
+    return parts
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _day(d: date) -> int:
+    return d.toordinal() - _EPOCH_ORDINAL
@@ -0,0 +1,391 @@
+"""
+app/services/window_queries.py — Heritage Samarth | Decomposed performance query
+=================================================================================
+sql/performance_analysis.sql as a set of small, independent "parts" — one
+per CTE — plus the Python that joins them back into the exact column
+contract of the monolithic query.
+
+  Windows  (per CustomerID × SalesOfficeID × ProductHeirachy1 → avg daily qty)
+    LM, LMTD, MTD, LY (→ LYSM), LYMTD, LQ, LW, TW (→ CW)
+  Per-key  KEYS (Master_Dimensions), LOD (Last_Order_Date)
+  Per-customer  LCG (Latest_Customer_Group), SE (SE_Mapping),
+                CUSTOMERS (Customer_Master_Dedup)
+  Per-office    OFFICES (SalesOffice_Master_Dedup)
+
+Every date boundary and divisor is computed here in Python for an explicit
+as-of date, reproducing the T-SQL date arithmetic of the original query
+(DATEADD/DATEDIFF/EOMONTH on CAST(GETDATE() AS DATE)), and is emitted as a
+literal. That keeps parts that run at different moments consistent, lets
+the incremental refresh know which period each window belongs to, and
+gives the optimizer plain range predicates on BillingDate. Literals are
+written 'YYYYMMDD', which SQL Server reads the same under any DATEFORMAT
+or login language — 'YYYY-MM-DD' against a datetime column does not.
+
+Used by mssql_service for the "parallel", "incremental" and "engine"
+refresh modes.
+"""
+
+import calendar
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.services.columnar import (
+    ColumnarSnapshot,
+    DateColumn,
+    FloatColumn,
+    NO_DATE,
+    encode_column,
+)
+from app.services.scope_index import normalise_scope_value
+
+# Output column contract of performance_analysis.sql, in order.
+OUTPUT_COLUMNS = [
+    "State", "Region", "PLANT_NAME", "SO_Name", "SO", "CustomerID", "CustomerName",
+    "CustomerGroup", "SE_EmpID", "SE_Name", "SE_Mobile", "Product",
+    "LYSM", "LYMTD", "LQ", "LM", "LMTD", "MTD", "LW", "CW",
+    "YoY_Abs_LPD_Diff", "MTD_vs_LMTD_Abs_LPD_Diff", "MTD_vs_LYMTD_Abs_LPD_Diff",
+    "Sales_Trend",
+    "YoY_Growth_Percentage", "MTD_vs_LMTD_Growth_Percentage", "MTD_vs_LYMTD_Growth_Percentage",
+    "Last_Order_Date",
+]
+
+# Window part → output column it feeds.
+WINDOW_COLUMNS = {
+    "LY": "LYSM", "LYMTD": "LYMTD", "LQ": "LQ", "LM": "LM",
+    "LMTD": "LMTD", "MTD": "MTD", "LW": "LW", "TW": "CW",
+}
+
+# Windows whose bounds are fixed for a whole period, and that period.
+# The others (LMTD, MTD, LYMTD, TW) move every day.
+STABLE_WINDOWS = {"LM": "month", "LY": "month", "LQ": "quarter", "LW": "week"}
+
+BASE_FILTER = (
+    "BillingDate >= '20230101' "
+    "AND CustomerID NOT LIKE '%O%' "
+    "AND ProductHeirachy1 IN ('Milk','Curd','ButterMilk')"
+)
+_FROM_SALES = "FROM [HeritageBI].[DW].[fSales] (NOLOCK)"
+_KEY        = "CustomerID, SalesOfficeID, ProductHeirachy1"
+_SQL_EPOCH  = date(1900, 1, 1)      # T-SQL date 0 — a Monday
+
+
+# ══════════════════════════════════════════════════════════════
+# T-SQL DATE ARITHMETIC
+# ══════════════════════════════════════════════════════════════
+
+def add_months(d: date, months: int) -> date:
+    """DATEADD(MONTH, n, d) — clamps to the end of shorter months."""
+    y, m = divmod(d.month - 1 + months, 12)
+    y   += d.year
+    return date(y, m + 1, min(d.day, calendar.monthrange(y, m + 1)[1]))
+
+
+def month_start(d: date) -> date:
+    """DATEADD(MONTH, DATEDIFF(MONTH, 0, d), 0)"""
+    return d.replace(day=1)
+
+
+def quarter_start(d: date) -> date:
+    """DATEADD(QUARTER, DATEDIFF(QUARTER, 0, d), 0)"""
+    return date(d.year, 3 * ((d.month - 1) // 3) + 1, 1)
+
+
+def week_start(d: date) -> date:
+    """
+    DATEADD(WEEK, DATEDIFF(WEEK, 0, d), 0). DATEDIFF(WEEK) counts Sunday
+    boundaries and date 0 is a Monday, so this is the Monday of d's week —
+    except on a Sunday, where it is the following Monday (as in SQL Server).
+    """
+    weeks = ((d - _SQL_EPOCH).days + 1) // 7
+    return _SQL_EPOCH + timedelta(weeks=weeks)
+
+
+def days_in_month(d: date) -> int:
+    """DAY(EOMONTH(d))"""
+    return calendar.monthrange(d.year, d.month)[1]
+
+
+def window_bounds(name: str, as_of: date) -> tuple[date, date, int | None]:
+    """
+    (start, end, divisor) of a window for the given as-of date — rows with
+    start <= BillingDate < end, SUM(SalesQuantity) * 1.0 / divisor.
+    divisor is None where the SQL divides by NULLIF(…, 0) and gets NULL.
+    """
+    m0        = month_start(as_of)
+    yesterday = as_of - timedelta(days=1)
+
+    if name == "LM":
+        return add_months(m0, -1), m0, days_in_month(add_months(as_of, -1))
+    if name == "LMTD":
+        return add_months(m0, -1), add_months(as_of, -1), yesterday.day
+    if name == "MTD":
+        return m0, as_of, yesterday.day
+    if name == "LY":
+        return add_months(m0, -12), add_months(add_months(m0, 1), -12), days_in_month(add_months(as_of, -12))
+    if name == "LYMTD":
+        return add_months(m0, -12), add_months(as_of, -12), yesterday.day
+    if name == "LQ":
+        q0 = quarter_start(as_of)
+        lq = add_months(q0, -3)
+        return lq, q0, (q0 - lq).days
+    if name == "LW":
+        w0 = week_start(as_of)
+        return w0 - timedelta(days=7), w0, 7
+    if name == "TW":
+        w0 = week_start(as_of)
+        return w0, as_of, ((as_of - w0).days or None)
+    raise KeyError(f"Unknown window {name}")
+
+
+def period_key(name: str, as_of: date) -> str:
+    """Identifies the period a stable window's bounds belong to."""
+    kind = STABLE_WINDOWS[name]
+    if kind == "month":
+        return f"{as_of:%Y-%m}"
+    if kind == "quarter":
+        return f"{as_of.year}-Q{(as_of.month - 1) // 3 + 1}"
+    return week_start(as_of).isoformat()
+
+
+# ══════════════════════════════════════════════════════════════
+# SQL
+# ══════════════════════════════════════════════════════════════
+
+def window_sql(name: str, as_of: date) -> str | None:
+    """
+    SELECT CustomerID, SalesOfficeID, ProductHeirachy1, Value for one window.
+    None if the window's divisor is NULL — every value would be NULL.
+    """
+    start, end, divisor = window_bounds(name, as_of)
+    if divisor is None:
+        return None
+    return (
+        f"SELECT {_KEY}, SUM(SalesQuantity) * 1.0 / {divisor} AS Value "
+        f"{_FROM_SALES} "
+        f"WHERE {BASE_FILTER}{_range(start, end)} "
+        f"GROUP BY {_KEY}"
+    )
+
+
+def keys_sql(since: date = None, before: date = None) -> str:
+    """Master_Dimensions, optionally restricted to [since, before)."""
+    return (
+        f"SELECT DISTINCT {_KEY} {_FROM_SALES} "
+        f"WHERE {BASE_FILTER}{_range(since, before)}"
+    )
+
+
+def last_order_sql(since: date = None, before: date = None) -> str:
+    """Last_Order_Date per key, optionally restricted to [since, before)."""
+    return (
+        f"SELECT {_KEY}, MAX(BillingDate) AS Last_Order_Date {_FROM_SALES} "
+        f"WHERE {BASE_FILTER}{_range(since, before)} "
+        f"GROUP BY {_KEY}"
+    )
+
+
+def customer_group_sql(since: date = None, before: date = None) -> str:
+    """Latest_Customer_Group, optionally restricted to [since, before)."""
+    return (
+        "SELECT CustomerID, CustomerGroup FROM ("
+        "SELECT CustomerID, CustomerGroup, "
+        "ROW_NUMBER() OVER(PARTITION BY CustomerID ORDER BY BillingDate DESC) AS rn "
+        f"{_FROM_SALES} "
+        f"WHERE {BASE_FILTER}{_range(since, before)} AND CustomerGroup IS NOT NULL"
+        ") t WHERE rn = 1"
+    )
+
+
+def daily_sales_sql(since: date) -> str:
+    """Daily quantity per key from since onwards — window_engine's feed."""
+    return (
+        f"SELECT {_KEY}, BillingDate, SUM(SalesQuantity) AS Quantity {_FROM_SALES} "
+        f"WHERE {BASE_FILTER}{_range(since, None)} "
+        f"GROUP BY {_KEY}, BillingDate"
+    )
+
+
+SE_MAPPING_SQL = (
+    "SELECT DISTINCT CustomerID, Employee_ID, Employee_Name, Employee_Mobile "
+    "FROM [HeritageIT].[S&D].[Cust_SE_Mapping] WHERE Division != 4"
+)
+
+CUSTOMERS_SQL = (
+    "SELECT CustomerID, CustomerName FROM ("
+    "SELECT CustomerID, CustomerName, "
+    "ROW_NUMBER() OVER(PARTITION BY CustomerID ORDER BY CustomerName DESC) AS rn "
+    "FROM [HeritageBI].[DW].[dCustomer]"
+    ") c WHERE rn = 1"
+)
+
+OFFICES_SQL = (
+    "SELECT PLANT, STATE, REGION_NAME, PLANT_NAME, Short_Name FROM ("
+    "SELECT PLANT, STATE, REGION_NAME, PLANT_NAME, Short_Name, "
+    "ROW_NUMBER() OVER(PARTITION BY PLANT ORDER BY PLANT_NAME DESC) AS rn "
+    "FROM [HeritageBI].[DW].[dsalesofficemaster]"
+    ") s WHERE rn = 1"
+)
+
+
+def _range(since: date | None, before: date | None) -> str:
+    out = ""
+    if since is not None:
+        out += f" AND BillingDate >= '{since:%Y%m%d}'"
+    if before is not None:
+        out += f" AND BillingDate < '{before:%Y%m%d}'"
+    return out
+
+
+# ══════════════════════════════════════════════════════════════
+# ASSEMBLY
+# ══════════════════════════════════════════════════════════════
+
+def assemble_snapshot(parts: dict, timestamp: float) -> ColumnarSnapshot:
+    """
+    Hash-joins the parts into the performance query's result.
+
+    parts:
+      "KEYS"       [(CustomerID, SalesOfficeID, Product), …]
+      "LCG"        {CustomerID: CustomerGroup}
+      "LOD"        {key: date}
+      "SE"         [(CustomerID, Employee_ID, Employee_Name, Employee_Mobile), …]
+      "CUSTOMERS"  [(CustomerID, CustomerName), …]
+      "OFFICES"    [(PLANT, STATE, REGION_NAME, PLANT_NAME, Short_Name), …]
+      <window>     {key: value} for each name in WINDOW_COLUMNS
+
+    The window parts and LOD may instead be arrays aligned with KEYS
+    (window_engine.engine_parts() — values, and LOD as day numbers).
+
+    Same LEFT JOINs as the SQL — a customer mapped to several SEs yields one
+    row per SE — followed by the same derived columns, WHERE and ORDER BY.
+    """
+    se_by_cust = {}
+    for cust, emp_id, emp_name, emp_mobile in parts["SE"]:
+        se_by_cust.setdefault(_cust_key(cust), []).append((emp_id, emp_name, emp_mobile))
+    names   = {_cust_key(c): n for c, n in parts["CUSTOMERS"]}
+    offices = {normalise_scope_value("SO", p): rest for p, *rest in parts["OFFICES"]}
+    groups  = {_cust_key(c): g for c, g in parts["LCG"].items()}
+    no_se, no_office = [(None, None, None)], (None, None, None, None)
+
+    row_keys, key_rows, dims = [], [], {c: [] for c in OUTPUT_COLUMNS[:12]}
+    for i, key in enumerate(parts["KEYS"]):
+        cust, so, product = key
+        ck     = _cust_key(cust)
+        office = offices.get(normalise_scope_value("SO", so), no_office)
+        for emp_id, emp_name, emp_mobile in se_by_cust.get(ck, no_se):
+            row_keys.append(key)
+            key_rows.append(i)
+            for col, val in zip(dims, (*office, so, cust, names.get(ck), groups.get(ck),
+                                       emp_id, emp_name, emp_mobile, product)):
+                dims[col].append(val)
+
+    key_rows = np.array(key_rows, dtype=np.intp)
+    raw = {
+        name: window[key_rows] if isinstance(window, np.ndarray)
+        else np.array([window.get(k, np.nan) for k in row_keys], dtype=np.float64)
+        for name, window in ((n, parts[n]) for n in WINDOW_COLUMNS)
+    }
+    lod = parts["LOD"]
+    if isinstance(lod, np.ndarray):
+        lod_days = lod[key_rows]
+    else:
+        lod_days = np.array([_day_number(lod.get(k)) for k in row_keys], dtype=np.int32)
+
+    metrics = derive_metrics({WINDOW_COLUMNS[n]: v for n, v in raw.items()})
+
+    # WHERE LM, MTD, LYMTD or LYSM > 0.0001, ORDER BY MTD_vs_LYMTD_Abs_LPD_Diff
+    keep  = np.flatnonzero(
+        (metrics["LM"] > 0.0001) | (metrics["MTD"] > 0.0001)
+        | (metrics["LYMTD"] > 0.0001) | (metrics["LYSM"] > 0.0001)
+    )
+    order = keep[np.argsort(metrics["MTD_vs_LYMTD_Abs_LPD_Diff"][keep], kind="stable")]
+
+    cols = []
+    for name in OUTPUT_COLUMNS:
+        if name in dims:
+            values = dims[name]
+            cols.append(encode_column(name, [_clean(values[i]) for i in order.tolist()]))
+        elif name == "Sales_Trend":
+            cols.append(encode_column(name, metrics[name][order].tolist()))
+        elif name == "Last_Order_Date":
+            cols.append(DateColumn(lod_days[order]))
+        else:
+            cols.append(FloatColumn(metrics[name][order]))
+    return ColumnarSnapshot(OUTPUT_COLUMNS, cols, len(order), timestamp)
+
+
+def part_from_rows(name: str, rows: list) -> list | dict:
+    """
+    Shapes one part's cleaned result rows the way assemble_snapshot() takes
+    them. Window names and "LOD" become {key: value}; "LCG" becomes
+    {CustomerID: CustomerGroup}; everything else stays a list of tuples.
+    """
+    if name in WINDOW_COLUMNS:
+        return {tuple(r[:3]): r[3] for r in rows if r[3] != ""}
+    if name == "LOD":
+        return {tuple(r[:3]): r[3] for r in rows}
+    if name == "LCG":
+        return {r[0]: r[1] for r in rows}
+    return [tuple(r) for r in rows]
+
+
+def derive_metrics(windows: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    The final SELECT's arithmetic, vectorised. windows maps LYSM, LYMTD, LQ,
+    LM, LMTD, MTD, LW, CW to float arrays with NaN for a missing (NULL) value.
+
+    Returns the ISNULL(…, 0) metrics, the three ROUND(…, 2) diffs, the three
+    ROUND(…, 4) growth ratios (NaN where the base is NULL or 0, i.e. NULLIF)
+    and Sales_Trend as an object array.
+    """
+    out = {name: np.nan_to_num(arr, nan=0.0) for name, arr in windows.items()}
+    lm, ly, mtd, lmtd, lymtd = out["LM"], out["LYSM"], out["MTD"], out["LMTD"], out["LYMTD"]
+
+    out["YoY_Abs_LPD_Diff"]          = _sql_round(lm - ly, 2)
+    out["MTD_vs_LMTD_Abs_LPD_Diff"]  = _sql_round(mtd - lmtd, 2)
+    out["MTD_vs_LYMTD_Abs_LPD_Diff"] = _sql_round(mtd - lymtd, 2)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["YoY_Growth_Percentage"]          = _sql_round(np.where(ly != 0, (lm - ly) / ly, np.nan), 4)
+        out["MTD_vs_LMTD_Growth_Percentage"]  = _sql_round(np.where(lmtd != 0, (mtd - lmtd) / lmtd, np.nan), 4)
+        out["MTD_vs_LYMTD_Growth_Percentage"] = _sql_round(np.where(lymtd != 0, (mtd - lymtd) / lymtd, np.nan), 4)
+
+    trend = np.full(len(mtd), "Stagnant", dtype=object)
+    # CASE branches in reverse order, so earlier WHENs win.
+    trend[mtd < lymtd]                  = "Decline"
+    trend[mtd > lymtd]                  = "Growth"
+    trend[(mtd == 0) & (lymtd > 0)]     = "Decline"
+    trend[(lymtd == 0) & (mtd > 0)]     = "New Customer"
+    out["Sales_Trend"] = trend
+    return out
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _sql_round(x: np.ndarray, digits: int) -> np.ndarray:
+    """
+    ROUND(x, digits) as SQL Server does it on numerics — half away from
+    zero. The tiny nudge absorbs binary representation error (2.675 is
+    stored as 2.67499…), which numpy's round-half-even would also get wrong.
+    """
+    scale = 10.0 ** digits
+    return np.sign(x) * np.floor(np.abs(x) * scale + 0.5 + 1e-9) / scale
+
+
+def _cust_key(value) -> str:
+    # SQL Server compares strings ignoring trailing spaces.
+    return str(value).rstrip()
+
+
+def _clean(value):
+    # Parts arrive cleaned ("" for NULL); None here means a LEFT JOIN miss.
+    return "" if value is None else value
+
+
+def _day_number(value) -> int:
+    if value is None or value == "":
+        return NO_DATE
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - date(1970, 1, 1).toordinal()
@@ -0,0 +1,102 @@
+"""
+app/services/wire_format.py — Heritage Samarth | Columnar /api/data payload
+===========================================================================
+The opt-in binary layout of /api/data (?format=columns): the snapshot's
+columns as they already sit in memory — dictionary codes and float64
+arrays — instead of row-major JSON that repeats every region, SO, product
+and SE name on every row and prints every float in full.
+
+  encode_columns(snapshot, positions, meta)  → the payload bytes
+  MIMETYPE                                   → its Content-Type
+
+Layout (all integers little-endian):
+
+  uint32          length of the header in bytes
+  header          UTF-8 JSON: the fields of the JSON payload except
+                  "data", plus "rows" and an "encoding" entry per column
+  padding         spaces up to the next multiple of 8 bytes
+  column buffers  one per column, each starting on a multiple of 8 from
+                  the end of the padding, so a client can lay a typed
+                  array straight over the response without copying
+
+A column is either
+  {"type": "dict", "codes": "u8"|"u16"|"u32", "values": [...], "offset": o}
+      one code per row into values, which hold only the values on the
+      rows sent — a scoped payload never names another scope's customers
+  {"type": "f64", "offset": o}
+      one float64 per row, NaN for a blank cell
+
+Float columns are dictionary-encoded too when that is smaller (rounded
+diffs and growth %, SO codes). Either way a decoded cell is exactly the
+value the JSON payload carries for it: dictionary values are the JSON
+values, and floats are compared by bit pattern, so -0.0 stays -0.0.
+"""
+
+import json
+
+import numpy as np
+
+from app.services.columnar import FloatColumn
+
+MIMETYPE = "application/vnd.samarth.columns"
+
+_CODE_TYPES = (("u8", "<u1", 1 << 8), ("u16", "<u2", 1 << 16), ("u32", "<u4", 1 << 32))
+
+
+def encode_columns(snapshot, positions: np.ndarray | None, meta: dict) -> bytes:
+    """
+    The rows at positions (None = every row) in the columnar layout, with
+    meta — last_updated, columns, … — in the header.
+    """
+    rows     = snapshot.row_count if positions is None else len(positions)
+    encoding = []
+    buffers  = []
+    offset   = 0
+    for col in snapshot.cols:
+        spec, data = _encode_column(col, positions)
+        spec["offset"] = offset
+        encoding.append(spec)
+        buffers.append(data)
+        buffers.append(b"\0" * _pad(len(data)))
+        offset += len(data) + _pad(len(data))
+
+    header = json.dumps({**meta, "rows": rows, "encoding": encoding}, separators=(",", ":")).encode("utf-8")
+    prefix = len(header).to_bytes(4, "little") + header
+    return b"".join([prefix, b" " * _pad(len(prefix)), *buffers])
+
+
+# ── Private helpers ───────────────────────────────────────────────────────────
+
+def _encode_column(col, positions: np.ndarray | None) -> tuple[dict, bytes]:
+    """(encoding entry without its offset, buffer) for one column."""
+    data = col.data if positions is None else col.data[positions]
+    rows = len(data)
+
+    if isinstance(col, FloatColumn):
+        # Distinct bit patterns, so 0.0 / -0.0 and NaNs never merge.
+        bits = data.view(np.int64)
+        uniques, inverse = np.unique(bits, return_inverse=True)
+        name, dtype, _ = _code_type(len(uniques))
+        width = np.dtype(dtype).itemsize
+        if width * rows + 20 * len(uniques) >= 8 * rows:
+            return {"type": "f64"}, data.astype("<f8").tobytes()
+        values = ["" if v != v else v for v in uniques.view(np.float64).tolist()]
+        return {"type": "dict", "codes": name, "values": values}, inverse.ravel().astype(dtype).tobytes()
+
+    uniques, first, inverse = np.unique(data, return_index=True, return_inverse=True)
+    values = col.values_at(first if positions is None else positions[first])
+    name, dtype, _ = _code_type(len(uniques))
+    return {"type": "dict", "codes": name, "values": values}, inverse.ravel().astype(dtype).tobytes()
+
+
+def _code_type(n_values: int) -> tuple[str, str, int]:
+    """The narrowest code type that can number n_values values."""
+    for code_type in _CODE_TYPES:
+        if n_values <= code_type[2]:
+            return code_type
+    raise ValueError(f"{n_values} distinct values do not fit a uint32 code")
+
+
+def _pad(n: int) -> int:
+    """Bytes that take n up to a multiple of 8."""
+    return -n % 8
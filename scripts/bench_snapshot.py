@@ -0,0 +1,145 @@
+"""
+bench_snapshot.py — Heritage Samarth | Columnar snapshot benchmark
+===================================================================
+Compares the old list-of-lists cache against ColumnarSnapshot on a
+synthetic dataset shaped like the performance query output.
+
+  python scripts/bench_snapshot.py            # 60,000 rows
+  python scripts/bench_snapshot.py 200000     # custom row count
+
+Reports:
+  1. Memory held by the dataset (tracemalloc)
+  2. Scan: total MTD per Sales_Trend
+  3. Scan: SO-scoped RLS filter (the /api/data hot path)
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services.columnar import ColumnarSnapshot
+
+COLUMNS = [
+    "State", "Region", "PLANT_NAME", "SO_Name", "SO", "CustomerID", "CustomerName",
+    "CustomerGroup", "SE_EmpID", "SE_Name", "SE_Mobile", "Product",
+    "LYSM", "LYMTD", "LQ", "LM", "LMTD", "MTD", "LW", "CW",
+    "YoY_Abs_LPD_Diff", "MTD_vs_LMTD_Abs_LPD_Diff", "MTD_vs_LYMTD_Abs_LPD_Diff",
+    "Sales_Trend",
+    "YoY_Growth_Percentage", "MTD_vs_LMTD_Growth_Percentage", "MTD_vs_LYMTD_Growth_Percentage",
+    "Last_Order_Date",
+]
+
+
+def synthetic_rows(n: int, seed: int = 7) -> list[list]:
+    """Rows with the query's column types: floats, repeated strings, ISO dates, '' for NULL."""
+    return list(iter_synthetic_rows(n, seed))
+
+
+def iter_synthetic_rows(n: int, seed: int = 7):
+    """Same rows as synthetic_rows(), generated one at a time."""
+    rnd = random.Random(seed)
+    for i in range(n):
+        so  = 1900 + (i // 3) % 120
+        lpd = [round(rnd.random() * 40, 6) if rnd.random() > 0.25 else 0.0 for _ in range(8)]
+        lysm, lymtd, lq, lm, lmtd, mtd, lw, cw = lpd
+        trend = ("New Customer" if lymtd == 0 and mtd > 0 else
+                 "Decline"      if mtd == 0 and lymtd > 0 else
+                 "Growth"       if mtd > lymtd else
+                 "Decline"      if mtd < lymtd else "Stagnant")
+        pct = lambda a, b: round((a - b) / b, 4) if b else ""
+        yield [
+            ["Telangana", "Andhra Pradesh", "Karnataka", "Tamil Nadu", "Maharashtra"][so % 5],
+            f"R-{so % 14}", f"Plant {so}", f"SO {so}", float(so),
+            f"{1000000 + i // 3}", f"Customer {i // 3}",
+            ["Retail", "Dealers", "Parlours", "Institutions"][(i // 3) % 4],
+            f"{50000 + so * 8 + (i // 3) % 8}", f"SE {so}-{(i // 3) % 8}", f"98{so:04d}{(i // 3) % 8:04d}",
+            ["Milk", "Curd", "ButterMilk"][i % 3],
+            lysm, lymtd, lq, lm, lmtd, mtd, lw, cw,
+            round(lm - lysm, 2), round(mtd - lmtd, 2), round(mtd - lymtd, 2), trend,
+            pct(lm, lysm), pct(mtd, lmtd), pct(mtd, lymtd),
+            f"2026-{rnd.randint(1, 10):02d}-{rnd.randint(1, 28):02d}",
+        ]
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def timed(fn, repeat=5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(n: int) -> None:
+    print(f"\nSynthetic dataset: {n:,} rows × {len(COLUMNS)} columns\n")
+
+    # Rows are generated as the DB driver would hand them over — a fresh
+    # object per cell. The snapshot is built from its own copy of the rows,
+    # dropped afterwards, so its dictionary strings are counted too.
+    rows, row_bytes = measure(lambda: synthetic_rows(n))
+    snap, col_bytes = measure(lambda: ColumnarSnapshot.from_rows(COLUMNS, synthetic_rows(n), time.time()))
+
+    print("  Memory")
+    print(f"    list-of-lists      {row_bytes / 1e6:8.1f} MB")
+    print(f"    ColumnarSnapshot   {col_bytes / 1e6:8.1f} MB   ({row_bytes / col_bytes:.1f}× smaller)")
+
+    # ── Scan 1: total MTD per trend ──────────────────────────
+    i_mtd, i_trend = COLUMNS.index("MTD"), COLUMNS.index("Sales_Trend")
+
+    def rows_by_trend():
+        out = {}
+        for r in rows:
+            out[r[i_trend]] = out.get(r[i_trend], 0.0) + r[i_mtd]
+        return out
+
+    trend_col = snap.column("Sales_Trend")
+    mtd       = snap.array("MTD")
+
+    def cols_by_trend():
+        sums = np.bincount(trend_col.data, weights=mtd, minlength=len(trend_col.values))
+        return dict(zip(trend_col.values, sums.tolist()))
+
+    t_rows, t_cols = timed(rows_by_trend), timed(cols_by_trend)
+    print("\n  Scan: SUM(MTD) GROUP BY Sales_Trend")
+    print(f"    list-of-lists      {t_rows:8.2f} ms")
+    print(f"    ColumnarSnapshot   {t_cols:8.2f} ms   ({t_rows / t_cols:.0f}× faster)")
+
+    # ── Scan 2: SO-scoped RLS filter ─────────────────────────
+    i_so    = COLUMNS.index("SO")
+    allowed = {"1901", "1902", "1950"}
+
+    def rows_rls():
+        return [r for r in rows if str(r[i_so]).replace(".0", "").strip() in allowed]
+
+    so_arr = snap.array("SO")
+
+    def cols_rls():
+        return np.flatnonzero(np.isin(so_arr, [float(v) for v in allowed]))
+
+    assert len(rows_rls()) == len(cols_rls())
+    t_rows, t_cols = timed(rows_rls), timed(cols_rls)
+    print("\n  Scan: SO-scoped RLS filter")
+    print(f"    list-of-lists      {t_rows:8.2f} ms")
+    print(f"    ColumnarSnapshot   {t_cols:8.2f} ms   ({t_rows / t_cols:.0f}× faster)")
+
+    # ── Materialising rows back for existing callers ─────────
+    t_mat = timed(lambda: list(snap.rows), repeat=3)
+    print(f"\n  Full row materialisation (compat path): {t_mat:.1f} ms\n")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60_000)
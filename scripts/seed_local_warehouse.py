@@ -0,0 +1,71 @@
+"""
+seed_local_warehouse.py — Heritage Samarth | Local warehouse generator
+=======================================================================
+(Re)generates the SQLite stand-in for the BI warehouse that
+DATA_SOURCE=sqlite serves from, then times one refresh from it.
+
+  python scripts/seed_local_warehouse.py                # SYNTHETIC_* from .env
+  python scripts/seed_local_warehouse.py --scale 10     # 10× the customers
+  python scripts/seed_local_warehouse.py --customers 5000 --seed 3
+
+Writes LOCAL_WAREHOUSE_PATH (default cache/local_warehouse.db) and reports
+rows, file size, snapshot size in memory and load time — the numbers to
+size hardware with.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app
+from app.services.data_source import SQLiteSource, seed_local_warehouse
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[3])
+    parser.add_argument("--scale",     type=float, help="override SYNTHETIC_SCALE")
+    parser.add_argument("--customers", type=int,   help="override SYNTHETIC_CUSTOMERS")
+    parser.add_argument("--offices",   type=int,   help="override SYNTHETIC_SALES_OFFICES")
+    parser.add_argument("--ses",       type=int,   help="override SYNTHETIC_SES_PER_SO")
+    parser.add_argument("--seed",      type=int,   default=7)
+    parser.add_argument("--path",                  help="override LOCAL_WAREHOUSE_PATH")
+    args = parser.parse_args()
+
+    # "testing" — no scheduler, no warm start; only the config is needed.
+    app = create_app("testing")
+    for key, value in (
+        ("SYNTHETIC_SCALE",         args.scale),
+        ("SYNTHETIC_CUSTOMERS",     args.customers),
+        ("SYNTHETIC_SALES_OFFICES", args.offices),
+        ("SYNTHETIC_SES_PER_SO",    args.ses),
+        ("LOCAL_WAREHOUSE_PATH",    args.path),
+    ):
+        if value is not None:
+            app.config[key] = value
+
+    with app.app_context():
+        t0   = time.perf_counter()
+        rows = seed_local_warehouse(args.seed)
+        seed_secs = time.perf_counter() - t0
+
+        t0   = time.perf_counter()
+        snap = SQLiteSource().fetch_performance_snapshot()
+        load_secs = time.perf_counter() - t0
+
+        path = app.config["LOCAL_WAREHOUSE_PATH"]
+        print(f"\n  {path}")
+        print(f"    rows            {rows:>12,}")
+        print(f"    file            {os.path.getsize(path) / 1e6:>12.1f} MB   (generated in {seed_secs:.1f}s)")
+        print(f"    snapshot        {snap.nbytes / 1e6:>12.1f} MB   (loaded in {load_secs:.2f}s)")
+        print(f"\n  Serve from it with DATA_SOURCE=sqlite\n")
+
+
+if __name__ == "__main__":
+    main()
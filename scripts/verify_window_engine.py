@@ -0,0 +1,319 @@
+"""
+verify_window_engine.py — Heritage Samarth | Window engine equivalence check
+=============================================================================
+Checks that the NumPy window engine (app/services/window_engine.py) gives
+exactly the rows of the SQL-side computation, for many as-of dates.
+
+First, window_bounds() — which both paths below share — is checked against
+the bounds and divisors of the CTEs in sql/performance_analysis.sql, worked
+out by hand for a handful of as-of dates: month and quarter starts, a leap
+day, a year boundary, a month-end clamp, and the Monday / Sunday week-start
+cases. A mistake in window_bounds() would otherwise pass unnoticed, as the
+two paths would make it together.
+
+A synthetic fSales / SE mapping / customer / sales-office warehouse is
+generated into an in-memory SQLite database. For each as-of date:
+
+  SQL     every part query from window_queries (one GROUP BY per window,
+          Master_Dimensions, Last_Order_Date, …) runs on SQLite and the
+          results are joined by assemble_snapshot() — the "parallel"
+          refresh mode, itself the performance query split into its CTEs
+  engine  one daily_sales_sql() feed from feed_start(as_of), windows and
+          metrics computed by engine_parts(), same customer-level parts
+
+and the two snapshots must hold the same multiset of rows, value for
+value. The as-of dates cover month and year ends, a leap day, every
+weekday (TW is NULL on Mondays, the week-start quirk on Sundays) and the
+first days of a quarter.
+
+  python scripts/verify_window_engine.py            # default dataset
+  python scripts/verify_window_engine.py 600 7      # customers, seed
+
+Exits non-zero on the first mismatch.
+"""
+
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing app.services loads app/config.py, which insists on a SECRET_KEY.
+os.environ.setdefault("SECRET_KEY", "verify-window-engine")
+
+import numpy as np
+
+from app.services import window_queries as wq
+from app.services.window_engine import DailyAggregates, engine_parts, feed_start
+
+END = date(2026, 3, 20)
+
+AS_OF_DATES = sorted({
+    date(2024, 2, 29), date(2024, 3, 1), date(2024, 12, 31), date(2025, 1, 1),
+    date(2025, 3, 31), date(2025, 4, 1), date(2025, 7, 1), date(2025, 10, 1),
+    date(2025, 12, 1), date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 1),
+    *(date(2026, 3, 1) + timedelta(days=i) for i in range(0, 19)),
+})
+
+# (start, end, divisor) of each window CTE in performance_analysis.sql with
+# GETDATE() on the as-of date — BillingDate >= start AND < end, divided by
+# divisor (None where NULLIF(…, 0) gives NULL). Worked out by hand from the
+# T-SQL, not from window_bounds().
+D = date
+EXPECTED_BOUNDS = {
+    # Leap day, a Thursday.
+    D(2024, 2, 29): {
+        "LM":    (D(2024, 1, 1),   D(2024, 2, 1),   31),
+        "LMTD":  (D(2024, 1, 1),   D(2024, 1, 29),  28),
+        "MTD":   (D(2024, 2, 1),   D(2024, 2, 29),  28),
+        "LY":    (D(2023, 2, 1),   D(2023, 3, 1),   28),
+        "LYMTD": (D(2023, 2, 1),   D(2023, 2, 28),  28),
+        "LQ":    (D(2023, 10, 1),  D(2024, 1, 1),   92),
+        "LW":    (D(2024, 2, 19),  D(2024, 2, 26),  7),
+        "TW":    (D(2024, 2, 26),  D(2024, 2, 29),  3),
+    },
+    # Month start after a leap day — LMTD / MTD / LYMTD are empty, divided by 29.
+    D(2024, 3, 1): {
+        "LM":    (D(2024, 2, 1),   D(2024, 3, 1),   29),
+        "LMTD":  (D(2024, 2, 1),   D(2024, 2, 1),   29),
+        "MTD":   (D(2024, 3, 1),   D(2024, 3, 1),   29),
+        "LY":    (D(2023, 3, 1),   D(2023, 4, 1),   31),
+        "LYMTD": (D(2023, 3, 1),   D(2023, 3, 1),   29),
+        "LQ":    (D(2023, 10, 1),  D(2024, 1, 1),   92),
+        "LW":    (D(2024, 2, 19),  D(2024, 2, 26),  7),
+        "TW":    (D(2024, 2, 26),  D(2024, 3, 1),   4),
+    },
+    # Year end, a Tuesday.
+    D(2024, 12, 31): {
+        "LM":    (D(2024, 11, 1),  D(2024, 12, 1),  30),
+        "LMTD":  (D(2024, 11, 1),  D(2024, 11, 30), 30),
+        "MTD":   (D(2024, 12, 1),  D(2024, 12, 31), 30),
+        "LY":    (D(2023, 12, 1),  D(2024, 1, 1),   31),
+        "LYMTD": (D(2023, 12, 1),  D(2023, 12, 31), 30),
+        "LQ":    (D(2024, 7, 1),   D(2024, 10, 1),  92),
+        "LW":    (D(2024, 12, 23), D(2024, 12, 30), 7),
+        "TW":    (D(2024, 12, 30), D(2024, 12, 31), 1),
+    },
+    # Year start — every window looks back across the boundary.
+    D(2025, 1, 1): {
+        "LM":    (D(2024, 12, 1),  D(2025, 1, 1),   31),
+        "LMTD":  (D(2024, 12, 1),  D(2024, 12, 1),  31),
+        "MTD":   (D(2025, 1, 1),   D(2025, 1, 1),   31),
+        "LY":    (D(2024, 1, 1),   D(2024, 2, 1),   31),
+        "LYMTD": (D(2024, 1, 1),   D(2024, 1, 1),   31),
+        "LQ":    (D(2024, 10, 1),  D(2025, 1, 1),   92),
+        "LW":    (D(2024, 12, 23), D(2024, 12, 30), 7),
+        "TW":    (D(2024, 12, 30), D(2025, 1, 1),   2),
+    },
+    # Mid-month, a Saturday — same month last year has a leap day.
+    D(2025, 2, 15): {
+        "LM":    (D(2025, 1, 1),   D(2025, 2, 1),   31),
+        "LMTD":  (D(2025, 1, 1),   D(2025, 1, 15),  14),
+        "MTD":   (D(2025, 2, 1),   D(2025, 2, 15),  14),
+        "LY":    (D(2024, 2, 1),   D(2024, 3, 1),   29),
+        "LYMTD": (D(2024, 2, 1),   D(2024, 2, 15),  14),
+        "LQ":    (D(2024, 10, 1),  D(2025, 1, 1),   92),
+        "LW":    (D(2025, 2, 3),   D(2025, 2, 10),  7),
+        "TW":    (D(2025, 2, 10),  D(2025, 2, 15),  5),
+    },
+    # Month end, a Monday — LMTD's end clamps to 28 Feb, TW is NULL.
+    D(2025, 3, 31): {
+        "LM":    (D(2025, 2, 1),   D(2025, 3, 1),   28),
+        "LMTD":  (D(2025, 2, 1),   D(2025, 2, 28),  30),
+        "MTD":   (D(2025, 3, 1),   D(2025, 3, 31),  30),
+        "LY":    (D(2024, 3, 1),   D(2024, 4, 1),   31),
+        "LYMTD": (D(2024, 3, 1),   D(2024, 3, 31),  30),
+        "LQ":    (D(2024, 10, 1),  D(2025, 1, 1),   92),
+        "LW":    (D(2025, 3, 24),  D(2025, 3, 31),  7),
+        "TW":    (D(2025, 3, 31),  D(2025, 3, 31),  None),
+    },
+    # Quarter start, a Tuesday.
+    D(2025, 4, 1): {
+        "LM":    (D(2025, 3, 1),   D(2025, 4, 1),   31),
+        "LMTD":  (D(2025, 3, 1),   D(2025, 3, 1),   31),
+        "MTD":   (D(2025, 4, 1),   D(2025, 4, 1),   31),
+        "LY":    (D(2024, 4, 1),   D(2024, 5, 1),   30),
+        "LYMTD": (D(2024, 4, 1),   D(2024, 4, 1),   31),
+        "LQ":    (D(2025, 1, 1),   D(2025, 4, 1),   90),
+        "LW":    (D(2025, 3, 24),  D(2025, 3, 31),  7),
+        "TW":    (D(2025, 3, 31),  D(2025, 4, 1),   1),
+    },
+    # Month start on a Sunday — DATEDIFF(WEEK) puts the week start on the
+    # next day, so TW runs backwards and divides by -1.
+    D(2026, 3, 1): {
+        "LM":    (D(2026, 2, 1),   D(2026, 3, 1),   28),
+        "LMTD":  (D(2026, 2, 1),   D(2026, 2, 1),   28),
+        "MTD":   (D(2026, 3, 1),   D(2026, 3, 1),   28),
+        "LY":    (D(2025, 3, 1),   D(2025, 4, 1),   31),
+        "LYMTD": (D(2025, 3, 1),   D(2025, 3, 1),   28),
+        "LQ":    (D(2025, 10, 1),  D(2026, 1, 1),   92),
+        "LW":    (D(2026, 2, 23),  D(2026, 3, 2),   7),
+        "TW":    (D(2026, 3, 2),   D(2026, 3, 1),   -1),
+    },
+    # The Monday after.
+    D(2026, 3, 2): {
+        "LM":    (D(2026, 2, 1),   D(2026, 3, 1),   28),
+        "LMTD":  (D(2026, 2, 1),   D(2026, 2, 2),   1),
+        "MTD":   (D(2026, 3, 1),   D(2026, 3, 2),   1),
+        "LY":    (D(2025, 3, 1),   D(2025, 4, 1),   31),
+        "LYMTD": (D(2025, 3, 1),   D(2025, 3, 2),   1),
+        "LQ":    (D(2025, 10, 1),  D(2026, 1, 1),   92),
+        "LW":    (D(2026, 2, 23),  D(2026, 3, 2),   7),
+        "TW":    (D(2026, 3, 2),   D(2026, 3, 2),   None),
+    },
+}
+
+
+def check_bounds() -> None:
+    """window_bounds() against EXPECTED_BOUNDS. Exits non-zero on a mismatch."""
+    print("\nwindow_bounds() vs performance_analysis.sql\n")
+    for as_of, windows in EXPECTED_BOUNDS.items():
+        bad = [(name, want, wq.window_bounds(name, as_of)) for name, want in windows.items()
+               if wq.window_bounds(name, as_of) != want]
+        print(f"  {as_of} {as_of:%a}  {'ok' if not bad else 'MISMATCH'}")
+        for name, want, got in bad:
+            print(f"    {name:<5}  sql {want}  window_bounds {got}")
+        if bad:
+            sys.exit(1)
+
+
+# ── Synthetic warehouse ───────────────────────────────────────────────────────
+
+def build_warehouse(n_customers: int, seed: int) -> sqlite3.Connection:
+    rnd   = random.Random(seed)
+    start = date(2022, 10, 1)              # before the query's 2023-01-01 floor
+    span  = (END - start).days
+    db    = sqlite3.connect(":memory:")
+
+    db.execute("CREATE TABLE fSales (BillingDate TEXT, CustomerID TEXT, CustomerGroup TEXT, "
+               "SalesOfficeID INTEGER, ProductHeirachy1 TEXT, SalesQuantity REAL)")
+    rows = []
+    for c in range(n_customers):
+        cust = f"{100000 + c}" if c % 50 else f"{100000 + c}O"   # some excluded by NOT LIKE '%O%'
+        so   = 1900 + c % 15
+        for product in ("Milk", "Curd", "ButterMilk", "Ghee"):    # Ghee is filtered out
+            if rnd.random() < 0.3:
+                continue
+            d, stop = start + timedelta(days=rnd.randint(0, span)), END
+            if rnd.random() < 0.25:
+                stop = d + timedelta(days=rnd.randint(10, 400))
+            rate = rnd.choice((0.2, 0.5, 0.9))
+            while d <= stop:
+                if rnd.random() < rate:
+                    qty = rnd.choice((rnd.randint(1, 60), rnd.randint(1, 60) + 0.5, None))
+                    rows.append((d.isoformat(), cust, rnd.choice(("Retail", "Dealers", None)),
+                                 so, product, qty))
+                    if rnd.random() < 0.1:   # a second invoice the same day
+                        rows.append((d.isoformat(), cust, "Retail", so, product, rnd.randint(1, 9)))
+                d += timedelta(days=1)
+    db.executemany("INSERT INTO fSales VALUES (?,?,?,?,?,?)", rows)
+
+    db.execute("CREATE TABLE Cust_SE_Mapping (CustomerID TEXT, Employee_ID TEXT, "
+               "Employee_Name TEXT, Employee_Mobile TEXT, Division INTEGER)")
+    se = [(f"{100000 + c}", f"E{c % 9}", f"SE {c % 9}", "9800000000", 1) for c in range(0, n_customers, 1)
+          if c % 13]
+    se += [(f"{100000 + c}", f"E{90 + c % 3}", "Shared SE", "9700000000", 1) for c in range(0, n_customers, 11)]
+    se += [(f"{100000 + c}", "E99", "Division 4", "", 4) for c in range(0, n_customers, 7)]
+    db.executemany("INSERT INTO Cust_SE_Mapping VALUES (?,?,?,?,?)", se)
+
+    db.execute("CREATE TABLE dCustomer (CustomerID TEXT, CustomerName TEXT)")
+    db.executemany("INSERT INTO dCustomer VALUES (?,?)",
+                   [(f"{100000 + c}", f"Customer {c}") for c in range(n_customers) if c % 17])
+
+    db.execute("CREATE TABLE dsalesofficemaster (PLANT INTEGER, STATE TEXT, REGION_NAME TEXT, "
+               "PLANT_NAME TEXT, Short_Name TEXT)")
+    db.executemany("INSERT INTO dsalesofficemaster VALUES (?,?,?,?,?)",
+                   [(1900 + i, "Telangana" if i % 2 else "Andhra Pradesh", f"Region {i % 4}",
+                     f"Plant {i}", f"SO {i}") for i in range(14)])
+    print(f"  fSales: {len(rows):,} rows, {n_customers} customers, {start} → {END}")
+    return db
+
+
+def run(db: sqlite3.Connection, sql: str | None) -> list[list]:
+    """Runs a window_queries SQL string on SQLite, rows cleaned as mssql_service does."""
+    if sql is None:
+        return []
+    sql = sql.replace("(NOLOCK)", "").replace("[HeritageIT].[S&D].[Cust_SE_Mapping]", "Cust_SE_Mapping")
+    sql = re.sub(r"\[HeritageBI\]\.\[DW\]\.\[(\w+)\]", r"\1", sql)
+    # 'YYYYMMDD' literals → ISO, to compare with the TEXT dates here.
+    sql = re.sub(r"'(\d{4})(\d{2})(\d{2})'", r"'\1-\2-\3'", sql)
+    return [["" if v is None else v for v in row] for row in db.execute(sql).fetchall()]
+
+
+# ── The two paths ─────────────────────────────────────────────────────────────
+
+def customer_parts(db: sqlite3.Connection) -> dict:
+    queries = {"LCG": wq.customer_group_sql(), "SE": wq.SE_MAPPING_SQL,
+               "CUSTOMERS": wq.CUSTOMERS_SQL, "OFFICES": wq.OFFICES_SQL}
+    return {name: wq.part_from_rows(name, run(db, sql)) for name, sql in queries.items()}
+
+
+def sql_snapshot(db: sqlite3.Connection, as_of: date, common: dict):
+    parts = {name: wq.part_from_rows(name, run(db, wq.window_sql(name, as_of)))
+             for name in wq.WINDOW_COLUMNS}
+    parts["KEYS"] = wq.part_from_rows("KEYS", run(db, wq.keys_sql()))
+    parts["LOD"]  = wq.part_from_rows("LOD", run(db, wq.last_order_sql()))
+    return wq.assemble_snapshot({**parts, **common}, time.time())
+
+
+def engine_snapshot(db: sqlite3.Connection, as_of: date, common: dict):
+    feed  = DailyAggregates.from_rows(run(db, wq.daily_sales_sql(feed_start(as_of))))
+    parts = engine_parts(feed, as_of)
+    return wq.assemble_snapshot({**parts, **common}, time.time()), len(feed.days)
+
+
+def sorted_rows(snapshot) -> list:
+    def canon(v):
+        if isinstance(v, float) and np.isnan(v):
+            return "NaN"
+        return v
+    # Compared by repr so 0.0 vs -0.0 and int vs float count as differences.
+    return sorted(repr([canon(v) for v in row]) for row in snapshot.rows_at(slice(None)))
+
+
+def main(n_customers: int, seed: int) -> None:
+    check_bounds()
+
+    print("\nWindow engine vs SQL parts\n")
+    db     = build_warehouse(n_customers, seed)
+    common = customer_parts(db)
+    sort_col = wq.OUTPUT_COLUMNS.index("MTD_vs_LYMTD_Abs_LPD_Diff")
+
+    sql_secs = engine_secs = 0.0
+    for as_of in AS_OF_DATES:
+        t0 = time.perf_counter()
+        expected = sql_snapshot(db, as_of, common)
+        t1 = time.perf_counter()
+        actual, feed_rows = engine_snapshot(db, as_of, common)
+        t2 = time.perf_counter()
+        sql_secs, engine_secs = sql_secs + t1 - t0, engine_secs + t2 - t1
+
+        want, got = sorted_rows(expected), sorted_rows(actual)
+        ordered   = np.all(np.diff(actual.array("MTD_vs_LYMTD_Abs_LPD_Diff")) >= 0)
+        status    = "ok" if want == got and ordered else "MISMATCH"
+        print(f"  {as_of} {as_of:%a}  {expected.row_count:>6,} rows  "
+              f"feed {feed_rows:>7,}  {status}")
+        if status != "ok":
+            for w, g in zip(want, got):
+                if w != g:
+                    print("    sql:   ", w)
+                    print("    engine:", g)
+                    break
+            if len(want) != len(got):
+                print(f"    row counts differ: sql {len(want)}, engine {len(got)}")
+            if not ordered:
+                print(f"    engine rows not ordered by column {sort_col}")
+            sys.exit(1)
+
+    print(f"\n  {len(AS_OF_DATES)} as-of dates identical.  "
+          f"SQL parts {sql_secs:.2f}s, engine {engine_secs:.2f}s (both on SQLite)\n")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 3,
+    )